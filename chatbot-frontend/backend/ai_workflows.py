@@ -1,71 +1,105 @@
-from typing import Dict, Any, List
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage
-from config import Config
+from typing import Dict, Any, List, AsyncIterator
+from langchain_core.messages import BaseMessage
+from llm_client import get_llm, invoke_llm, stream_llm
+from scenario_classifier import scenario_classifier
+from semantic_cache import semantic_cache
+from prompt_registry import prompts
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+SCENARIO_SUGGESTIONS = {
+    "Schedule Issue": ["Check current schedule", "Contact coordinator", "Provide client name"],
+    "Location Issue": ["I'm at client's house", "GPS isn't working", "I stopped for supplies"],
+    "Phone Issue": ["Use client's phone", "My app isn't working", "Update phone number"],
+    "Timing Issue": ["I can stay late", "Make up hours tomorrow", "Had an emergency"],
+    "General Inquiry": ["Can you help?", "Who should I contact?", "What's next?"]
+}
+
+ASSISTANT_REPLY = prompts.register("assistant:reply", instructions="""
+    A caregiver needs help.
+    
+    Respond professionally as Rosella following company scripts.
+    Start with: "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!"
+""", variables="""
+    Caregiver: {user_name}
+    Issue Type: {scenario}
+    Message: "{message}"
+    
+    Then address their specific {issue} appropriately.
+""")
 
 class CaregiverAI:
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-pro",
-            google_api_key=Config.get_google_api_key(),
-            temperature=0.7
-        )
-        self.conversations = {}
+        self._llm = None  # Falls back to the shared client, created on first use
+    
+    @property
+    def llm(self):
+        return self._llm or get_llm()
+    
+    @llm.setter
+    def llm(self, llm):
+        self._llm = llm
     
     def analyze_scenario(self, message: str, reason: str) -> str:
-        combined = f"{reason} {message}".lower()
-        
-        if any(word in combined for word in ["schedule", "calendar", "missing"]):
-            return "Schedule Issue"
-        elif any(word in combined for word in ["location", "gps", "outside"]):
-            return "Location Issue"
-        elif any(word in combined for word in ["phone", "number", "call"]):
-            return "Phone Issue"
-        elif any(word in combined for word in ["late", "early", "time"]):
-            return "Timing Issue"
-        else:
-            return "General Inquiry"
+        return scenario_classifier.classify(message, reason)
+    
+    def build_prompt(self, user_info: Dict, message: str, scenario: str) -> List[BaseMessage]:
+        return ASSISTANT_REPLY.render(user_name=user_info.get('user_name'), scenario=scenario, message=message,
+                                      issue=scenario.lower())
     
     async def process_message(self, user_info: Dict, message: str) -> Dict:
-        print(f"🔍 Processing message: {message}")
-        print(f"👤 User info: {user_info}")
+        logger.debug("Processing message: %s", message)
+        logger.debug("User info: %s", user_info)
         
         scenario = self.analyze_scenario(message, user_info.get('reason_for_contact', ''))
-        print(f"🎯 Detected scenario: {scenario}")
-        
-        prompt = f"""
-        You are Rosella from Independence Care. A caregiver needs help.
-        
-        Caregiver: {user_info.get('user_name')}
-        Issue Type: {scenario}
-        Message: "{message}"
+        logger.debug("Detected scenario: %s", scenario)
         
-        Respond professionally as Rosella following company scripts.
-        Start with: "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!"
-        
-        Then address their specific {scenario.lower()} appropriately.
-        """
-        
-        print("🤖 Calling Gemini API...")
-        try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
-            print("✅ Gemini API responded successfully")
-        except Exception as e:
-            print(f"❌ Gemini API error: {e}")
-            raise e
-        
-        suggestions = {
-            "Schedule Issue": ["Check current schedule", "Contact coordinator", "Provide client name"],
-            "Location Issue": ["I'm at client's house", "GPS isn't working", "I stopped for supplies"],
-            "Phone Issue": ["Use client's phone", "My app isn't working", "Update phone number"],
-            "Timing Issue": ["I can stay late", "Make up hours tomorrow", "Had an emergency"],
-            "General Inquiry": ["Can you help?", "Who should I contact?", "What's next?"]
-        }
+        cache_key = f"assistant:{scenario}"
+        user_name = user_info.get('user_name', '')
+        cached = semantic_cache.lookup(cache_key, message, user_name)
+        if cached is not None:
+            logger.debug("Reusing reply cached for a similar message")
+            response_text = cached['response']
+        else:
+            prompt = self.build_prompt(user_info, message, scenario)
+            
+            logger.debug("Calling Gemini API")
+            # Failures propagate to the endpoint, which logs them and falls back
+            response = await invoke_llm(prompt, node=cache_key, llm=self.llm,
+                                        user_name=user_name)
+            logger.debug("Gemini API responded")
+            response_text = response.content
+            semantic_cache.store(cache_key, message, {'response': response_text}, user_name)
         
         return {
-            'response': response.content,
+            'response': response_text,
             'scenario_detected': scenario,
-            'suggestions': suggestions.get(scenario, [])
+            'suggestions': SCENARIO_SUGGESTIONS.get(scenario, [])
         }
+    
+    async def stream_message(self, user_info: Dict, message: str) -> AsyncIterator[Dict]:
+        """Stream the reply: scenario and suggestions first, then text chunks as Gemini produces them"""
+        scenario = self.analyze_scenario(message, user_info.get('reason_for_contact', ''))
+        yield {
+            'type': 'meta',
+            'scenario_detected': scenario,
+            'suggestions': SCENARIO_SUGGESTIONS.get(scenario, [])
+        }
+        
+        cache_key = f"assistant:{scenario}"
+        user_name = user_info.get('user_name', '')
+        cached = semantic_cache.lookup(cache_key, message, user_name)
+        if cached is not None:
+            yield {'type': 'token', 'content': cached['response']}
+            return
+        
+        prompt = self.build_prompt(user_info, message, scenario)
+        parts = []
+        async for chunk in stream_llm(prompt, node=cache_key, llm=self.llm):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield {'type': 'token', 'content': chunk.content}
+        semantic_cache.store(cache_key, message, {'response': "".join(parts)}, user_name)
 
 ai_assistant = CaregiverAI() 
\ No newline at end of file
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Load test showing how many chats one event loop keeps in flight.
+
+Every LLM-backed workflow is driven against FakeLLM at increasing
+concurrency. With non-blocking ainvoke calls, throughput grows with the
+number of concurrent chats instead of staying pinned at 1/latency.
+
+Run from the backend directory:
+    python -m benchmarks.bench_async_llm
+"""
+import asyncio
+import contextlib
+import io
+import time
+
+import ai_workflows
+import langgraph_workflows
+import workflows
+from benchmarks.fake_llm import FakeLLM
+from llm_client import set_llm
+
+USER_INFO = {
+    'user_name': 'Load Test',
+    'contact_number': '+1234567890',
+    'reason_for_contact': 'Clock-in issue',
+}
+MESSAGES = [
+    "My schedule is missing from the app",
+    "GPS says I'm outside the client's address",
+    "I called the IVR from my own phone",
+    "I clocked in late because of traffic",
+    "I have a general question",
+]
+
+
+def install_fake_llm(latency: float) -> FakeLLM:
+    fake = FakeLLM(latency=latency)
+    set_llm(fake)
+    return fake
+
+
+async def drive(backend, concurrency: int, requests_per_worker: int):
+    async def worker(worker_id: int):
+        for i in range(requests_per_worker):
+            message = MESSAGES[(worker_id + i) % len(MESSAGES)]
+            if backend is workflows.caregiver_workflows:
+                await backend.process_message(USER_INFO, message, conversation_id=f"load-{worker_id}-{i}")
+            else:
+                await backend.process_message(USER_INFO, message)
+
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+
+
+def main(latency: float = 0.2, requests_per_worker: int = 3):
+    backends = [
+        ("ai_workflows", ai_workflows.ai_assistant),
+        ("workflows", workflows.caregiver_workflows),
+        ("langgraph_workflows", langgraph_workflows.LangGraphWorkflows()),
+    ]
+    for name, backend in backends:
+        print(f"{name} (fake LLM latency {latency * 1000:.0f} ms)")
+        for concurrency in (1, 10, 100, 500):
+            fake = install_fake_llm(latency)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # silence per-request prints
+                asyncio.run(drive(backend, concurrency, requests_per_worker))
+            elapsed = time.perf_counter() - start
+            chats = concurrency * requests_per_worker
+            print(f"  concurrency {concurrency:>4}: {chats / elapsed:>8.1f} chats/sec, "
+                  f"{fake.calls:>5} LLM calls, peak {fake.max_in_flight:>4} in flight")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for scenario classification cost per message.
+
+Run from the backend directory:
+    python -m benchmarks.bench_classifier
+"""
+import random
+import time
+
+from scenario_classifier import scenario_classifier
+
+MESSAGES = [
+    "My schedule is missing from the app",
+    "GPS says I'm outside the client's address",
+    "I called the IVR from my own phone number",
+    "I clocked in late because of traffic",
+    "The calendar is not showing my client today",
+    "Hi, I just have a general question about my paycheck",
+    "Initial contact - user just registered",
+    "I forgot to clock out yesterday evening after my hours ended",
+]
+REASONS = ["", "Schedule problem", "Clock-in issue", "Question about my visit"]
+
+
+def legacy_classify(message: str, reason: str) -> str:
+    """The per-request substring scan the classifier replaced"""
+    combined = f"{reason} {message}".lower()
+    if any(word in combined for word in ["schedule", "calendar", "missing", "not showing", "removed"]):
+        return "Schedule Issue"
+    elif any(word in combined for word in ["location", "gps", "outside", "range", "distance", "address"]):
+        return "Location Issue"
+    elif any(word in combined for word in ["phone", "number", "call", "ivr", "registered"]):
+        return "Phone Issue"
+    elif any(word in combined for word in ["late", "early", "time", "clock", "hours", "forgot"]):
+        return "Timing Issue"
+    return "General Inquiry"
+
+
+def run(classify, samples) -> float:
+    start = time.perf_counter()
+    for message, reason in samples:
+        classify(message, reason)
+    return time.perf_counter() - start
+
+
+def main(count: int = 10_000, rounds: int = 5):
+    rng = random.Random(42)
+    samples = [(rng.choice(MESSAGES), rng.choice(REASONS)) for _ in range(count)]
+
+    for name, classify in [("legacy any() scan", legacy_classify),
+                           ("compiled classifier", scenario_classifier.classify)]:
+        elapsed = min(run(classify, samples) for _ in range(rounds))
+        per_message_us = elapsed / count * 1e6
+        core_share = per_message_us * 10_000 / 1e6 * 100
+        print(f"{name:>20}: {per_message_us:6.2f} us/message, "
+              f"{count / elapsed:>10,.0f} messages/sec, "
+              f"{core_share:5.2f}% of one core at 10k messages/sec")
+
+
+if __name__ == "__main__":
+    main()
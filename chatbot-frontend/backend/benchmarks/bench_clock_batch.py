@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Throughput of /clock-events/batch against one /clock-in or /clock-out
+request per event, for a shift-change burst of events.
+
+Requests go through the ASGI app in-process (no network), so the numbers
+are the server-side cost per event.
+
+Run from the backend directory:
+    python -m benchmarks.bench_clock_batch
+"""
+import asyncio
+import contextlib
+import io
+import random
+import time
+
+import httpx
+
+from main import app
+
+
+def make_events(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        late = rng.choice([0, 0, 0, 5, 20])
+        events.append({
+            "event_type": rng.choice(["clock_in", "clock_out"]),
+            "caregiver_name": rng.choice(["Mary Caregiver", "Other Caregiver"]),
+            "client_name": "John Client",
+            "phone_number": rng.choice(["+1234567890", "+1234567890", "+15550100"]),
+            "location": {"lat": 40.7128 + rng.uniform(-0.01, 0.01), "lng": -74.0060},
+            "scheduled_time": "2024-01-15T09:00:00Z",
+            "actual_time": f"2024-01-15T09:{late:02d}:00Z",
+            "has_schedule": True,
+        })
+    return events
+
+
+async def per_request(client: httpx.AsyncClient, events) -> float:
+    start = time.perf_counter()
+    for event in events:
+        body = {k: v for k, v in event.items() if k != "event_type"}
+        if event["event_type"] == "clock_in":
+            response = await client.post("/clock-in", json=body)
+        else:
+            body.pop("has_schedule")
+            response = await client.post("/clock-out", json=body)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def batched(client: httpx.AsyncClient, events) -> float:
+    start = time.perf_counter()
+    response = await client.post("/clock-events/batch", json=events)
+    response.raise_for_status()
+    assert len(response.json()) == len(events)
+    return time.perf_counter() - start
+
+
+async def run(count: int):
+    events = make_events(count)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        with contextlib.redirect_stdout(io.StringIO()):
+            await batched(client, events[:10])  # warm up caches
+            single = await per_request(client, events)
+            batch = await batched(client, events)
+    print(f"{count:6d} events   per-request {count / single:9.0f} events/s   "
+          f"batch {count / batch:9.0f} events/s   ({single / batch:.1f}x)")
+
+
+def main():
+    for count in (100, 1000, 5000):
+        asyncio.run(run(count))
+
+
+if __name__ == "__main__":
+    main()
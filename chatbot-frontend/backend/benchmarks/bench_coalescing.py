@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+A burst of caregivers reporting the same outage at once: /chat with the
+same message from many different caregivers, with identical prompts
+coalesced into one LLM call and without.
+
+The Gemini backend runs against FakeLLM; llm_gateway's per-model cap
+applies as in production, so uncoalesced calls queue behind it.
+
+Run from the backend directory:
+    python -m benchmarks.bench_coalescing
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import llm_client
+import main
+from benchmarks.fake_llm import FakeLLM
+from config import Config
+from single_flight import llm_flights
+from structured_logging import setup_logging
+
+MESSAGE = "The HHA app keeps crashing when I try to clock in"
+
+
+async def burst(caregivers: int):
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def chat(number: int):
+            start = time.perf_counter()
+            response = await client.post("/chat", json={
+                "user_name": f"Caregiver {number:04d}",
+                "contact_number": f"+1555{number:07d}",
+                "reason_for_contact": "App issue",
+                "message": MESSAGE,
+            })
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(chat(number) for number in range(caregivers)))
+    return latencies
+
+
+def main_(caregivers: int = 200, latency: float = 0.5):
+    setup_logging(level="ERROR")
+    Config.CHAT_BACKEND = "gemini"
+    print(f"{caregivers} caregivers at once, FakeLLM latency {latency * 1000:.0f} ms")
+    for enabled in (False, True):
+        llm_flights.enabled = enabled
+        fake = FakeLLM(latency=latency)
+        llm_client.set_llm(fake)
+        before = llm_flights.stats()['coalesced']
+        start = time.perf_counter()
+        latencies = asyncio.run(burst(caregivers))
+        elapsed = time.perf_counter() - start
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"  coalescing {'on ' if enabled else 'off'}   LLM calls {fake.calls:4d}   "
+              f"coalesced {llm_flights.stats()['coalesced'] - before:4d}   burst {elapsed * 1000:6.0f} ms   "
+              f"p50 {quantiles[49] * 1000:6.0f} ms   p99 {quantiles[98] * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+    main_()
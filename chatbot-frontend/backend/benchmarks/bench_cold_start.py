@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of the backend modules, each measured in a fresh interpreter.
+
+"import" is the time to import the module (what a new worker pays before it
+can accept traffic); "first use" adds building the backend object the way
+the first request does.
+
+Run from the backend directory:
+    python -m benchmarks.bench_cold_start
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = [
+    ("main:app", "import main", "main.app"),
+    ("simple_ai", "import simple_ai", "simple_ai.simple_ai"),
+    ("ai_workflows", "import ai_workflows", "ai_workflows.ai_assistant.llm"),
+    ("workflows", "import workflows", "workflows.caregiver_workflows"),
+    ("langgraph_workflows", "import langgraph_workflows",
+     "langgraph_workflows.LangGraphWorkflows().get_workflow('general')"),
+]
+
+PROBE = """
+import time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+{import_stmt}
+imported = time.perf_counter()
+{first_use}
+used = time.perf_counter()
+print(imported - start, used - start)
+"""
+
+
+def measure(import_stmt: str, first_use: str, rounds: int):
+    imports, first_uses = [], []
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(rounds):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(import_stmt=import_stmt, first_use=first_use)],
+            cwd=backend_dir, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        imports.append(float(output[0]))
+        first_uses.append(float(output[1]))
+    return statistics.median(imports), statistics.median(first_uses)
+
+
+def main(rounds: int = 5):
+    for name, import_stmt, first_use in SCENARIOS:
+        imported, used = measure(import_stmt, first_use, rounds)
+        print(f"{name:<22} import {imported * 1000:7.1f} ms   first use {used * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the backend endpoints, per chat backend.
+
+Drives /chat, /chat/stream, /clock-in, /clock-out and /clock-events/batch
+at a fixed concurrency and reports throughput, p50/p95/p99 latency and
+resident memory, keeping the best of a few rounds to damp machine noise.
+Chat endpoints run once per backend (CHAT_BACKEND "simple", "gemini",
+"workflows" and "langgraph") against FakeLLM; the clock endpoints do not
+depend on the backend and run once.
+
+Two transports:
+
+- asgi: requests go through the app in-process (no network), so the
+  numbers are the server-side cost. Memory is this process's.
+- http: each backend gets a fresh uvicorn server (benchmarks.fake_server)
+  driven over TCP. Memory is the server's, so backends compare fairly.
+
+Results are written as JSON (by default benchmarks/results/<commit>.json).
+``--compare`` checks them against an earlier file and exits non-zero when
+throughput or p99 latency regressed by more than ``--tolerance``.
+
+Run from the backend directory:
+    python -m benchmarks.bench_endpoints
+    python -m benchmarks.bench_endpoints --transport both --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+BACKENDS = ("simple", "gemini", "workflows", "langgraph")
+CHAT_ENDPOINTS = ("/chat", "/chat/stream")
+CLOCK_ENDPOINTS = ("/clock-in", "/clock-out", "/clock-events/batch")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+MESSAGES = [
+    ("Clock-in issue", "My schedule is missing from the app"),
+    ("GPS problem", "GPS says I'm outside the client's address"),
+    ("Phone problem", "I called the IVR from my own phone"),
+    ("Late arrival", "I clocked in late because of traffic"),
+    ("Question", "I have a general question"),
+]
+
+# Every request gets a fresh number so clock events are never duplicates and
+# chat prompts never coalesce
+_sequence = itertools.count()
+
+
+def chat_body(number: int) -> Dict[str, Any]:
+    reason, message = MESSAGES[number % len(MESSAGES)]
+    return {
+        "user_name": f"Caregiver {number}",
+        "contact_number": "+1234567890",
+        "reason_for_contact": reason,
+        "message": f"{message} (ticket {number})",
+    }
+
+
+def clock_event(number: int, event_type: str = "clock_in") -> Dict[str, Any]:
+    rng = random.Random(number)
+    late = rng.choice([0, 0, 0, 5, 20])
+    return {
+        "event_type": event_type,
+        "caregiver_name": f"Caregiver {number}",
+        "client_name": "John Client",
+        "phone_number": rng.choice(["+1234567890", "+1234567890", "+15550100"]),
+        "location": {"lat": 40.7128 + rng.uniform(-0.01, 0.01), "lng": -74.0060},
+        "scheduled_time": "2024-01-15T09:00:00Z",
+        "actual_time": f"2024-01-15T09:{late:02d}:00Z",
+        "has_schedule": True,
+    }
+
+
+def request_for(endpoint: str, batch_size: int) -> Callable[[int], Dict[str, Any]]:
+    """Body builder for an endpoint, given the request's sequence number"""
+    if endpoint in CHAT_ENDPOINTS:
+        return chat_body
+    if endpoint == "/clock-in":
+        return lambda number: {k: v for k, v in clock_event(number).items() if k != "event_type"}
+    if endpoint == "/clock-out":
+        return lambda number: {k: v for k, v in clock_event(number, "clock_out").items()
+                               if k not in ("event_type", "has_schedule")}
+    return lambda number: [clock_event(number * batch_size + i, "clock_in" if i % 2 else "clock_out")
+                           for i in range(batch_size)]
+
+
+def memory_mb(pid: Any = "self") -> Dict[str, Optional[float]]:
+    """Current and peak resident set size of a process, from /proc (None where unavailable)"""
+    values: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    values["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    values["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def drive(client: httpx.AsyncClient, endpoint: str, body: Callable[[int], Any],
+                requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            payload = body(next(_sequence))
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=payload)
+                ok = response.is_success
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else None,
+    }
+
+
+async def run_endpoints(client: httpx.AsyncClient, endpoints, args, memory: Callable[[], Dict]) -> List[Dict]:
+    """The best of ``args.rounds`` runs per endpoint (by throughput), after a warm-up run"""
+    results = []
+    for endpoint in endpoints:
+        body = request_for(endpoint, args.batch_size)
+        requests = max(args.requests // 10, args.concurrency) if endpoint == "/clock-events/batch" else args.requests
+        await drive(client, endpoint, body, max(requests // 10, args.concurrency), args.concurrency)
+        rounds = [await drive(client, endpoint, body, requests, args.concurrency) for _ in range(args.rounds)]
+        best = max(rounds, key=lambda result: result["throughput_rps"])
+        results.append({"endpoint": endpoint, **best, **memory()})
+    return results
+
+
+def run_asgi(args) -> List[Dict]:
+    import llm_client
+    import main
+    from benchmarks.fake_llm import FakeLLM
+    from config import Config
+
+    async def run(endpoints):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_endpoints(client, endpoints, args, memory_mb)
+
+    results = []
+    for backend in args.backends:
+        Config.CHAT_BACKEND = backend
+        llm_client.set_llm(FakeLLM(latency=args.llm_latency))
+        for result in asyncio.run(run(CHAT_ENDPOINTS)):
+            results.append({"transport": "asgi", "backend": backend, **result})
+    Config.CHAT_BACKEND = "simple"
+    for result in asyncio.run(run(CLOCK_ENDPOINTS)):
+        results.append({"transport": "asgi", "backend": "-", **result})
+    return results
+
+
+def start_server(backend: str, args) -> subprocess.Popen:
+    env = {**os.environ, "CHAT_BACKEND": backend, "LOG_LEVEL": "WARNING"}
+    server = subprocess.Popen(
+        [sys.executable, "-W", "ignore", "-m", "benchmarks.fake_server",
+         "--port", str(args.port), "--llm-latency", str(args.llm_latency)],
+        cwd=Path(__file__).parent.parent, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server for {backend} exited with status {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"Server for {backend} did not start within 60s")
+
+
+def run_http(args) -> List[Dict]:
+    async def run(endpoints, server):
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits,
+                                     timeout=60) as client:
+            return await run_endpoints(client, endpoints, args, lambda: memory_mb(server.pid))
+
+    results = []
+    for backend in args.backends:
+        server = start_server(backend, args)
+        try:
+            endpoints = CHAT_ENDPOINTS + (CLOCK_ENDPOINTS if backend == args.backends[0] else ())
+            for result in asyncio.run(run(endpoints, server)):
+                label = "-" if result["endpoint"] in CLOCK_ENDPOINTS else backend
+                results.append({"transport": "http", "backend": label, **result})
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def result_key(result: Dict) -> tuple:
+    return result["transport"], result["backend"], result["endpoint"]
+
+
+def print_results(results: List[Dict]) -> None:
+    print(f"{'transport':9s} {'backend':10s} {'endpoint':20s} {'req/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} "
+          f"{'p99 ms':>8s} {'errors':>6s} {'RSS MB':>7s}")
+    for result in results:
+        rss = f"{result['rss_mb']:7.1f}" if result["rss_mb"] is not None else "      -"
+        print(f"{result['transport']:9s} {result['backend']:10s} {result['endpoint']:20s} "
+              f"{result['throughput_rps']:9.1f} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+              f"{result['p99_ms']:8.2f} {result['errors']:6d} {rss}")
+
+
+def compare(results: List[Dict], baseline_path: Path, tolerance: float) -> int:
+    """Print changes against a baseline file; returns the number of regressions"""
+    baseline = {result_key(result): result for result in json.loads(baseline_path.read_text())["results"]}
+    regressions = 0
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0%}):")
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None or not before["throughput_rps"]:
+            continue
+        throughput = result["throughput_rps"] / before["throughput_rps"] - 1
+        p99 = result["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0.0
+        regressed = throughput < -tolerance or p99 > tolerance
+        regressions += regressed
+        print(f"  {' '.join(result_key(result)):40s} req/s {throughput:+7.1%}   p99 {p99:+7.1%}"
+              f"{'   REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend endpoints per chat backend")
+    parser.add_argument("--transport", choices=("asgi", "http", "both"), default="asgi")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint and round")
+    parser.add_argument("--rounds", type=int, default=3, help="runs per endpoint; the best is kept")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=100, help="events per /clock-events/batch request")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="FakeLLM seconds to first token")
+    parser.add_argument("--port", type=int, default=8001, help="port for the http transport's server")
+    parser.add_argument("--output", type=Path, help="JSON results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = []
+    if args.transport in ("asgi", "both"):
+        from structured_logging import setup_logging
+        setup_logging(level="WARNING")
+        results += run_asgi(args)
+    if args.transport in ("http", "both"):
+        results += run_http(args)
+    print_results(results)
+
+    revision = git_revision()
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        # Results are per machine; keep them out of git
+        (RESULTS_DIR / ".gitignore").write_text("*\n")
+        output = RESULTS_DIR / f"{revision}.json"
+    output.write_text(json.dumps({
+        "revision": revision,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }, indent=2, default=str))
+    print(f"\nResults written to {output}")
+
+    if args.compare is not None and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+"Which client is this clock-in near" with the service-area grid index
+versus a linear haversine scan over every client, plus incremental
+re-sync cost when a few schedules change.
+
+Run from the backend directory:
+    python -m benchmarks.bench_geofence
+"""
+import random
+import time
+
+from geofence import ServiceAreaIndex, haversine_miles
+
+
+def make_clients(count: int, rng: random.Random):
+    # Spread over roughly the five boroughs of New York
+    return {
+        f"Client {i}": {
+            "lat": rng.uniform(40.50, 40.92),
+            "lng": rng.uniform(-74.25, -73.70),
+            "radius_miles": rng.choice([0.25, 0.5, 0.5, 1.0]),
+        }
+        for i in range(count)
+    }
+
+
+def linear_scan(clients, lat: float, lng: float):
+    matches = []
+    for client, area in clients.items():
+        distance = haversine_miles(lat, lng, area["lat"], area["lng"])
+        if distance <= area["radius_miles"]:
+            matches.append((distance, client))
+    return [client for _, client in sorted(matches)]
+
+
+def main(queries: int = 2000):
+    rng = random.Random(11)
+    for count in (1000, 10000, 50000):
+        clients = make_clients(count, rng)
+        index = ServiceAreaIndex()
+        start = time.perf_counter()
+        index.sync(clients)
+        build = time.perf_counter() - start
+
+        points = [(rng.uniform(40.50, 40.92), rng.uniform(-74.25, -73.70)) for _ in range(queries)]
+        start = time.perf_counter()
+        results = [index.nearby(lat, lng) for lat, lng in points]
+        indexed = (time.perf_counter() - start) / queries
+
+        scan_points = points[:200]
+        start = time.perf_counter()
+        expected = [linear_scan(clients, lat, lng) for lat, lng in scan_points]
+        scanned = (time.perf_counter() - start) / len(scan_points)
+        assert [[m.client for m in r] for r in results[:200]] == expected
+
+        # A handful of schedules change: move 10 clients, drop 5, add 5
+        changed = dict(clients)
+        for client in list(changed)[:10]:
+            changed[client] = dict(changed[client], lat=changed[client]["lat"] + 0.01)
+        for client in list(changed)[10:15]:
+            del changed[client]
+        changed.update({f"New client {i}": clients[f"Client {i}"] for i in range(5)})
+        start = time.perf_counter()
+        changes = index.sync(changed)
+        resync = time.perf_counter() - start
+
+        print(f"{count:6d} clients   build {build * 1000:7.1f} ms   nearby {indexed * 1e6:6.1f} us   "
+              f"linear scan {scanned * 1e6:8.1f} us   re-sync {changes} {resync * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
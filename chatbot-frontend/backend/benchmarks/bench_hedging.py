@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tail latency of /chat when a share of LLM calls are slow to start: waiting
+for every reply against hedging with the scripted reply after
+CHAT_HEDGE_SECONDS, the late reply following on the next turn.
+
+The Gemini backend runs against FakeLLM, with ``slow_rate`` of its calls
+taking ``slow_latency`` to answer; caregivers take ``think_seconds``
+to write their next message, and stay under the gateway's concurrency cap.
+
+Run from the backend directory:
+    python -m benchmarks.bench_hedging
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import llm_client
+import main
+from benchmarks.fake_llm import FakeLLM
+from config import Config
+from single_flight import llm_flights
+from structured_logging import setup_logging
+
+MESSAGES = ["My schedule is missing from the app", "It's Mrs. Lopez, I see her every Tuesday"]
+
+
+async def conversations(count: int, think_seconds: float):
+    latencies, follow_ups = [], 0
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def conversation(number: int):
+            nonlocal follow_ups
+            conversation_id = None
+            for turn, message in enumerate(MESSAGES):
+                if turn:
+                    await asyncio.sleep(think_seconds)
+                start = time.perf_counter()
+                response = await client.post("/chat", json={
+                    "user_name": f"Caregiver {number:04d}",
+                    "contact_number": f"+1555{number:07d}",
+                    "reason_for_contact": "Schedule",
+                    "message": message,
+                    "conversation_id": conversation_id,
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                body = response.json()
+                conversation_id = body.get('conversation_id')
+                follow_ups += bool(body.get('follow_up'))
+
+        await asyncio.gather(*(conversation(number) for number in range(count)))
+    return latencies, follow_ups
+
+
+def main_(count: int = 12, latency: float = 0.3, slow_rate: float = 0.1, slow_latency: float = 3.0,
+          hedge_seconds: float = 1.0, think_seconds: float = 5.0):
+    setup_logging(level="ERROR")
+    Config.CHAT_BACKEND = "gemini"
+    # Every conversation sends the same messages; keep their calls apart
+    llm_flights.enabled = False
+    print(f"{count} conversations of {len(MESSAGES)} turns, FakeLLM latency {latency * 1000:.0f} ms, "
+          f"{slow_rate:.0%} of calls {slow_latency * 1000:.0f} ms")
+    for hedge in (0.0, hedge_seconds):
+        Config.CHAT_HEDGE_SECONDS = hedge
+        llm_client.set_llm(FakeLLM(latency=latency, slow_rate=slow_rate, slow_latency=slow_latency,
+                                     token_interval=0.0))
+        latencies, follow_ups = asyncio.run(conversations(count, think_seconds))
+        quantiles = statistics.quantiles(latencies, n=100)
+        label = f"hedge {hedge * 1000:.0f} ms" if hedge else "no hedge"
+        print(f"  {label:>14}   p50 {quantiles[49] * 1000:6.0f} ms   p95 {quantiles[94] * 1000:6.0f} ms   "
+              f"p99 {quantiles[98] * 1000:6.0f} ms   max {max(latencies) * 1000:6.0f} ms   "
+              f"follow-ups {follow_ups}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+LLM calls and latency per /chat turn on the LangGraph backend: running the
+whole graph from its entry point on every request (as before checkpointing)
+against resuming the conversation's checkpoint for one step per turn.
+
+Each conversation sends the same few caregiver messages; FakeLLM stands in
+for Gemini and the checkpoints go to a throwaway SQLite file.
+
+Run from the backend directory:
+    python -m benchmarks.bench_langgraph_turns
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import llm_client
+from benchmarks.fake_llm import FakeLLM
+from config import Config
+
+USER_INFO = {'user_name': "Ann", 'contact_number': "555-0100", 'reason_for_contact': "Schedule"}
+MESSAGES = [
+    "My schedule is missing from the app",
+    "It's Mrs. Lopez, I see her every Tuesday",
+    "I already checked the app again",
+    "OK, thank you",
+]
+
+
+async def whole_graph(langgraph_workflows, graphs, conversation_id: str, message: str, history):
+    """One request the old way: a fresh state through the uncheckpointed graph until it ends"""
+    history.append({'role': 'user', 'content': message})
+    scenario_type = langgraph_workflows.langgraph_assistant.analyze_scenario(message, USER_INFO['reason_for_contact'])
+    result = await graphs[scenario_type].ainvoke({
+        'conversation_id': conversation_id,
+        'user_info': USER_INFO,
+        'messages': list(history),
+        'scenario_type': scenario_type,
+        'current_step': 'start',
+        'collected_data': {},
+        'suggestions': [],
+        'workflow_complete': False,
+    })
+    history.append(result['messages'][-1])
+
+
+async def run(mode: str, conversations: int, fake: FakeLLM):
+    import langgraph_workflows
+    assistant = langgraph_workflows.langgraph_assistant
+    graphs = {}
+    if mode == "whole graph":
+        # The compiled graphs themselves have no checkpointer
+        graphs = {name: assistant.get_workflow(name) for name in assistant.builders}
+
+    calls, latencies = [], []
+    for number in range(conversations):
+        conversation_id, history = f"bench-{mode}-{number}", []
+        for message in MESSAGES:
+            before = fake.calls
+            start = time.perf_counter()
+            if graphs:
+                await whole_graph(langgraph_workflows, graphs, conversation_id, message, history)
+            else:
+                await assistant.process_message(USER_INFO, message, conversation_id=conversation_id)
+            latencies.append(time.perf_counter() - start)
+            calls.append(fake.calls - before)
+    await langgraph_workflows.checkpoint_store.close()
+    return calls, latencies
+
+
+def main(conversations: int = 20, latency: float = 0.05):
+    # Read when the checkpoint database is first opened
+    Config.LANGGRAPH_CHECKPOINT_DB_PATH = os.path.join(tempfile.mkdtemp(), "checkpoints.db")
+    print(f"{conversations} conversations of {len(MESSAGES)} turns, FakeLLM latency {latency * 1000:.0f} ms")
+    for mode in ("whole graph", "one step"):
+        fake = FakeLLM(latency=latency, token_interval=0.0)
+        llm_client.set_llm(fake)
+        calls, latencies = asyncio.run(run(mode, conversations, fake))
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"{mode:>12}: LLM calls/turn mean {statistics.mean(calls):.2f} max {max(calls)}, "
+              f"latency p50 {quantiles[49] * 1000:.0f} ms p95 {quantiles[94] * 1000:.0f} ms "
+              f"max {max(latencies) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+/chat through llm_gateway while FakeLLM misbehaves: a healthy provider,
+transient errors, latency spikes, an outage and the recovery after it.
+
+For each phase it reports chat latency, how many replies came from the
+scripted fallbacks, the provider calls made and the peak concurrency the
+provider saw (capped by the gateway). Gateway timeouts and the breaker
+cooldown are shortened so the run takes seconds.
+
+Run from the backend directory:
+    python -m benchmarks.bench_llm_gateway
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import llm_client
+import main
+from benchmarks.fake_llm import FakeLLM
+from config import Config
+from llm_gateway import llm_gateway
+from structured_logging import setup_logging
+
+BODY = {
+    "user_name": "Load Test",
+    "contact_number": "+1234567890",
+    "reason_for_contact": "Clock-in issue",
+    "message": "My schedule is missing from the app",
+}
+PHASES = [
+    ("healthy", dict(latency=0.05)),
+    ("20% errors", dict(latency=0.05, error_rate=0.2)),
+    ("5% 30s stalls", dict(latency=0.05, slow_rate=0.05)),
+    ("outage", dict(latency=0.05, error_rate=1.0)),
+    ("recovered", dict(latency=0.05)),
+]
+
+
+def fallback_count(reason: str) -> float:
+    return main.chat_fallbacks.value("/chat", reason)
+
+
+async def drive(chats: int, concurrency: int):
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def worker(count: int):
+            for _ in range(count):
+                start = time.perf_counter()
+                response = await client.post("/chat", json=BODY)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                # Scripted replies never suspend in-process; yield as a socket would,
+                # or LLM calls' timers starve behind them
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(worker(chats // concurrency) for _ in range(concurrency)))
+    return latencies
+
+
+def main_(chats: int = 1000, concurrency: int = 100):
+    setup_logging(level="ERROR")
+    Config.CHAT_BACKEND = "gemini"
+    llm_gateway.attempt_timeout = 0.5
+    llm_gateway.timeout = 2.0
+    llm_gateway.backoff_base = 0.05
+    llm_gateway.breaker_failures = 10
+    llm_gateway.breaker_cooldown = 1.0
+    print(f"{chats} chats per phase, {concurrency} concurrent, gateway cap {llm_gateway.max_concurrency} per model")
+    for name, options in PHASES:
+        if name == "recovered":
+            time.sleep(llm_gateway.breaker_cooldown)  # let the circuit half-open
+        fake = FakeLLM(**options)
+        llm_client.set_llm(fake)
+        degraded, errors = fallback_count("degraded"), fallback_count("error")
+        start = time.perf_counter()
+        latencies = asyncio.run(drive(chats, concurrency))
+        elapsed = time.perf_counter() - start
+        quantiles = statistics.quantiles(latencies, n=100)
+        circuit = llm_gateway.stats().get("FakeLLM", {}).get("circuit")
+        print(f"  {name:14s} {len(latencies) / elapsed:7.0f} chats/s   p50 {quantiles[49] * 1000:6.0f} ms   "
+              f"p99 {quantiles[98] * 1000:6.0f} ms   scripted {fallback_count('degraded') - degraded:4.0f}   "
+              f"failed {fallback_count('error') - errors:3.0f}   LLM calls {fake.calls:5d}   "
+              f"peak in flight {fake.max_in_flight:3d}   circuit {circuit}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-request cost of logging on /chat: logging off (WARNING), DEBUG lines
+sampled, every DEBUG line through the queue, and every DEBUG line written
+synchronously by the request handler.
+
+The Gemini backend runs against FakeLLM with no latency, so the chat path
+is as short as it gets and logging is a large share of it. Log lines go to
+a temporary file, then to a slow sink standing in for a terminal or a pipe
+whose reader lags behind (where print() used to stall the event loop).
+
+Run from the backend directory:
+    python -m benchmarks.bench_logging
+"""
+import asyncio
+import io
+import tempfile
+import time
+
+import httpx
+
+import llm_client
+from benchmarks.fake_llm import FakeLLM
+from config import Config
+from main import app
+from structured_logging import setup_logging
+
+BODY = {
+    "user_name": "Load Test",
+    "contact_number": "+1234567890",
+    "reason_for_contact": "Clock-in issue",
+    "message": "My schedule is missing from the app",
+}
+MODES = [
+    ("off (WARNING)", dict(level="WARNING")),
+    ("DEBUG sampled 10%", dict(level="DEBUG", debug_sample_rate=0.1)),
+    ("DEBUG all, queued", dict(level="DEBUG", debug_sample_rate=1.0)),
+    ("DEBUG all, synchronous", dict(level="DEBUG", debug_sample_rate=1.0, use_queue=False)),
+]
+
+
+class SlowSink(io.StringIO):
+    """A stream that takes ``delay`` seconds per write"""
+
+    def __init__(self, delay: float = 0.0002):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return len(text)
+
+
+async def drive(requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):  # warm up
+            await client.post("/chat", json=BODY)
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.post("/chat", json=BODY)
+            response.raise_for_status()
+        return time.perf_counter() - start
+
+
+def run(sink, requests: int, rounds: int):
+    best = {name: float("inf") for name, _ in MODES}
+    # Modes are interleaved so machine noise hits them all alike
+    for _ in range(rounds):
+        for name, options in MODES:
+            setup_logging(stream=sink, **options)
+            best[name] = min(best[name], asyncio.run(drive(requests)))
+    baseline = best[MODES[0][0]] / requests * 1e6
+    for name, elapsed in best.items():
+        per_request = elapsed / requests * 1e6
+        print(f"  {name:24s} {per_request:7.1f} us/request   {per_request - baseline:+7.1f} us vs off")
+
+
+def main(requests: int = 2000, rounds: int = 5):
+    Config.CHAT_BACKEND = "gemini"
+    llm_client.set_llm(FakeLLM(latency=0.0))
+    with tempfile.TemporaryFile("w+") as sink:
+        print("log file")
+        run(sink, requests, rounds)
+    print("slow sink (200 us per line)")
+    run(SlowSink(), requests // 4, rounds)
+    setup_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Schedule store at scale: CSV bulk-load time and "which shift does this
+clock event belong to" lookups.
+
+Run from the backend directory:
+    python -m benchmarks.bench_schedule_store
+"""
+import datetime
+import io
+import random
+import time
+
+from schedule_store import ScheduleStore
+
+
+def make_csv(shifts: int, caregivers: int, rng: random.Random) -> str:
+    rows = ["caregiver,client,phone,day,start,end"]
+    for i in range(shifts):
+        hour = rng.randrange(24)
+        client = rng.randrange(caregivers * 2)
+        rows.append(f"Caregiver {i % caregivers},Client {client},+1555{client:07d},"
+                    f"2024-01-{rng.randrange(1, 29):02d},{hour:02d}:00,{(hour + 4) % 24:02d}:00")
+    return "\n".join(rows)
+
+
+def main(queries: int = 20000):
+    rng = random.Random(5)
+    for shifts, caregivers in ((10000, 1000), (100000, 10000), (300000, 30000)):
+        text = make_csv(shifts, caregivers, rng)
+        store = ScheduleStore()
+        start = time.perf_counter()
+        store.load_csv(io.StringIO(text))
+        load = time.perf_counter() - start
+
+        events = [(f"Caregiver {rng.randrange(caregivers)}",
+                   datetime.datetime(2024, 1, rng.randrange(1, 29), rng.randrange(24), rng.randrange(60)))
+                  for _ in range(queries)]
+        start = time.perf_counter()
+        matched = sum(store.find_shift(caregiver, when) is not None for caregiver, when in events)
+        lookup = (time.perf_counter() - start) / queries
+
+        print(f"{shifts:7d} shifts   load {load:6.2f} s ({load / shifts * 1e6:5.1f} us/shift)   "
+              f"find_shift {lookup * 1e6:5.1f} us   matched {matched / queries:.0%}")
+
+
+if __name__ == "__main__":
+    main()
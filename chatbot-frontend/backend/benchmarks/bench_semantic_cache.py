@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+LLM calls avoided by the semantic reply cache on a repetitive workload.
+
+Caregivers word the same few problems in many ways; this replays a mix of
+paraphrases through CaregiverAI (against a local fake LLM) with the cache
+off and on, and reports LLM calls made, calls avoided and lookup cost.
+
+Run from the backend directory:
+    python -m benchmarks.bench_semantic_cache
+"""
+import asyncio
+import contextlib
+import io
+import random
+import time
+
+from benchmarks.fake_llm import FakeLLM
+from semantic_cache import SemanticCache
+import ai_workflows
+
+MESSAGES = [
+    "My schedule is missing", "my schedule is missing!", "My schedule is missing.",
+    "There is no schedule on my calendar", "there is no schedule on my calendar",
+    "GPS says I'm not at the client's house", "GPS says im not at the clients house",
+    "I can't find the client's phone number", "The app won't clock me in",
+    "I'm running late today", "Im running late today", "I am running late today",
+    "Who do I contact about my hours?",
+]
+USERS = ["Ann", "Ben", "Cara", "Dev"]
+
+
+async def replay(cache: SemanticCache, fake: FakeLLM, requests: int) -> float:
+    rng = random.Random(7)
+    ai_workflows.semantic_cache = cache
+    assistant = ai_workflows.CaregiverAI()
+    assistant.llm = fake
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(requests):
+            user_info = {'user_name': rng.choice(USERS), 'contact_number': '555-0100',
+                         'reason_for_contact': ''}
+            await assistant.process_message(user_info, rng.choice(MESSAGES))
+    return time.perf_counter() - start
+
+
+def main(requests: int = 500):
+    for enabled in (False, True):
+        fake = FakeLLM(latency=0.0)
+        cache = SemanticCache(enabled=enabled)
+        elapsed = asyncio.run(replay(cache, fake, requests))
+        stats = cache.stats()
+        print(f"cache {'on ' if enabled else 'off'}  llm calls {fake.calls:4d}  "
+              f"avoided {stats['llm_calls_avoided']:4d}  entries {stats['entries']:3d}  "
+              f"{elapsed / requests * 1e6:7.1f} us/request (excluding LLM latency)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Read/append latency of the session stores under concurrent writers.
+
+Each writer thread (or process, for SQLite) plays whole conversations:
+read the history, then append a user/assistant turn, as the workflow
+classes do on every request.
+
+Run from the backend directory:
+    python -m benchmarks.bench_session_store
+"""
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from conversation_store import ConversationStore
+from session_store import SQLiteSessionStore
+
+TURNS_PER_WRITER = 300
+REPLY = "Hello, this is Rosella, I am calling from Independence Care. " * 4
+
+
+def play(store, writer_id: int, turns: int) -> Dict[str, List[float]]:
+    reads, appends = [], []
+    for turn in range(turns):
+        conversation_id = f"writer-{writer_id}-{turn % 20}"
+        start = time.perf_counter()
+        store.get(conversation_id)
+        reads.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        store.append(conversation_id,
+                     {'role': 'user', 'content': f"message {turn}"},
+                     {'role': 'assistant', 'content': REPLY})
+        appends.append(time.perf_counter() - start)
+    return {'reads': reads, 'appends': appends}
+
+
+def _process_writer(args):
+    path, writer_id, turns = args
+    return play(SQLiteSessionStore(path=path), writer_id, turns)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(pct) - 1] * 1e6
+
+
+def report(label: str, results: List[Dict[str, List[float]]], elapsed: float, store=None):
+    reads = [s for result in results for s in result['reads']]
+    appends = [s for result in results for s in result['appends']]
+    line = (f"{label:<28} read p50 {percentile(reads, 50):7.1f} us  p99 {percentile(reads, 99):8.1f} us | "
+            f"append p50 {percentile(appends, 50):7.1f} us  p99 {percentile(appends, 99):8.1f} us | "
+            f"{len(appends) / elapsed:>8,.0f} turns/sec")
+    if store is not None and 'commits' in store.stats():
+        stats = store.stats()
+        line += f" | {stats['appends'] / max(stats['commits'], 1):.1f} appends/commit"
+    print(line)
+
+
+def run_threads(store, writers: int) -> None:
+    results: List[Dict[str, List[float]]] = [None] * writers
+
+    def worker(writer_id: int):
+        results[writer_id] = play(store, writer_id, TURNS_PER_WRITER)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report(f"{type(store).__name__} x{writers} threads", results, time.perf_counter() - start, store)
+
+
+def run_processes(path: str, writers: int) -> None:
+    with multiprocessing.Pool(writers) as pool:
+        start = time.perf_counter()
+        results = pool.map(_process_writer, [(path, w, TURNS_PER_WRITER) for w in range(writers)])
+        elapsed = time.perf_counter() - start
+    report(f"SQLiteSessionStore x{writers} procs", results, elapsed)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for writers in (1, 4, 16):
+            run_threads(ConversationStore(), writers)
+            run_threads(SQLiteSessionStore(path=os.path.join(tmp, f"threads-{writers}.db")), writers)
+            path = os.path.join(tmp, f"procs-{writers}.db")
+            SQLiteSessionStore(path=path)  # create the schema before the workers start
+            run_processes(path, writers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of the serve.py supervisor by worker count, with the
+app preloaded before forking and imported by each worker.
+
+Each configuration gets a fresh benchmarks.fake_server (FakeLLM in place of
+Gemini; the chat backend comes from CHAT_BACKEND as usual), driven over TCP
+by several client processes so the load generator is not the bottleneck.
+Memory is proportional set size (PSS: shared pages split between the
+processes sharing them) summed over the supervisor and its workers, and
+each worker's private memory.
+
+Throughput can only scale up to the machine's core count, which the
+clients share with the server.
+
+Run from the backend directory:
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --clients 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.bench_endpoints import percentile, request_for
+
+ENDPOINTS = ("/chat", "/clock-in")
+
+
+def load(port: int, endpoint: str, first: int, requests: int, concurrency: int) -> Tuple[List[float], int]:
+    """One client process: (latencies, errors) for ``requests`` requests"""
+    body = request_for(endpoint, batch_size=1)
+
+    async def run():
+        latencies, errors = [], 0
+        numbers = iter(range(first, first + requests))
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            async def worker():
+                nonlocal errors
+                for number in numbers:
+                    start = time.perf_counter()
+                    try:
+                        ok = (await client.post(endpoint, json=body(number))).is_success
+                    except httpx.HTTPError:
+                        ok = False
+                    if ok:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        errors += 1
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors
+
+    return asyncio.run(run())
+
+
+def memory(pid: int) -> Dict[str, float]:
+    """PSS and private memory of a process in MB, from /proc"""
+    values = {'pss': 0.0, 'private': 0.0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as rollup:
+            for line in rollup:
+                name, _, rest = line.partition(":")
+                if name == "Pss":
+                    values['pss'] = int(rest.split()[0]) / 1024
+                elif name in ("Private_Clean", "Private_Dirty"):
+                    values['private'] += int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as listing:
+            return [int(child) for child in listing.read().split()]
+    except OSError:
+        return []
+
+
+def start_server(workers: int, preload: bool, args) -> subprocess.Popen:
+    # ERROR: the supervisor warns about per-worker sessions on every start
+    env = {**os.environ, "LOG_LEVEL": "ERROR"}
+    command = [sys.executable, "-W", "ignore", "-m", "benchmarks.fake_server", "--port", str(args.port),
+               "--llm-latency", str(args.llm_latency), "--workers", str(workers)]
+    if not preload:
+        command.append("--no-preload")
+    server = subprocess.Popen(command, cwd=Path(__file__).parent.parent, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/", timeout=1).raise_for_status()
+            if len(children(server.pid)) == workers:
+                # Let the remaining workers finish starting up
+                time.sleep(1.0)
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Server did not start within 60s")
+
+
+def run(workers: int, preload: bool, args, pool) -> None:
+    server = start_server(workers, preload, args)
+    try:
+        for endpoint in ENDPOINTS:
+            share = args.requests // args.clients
+            jobs = [(args.port, endpoint, client * share, share, args.concurrency) for client in range(args.clients)]
+            pool.starmap(load, [(port, endpoint, first + 10 ** 6, max(share // 10, 1), concurrency)
+                                for port, endpoint, first, _, concurrency in jobs])  # warm-up
+            start = time.perf_counter()
+            results = pool.starmap(load, jobs)
+            elapsed = time.perf_counter() - start
+            latencies = sorted(latency for result, _ in results for latency in result)
+            errors = sum(errors for _, errors in results)
+            processes = [server.pid, *children(server.pid)]
+            usage = [memory(pid) for pid in processes]
+            private = [value['private'] for value in usage[1:]]
+            print(f"  {workers:7d} {'yes' if preload else 'no':>7s}  {endpoint:10s} {len(latencies) / elapsed:9.0f} "
+                  f"{percentile(latencies, 0.50) * 1000:8.1f} {percentile(latencies, 0.99) * 1000:8.1f} "
+                  f"{errors:6d} {sum(value['pss'] for value in usage):9.1f} "
+                  f"{sum(private) / max(len(private), 1):11.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serve.py by worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=max(2, os.cpu_count() or 1), help="load generator processes")
+    parser.add_argument("--requests", type=int, default=4000, help="requests per endpoint and configuration")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="FakeLLM seconds to first token")
+    parser.add_argument("--port", type=int, default=8002)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores, {args.clients} client processes x {args.concurrency} connections, "
+          f"CHAT_BACKEND={os.getenv('CHAT_BACKEND', 'simple')}")
+    print(f"  {'workers':>7s} {'preload':>7s} {'endpoint':10s} {'req/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} "
+          f"{'errors':>6s} {'PSS MB':>9s} {'worker MB':>11s}")
+    with multiprocessing.Pool(args.clients) as pool:
+        for workers in args.workers:
+            for preload in (False, True):
+                run(workers, preload, args, pool)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Local stand-in for ChatGoogleGenerativeAI used by the benchmarks.
+
+It answers every prompt after a fixed delay without touching the network,
+so load tests measure our own concurrency rather than Gemini's. It can
+also inject failures and latency spikes to exercise llm_gateway.
+"""
+import asyncio
+import random
+import time
+from typing import AsyncIterator, List
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+FAKE_REPLY = ("Hello, this is Rosella, I am calling from Independence Care, how are you doing today! "
+              "I understand the issue and I will help you resolve it right away.")
+
+
+class FakeLLM:
+    """Chat model double with configurable latency.
+
+    ``latency`` is the time to the first token; streamed replies then emit
+    one word every ``token_interval`` seconds. A fraction ``error_rate`` of
+    calls fail with ConnectionError after the latency, and ``slow_rate`` of
+    them take ``slow_latency`` instead.
+    """
+
+    def __init__(self, latency: float = 0.2, reply: str = FAKE_REPLY, token_interval: float = 0.01,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 30.0, seed: int = 7):
+        self.latency = latency
+        self.token_interval = token_interval
+        self.reply = reply
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _respond(self) -> None:
+        """Wait out this call's latency, then maybe fail"""
+        slow = self._rng.random() < self.slow_rate
+        fail = self._rng.random() < self.error_rate
+        await asyncio.sleep(self.slow_latency if slow else self.latency)
+        if fail:
+            self.errors += 1
+            raise ConnectionError("injected provider failure")
+
+    def invoke(self, messages: List) -> AIMessage:
+        self.calls += 1
+        time.sleep(self.latency)
+        return AIMessage(content=self.reply)
+
+    async def ainvoke(self, messages: List) -> AIMessage:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self._respond()
+        finally:
+            self.in_flight -= 1
+        return AIMessage(content=self.reply)
+
+    async def astream(self, messages: List) -> AsyncIterator[AIMessageChunk]:
+        self.calls += 1
+        await self._respond()
+        for i, word in enumerate(self.reply.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_interval)
+            yield AIMessageChunk(content=word if i == 0 else " " + word)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+The app served by uvicorn with FakeLLM in place of Gemini, so benchmarks
+can drive it over real HTTP. The chat backend comes from CHAT_BACKEND as
+usual. With ``--workers`` it runs under the serve.py supervisor instead of
+a single uvicorn process.
+
+Run from the backend directory:
+    CHAT_BACKEND=gemini python -m benchmarks.fake_server --port 8001 --llm-latency 0.05
+    python -m benchmarks.fake_server --workers 4
+"""
+import argparse
+
+import uvicorn
+
+import llm_client
+from benchmarks.fake_llm import FakeLLM
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="FakeLLM seconds to first token")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes under serve.py (0 = plain uvicorn)")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="with --workers, import the app in each worker instead of before forking")
+    args = parser.parse_args()
+
+    llm_client.set_llm(FakeLLM(latency=args.llm_latency))
+    if args.workers:
+        import serve
+        serve.serve(args.host, args.port, args.workers, args.preload)
+        return
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
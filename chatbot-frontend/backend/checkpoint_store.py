@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from config import Config
+
+
+class CheckpointStore:
+    """LangGraph checkpoints in a SQLite database shared by every worker process.
+
+    The checkpointer is langgraph-checkpoint-sqlite's AsyncSqliteSaver. Its
+    aiosqlite connection runs queries on its own thread, so the event loop
+    never waits on SQLite. A connection belongs to the event loop that
+    opened it, so it is opened on first use in each loop (or by the app's
+    lifespan hook), never at import. A worker forked from a preloaded app
+    therefore opens its own.
+
+    The graphs only ever resume from their latest checkpoint, so older ones
+    and their writes are pruned after every turn. A thread therefore costs
+    one checkpoint row however long the conversation runs. Threads
+    untouched for longer than the TTL are swept like expired sessions.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS thread_access (
+            thread_id TEXT PRIMARY KEY,
+            last_access REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS thread_access_last_access ON thread_access (last_access);
+    """
+    _PRUNE = (
+        """DELETE FROM checkpoints WHERE thread_id = ?1 AND checkpoint_id <
+               (SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?1)""",
+        """DELETE FROM writes WHERE thread_id = ?1 AND checkpoint_id <
+               (SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?1)""",
+    )
+    _TOUCH = "INSERT OR REPLACE INTO thread_access (thread_id, last_access) VALUES (?, ?)"
+    _SWEEP = (
+        "DELETE FROM checkpoints WHERE thread_id IN (SELECT thread_id FROM thread_access WHERE last_access < ?)",
+        "DELETE FROM writes WHERE thread_id IN (SELECT thread_id FROM thread_access WHERE last_access < ?)",
+        "DELETE FROM thread_access WHERE last_access < ?",
+    )
+    _COUNT_EXPIRED = "SELECT COUNT(*) FROM thread_access WHERE last_access < ?"
+    _COUNT_THREADS = "SELECT COUNT(*) FROM thread_access"
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 ttl_seconds: float = Config.MEMORY_TTL_HOURS * 3600,
+                 sweep_interval: float = 60.0,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        # Wall-clock time: last_access is compared across processes
+        self._clock = clock
+        self._saver: Optional[AsyncSqliteSaver] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._open_lock: Optional[asyncio.Lock] = None
+        self._next_sweep = 0.0
+        self._stats = {'turns': 0, 'swept': 0, 'threads': 0}
+
+    async def saver(self) -> AsyncSqliteSaver:
+        """The checkpointer for the running event loop, opening the database on first use"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A saver opened by another (finished) loop cannot be used from this one
+            self._loop, self._saver, self._open_lock = loop, None, asyncio.Lock()
+        if self._saver is None:
+            async with self._open_lock:
+                if self._saver is None:
+                    connection = await aiosqlite.connect(self.path or Config.LANGGRAPH_CHECKPOINT_DB_PATH)
+                    saver = AsyncSqliteSaver(connection)
+                    await saver.setup()
+                    await connection.executescript(self._SCHEMA)
+                    await connection.commit()
+                    self._saver = saver
+        return self._saver
+
+    async def close(self) -> None:
+        if self._saver is not None and self._loop is asyncio.get_running_loop():
+            await self._saver.conn.close()
+        self._saver = None
+
+    async def finish_turn(self, thread_id: str) -> None:
+        """Drop the thread's superseded checkpoints, mark it used, and sweep expired threads when due"""
+        saver = await self.saver()
+        now = self._clock()
+        # The saver's lock serialises every use of its connection
+        async with saver.lock:
+            for statement in self._PRUNE:
+                await saver.conn.execute(statement, (thread_id,))
+            await saver.conn.execute(self._TOUCH, (thread_id, now))
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                cursor = await saver.conn.execute(self._COUNT_EXPIRED, (now - self.ttl_seconds,))
+                self._stats['swept'] += (await cursor.fetchone())[0]
+                for statement in self._SWEEP:
+                    await saver.conn.execute(statement, (now - self.ttl_seconds,))
+                cursor = await saver.conn.execute(self._COUNT_THREADS)
+                self._stats['threads'] = (await cursor.fetchone())[0]
+            await saver.conn.commit()
+        self._stats['turns'] += 1
+
+    def stats(self) -> Dict[str, int]:
+        # "threads" is as of the last sweep
+        return dict(self._stats)
+
+
+# Global instance
+checkpoint_store = CheckpointStore()
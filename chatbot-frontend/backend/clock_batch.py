@@ -0,0 +1,122 @@
+import datetime
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from clock_rules import INVALID_EVENT, clock_pipelines
+from geofence import ServiceAreaIndex, haversine_miles_array
+from schedule_store import ScheduleStore, parse_timestamp
+
+
+def wall_seconds(dt: datetime.datetime) -> float:
+    """Seconds since the epoch; naive datetimes are taken as UTC wall-clock time"""
+    if dt.utcoffset() is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+def parse_timestamps(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse ISO timestamps in bulk.
+
+    Returns seconds (naive values are read as wall-clock time, so differences
+    match subtracting the datetimes directly) and whether each value carried
+    a UTC offset. Unparseable values come back as NaN. Events in a burst
+    share a handful of distinct scheduled times, so each distinct string is
+    only parsed once.
+    """
+    parsed: Dict[str, Tuple[float, bool]] = {}
+    seconds = np.empty(len(values), dtype=np.float64)
+    aware = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        entry = parsed.get(value)
+        if entry is None:
+            try:
+                dt = parse_timestamp(value)
+            except ValueError:
+                entry = (math.nan, False)
+            else:
+                entry = (wall_seconds(dt), dt.utcoffset() is not None)
+            parsed[value] = entry
+        seconds[i], aware[i] = entry
+    return seconds, aware
+
+
+class ClockBatchFacts:
+    """What the clock rules know about a batch of events, as arrays (see clock_rules.ClockFacts)"""
+
+    def __init__(self,
+                 caregivers: Sequence[str],
+                 clients: Sequence[Optional[str]],
+                 phones: Sequence[str],
+                 locations: Sequence[Dict[str, float]],
+                 scheduled_times: Sequence[str],
+                 actual_times: Sequence[str],
+                 has_schedule: Sequence[bool],
+                 registered_phones: Dict[str, str],
+                 schedule_store: ScheduleStore,
+                 service_areas: ServiceAreaIndex):
+        count = len(caregivers)
+        scheduled_s, scheduled_aware = parse_timestamps(scheduled_times)
+        actual_s, actual_aware = parse_timestamps(actual_times)
+        self.bad_actual_time = np.isnan(actual_s)
+
+        # Shifts on file give the client and scheduled start for caregivers the store knows
+        self.on_file = np.zeros(count, dtype=bool)
+        self.shift_found = np.zeros(count, dtype=bool)
+        event_clients = list(clients)
+        for i, caregiver in enumerate(caregivers):
+            if not schedule_store.has_caregiver(caregiver):
+                continue
+            self.on_file[i] = True
+            if self.bad_actual_time[i]:
+                continue
+            when = parse_timestamp(actual_times[i])
+            clients_here = service_areas.clients_at(locations[i].get("lat"), locations[i].get("lng"))
+            shift = schedule_store.find_shift(caregiver, when, phones[i], clients_here)
+            if shift is not None:
+                self.shift_found[i] = True
+                event_clients[i] = shift.client
+                scheduled_s[i] = wall_seconds(shift.start)
+                actual_s[i] = wall_seconds(schedule_store.to_local(when))
+                scheduled_aware[i] = actual_aware[i] = False
+
+        self.reported_no_schedule = np.fromiter(
+            (not scheduled or client is None for scheduled, client in zip(has_schedule, clients)),
+            dtype=bool, count=count)
+        # Numbers a shift around the event is booked at (e.g. the client's landline) count as known
+        self.phone_unknown = np.fromiter(
+            (phone not in registered_phones
+             and (bad or not schedule_store.shifts_for_phone(phone, parse_timestamp(actual)))
+             for phone, actual, bad in zip(phones, actual_times, self.bad_actual_time)),
+            dtype=bool, count=count)
+
+        # Distance to the client's service-area centre, where the client has one
+        lat = np.fromiter((loc.get("lat", math.nan) for loc in locations), dtype=np.float64, count=count)
+        lng = np.fromiter((loc.get("lng", math.nan) for loc in locations), dtype=np.float64, count=count)
+        areas = [service_areas.get(client) for client in event_clients]
+        self.has_area = np.fromiter((area is not None for area in areas), dtype=bool, count=count)
+        area_columns = np.array([(area.lat, area.lng, area.radius_miles) if area else (math.nan,) * 3
+                                 for area in areas], dtype=np.float64).reshape(count, 3)
+        self.distance = haversine_miles_array(lat, lng, area_columns[:, 0], area_columns[:, 1])
+        self.radius = area_columns[:, 2]
+
+        self.minutes_off_schedule = np.abs(actual_s - scheduled_s) / 60
+        self.mixed_timezones = scheduled_aware != actual_aware
+
+
+def evaluate_clock_events(event_types: Sequence[str], **columns) -> List[str]:
+    """Run the clock-in and clock-out rule pipelines over a batch of events.
+
+    ``columns`` are the ClockBatchFacts arguments. Each rule is evaluated
+    as an array over the events still undecided; an event's outcome is the
+    first rule it trips in the same priority order as the single-event
+    handlers. Events whose data a reached rule cannot use (unparseable
+    timestamps, missing coordinates) get INVALID_EVENT.
+    """
+    facts = ClockBatchFacts(**columns)
+    outcomes: List[str] = [""] * len(event_types)
+    for event_type, pipeline in clock_pipelines.items():
+        rows = [i for i, t in enumerate(event_types) if t == event_type]
+        if rows:
+            for i, outcome in zip(rows, pipeline.evaluate_batch(facts, rows, INVALID_EVENT)):
+                outcomes[i] = outcome
+    return outcomes
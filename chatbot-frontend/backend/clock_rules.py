@@ -0,0 +1,143 @@
+import datetime
+from functools import cached_property
+from typing import Any, Dict, Optional
+from config import Config
+from geofence import ServiceAreaIndex, haversine_miles
+from rule_engine import RulePipeline
+from schedule_store import ScheduleStore, Shift, parse_timestamp
+
+# Outcome names are keys of main.SCRIPTED_RESPONSES, apart from these two
+# which need per-event handling
+PHONE_NOT_FOUND = "phone_not_found"
+INVALID_EVENT = "invalid_event"
+
+
+class ClockFacts:
+    """What the clock rules know about one event; lookups run on first use"""
+
+    def __init__(self, caregiver_name: str, phone_number: str, location: Dict[str, float], actual_time: str,
+                 client_name: Optional[str] = None, scheduled_time: Optional[str] = None,
+                 has_schedule: bool = True, *,
+                 schedule_store: ScheduleStore, service_areas: ServiceAreaIndex,
+                 registered_phones: Dict[str, str]):
+        self.caregiver_name = caregiver_name
+        self.phone_number = phone_number
+        self.location = location
+        self.actual_time = actual_time
+        self.client_name = client_name
+        self.scheduled_time = scheduled_time
+        self.has_schedule = has_schedule
+        self.schedule_store = schedule_store
+        self.service_areas = service_areas
+        self.registered_phones = registered_phones
+
+    @cached_property
+    def on_file(self) -> bool:
+        """Whether the caregiver's shifts are in the schedule store (otherwise the app's report is used)"""
+        return self.schedule_store.has_caregiver(self.caregiver_name)
+
+    @cached_property
+    def actual(self) -> datetime.datetime:
+        return parse_timestamp(self.actual_time)
+
+    @cached_property
+    def shift(self) -> Optional[Shift]:
+        if not self.on_file:
+            return None
+        # Where shifts overlap (back-to-back visits), the one at the client the caregiver is at wins
+        clients_here = self.service_areas.clients_at(self.location.get("lat"), self.location.get("lng"))
+        return self.schedule_store.find_shift(self.caregiver_name, self.actual, self.phone_number, clients_here)
+
+    @cached_property
+    def phone_on_schedule(self) -> bool:
+        """Whether a shift around the event is booked at the calling phone (e.g. the client's landline)"""
+        try:
+            when = self.actual
+        except ValueError:
+            return False
+        return bool(self.schedule_store.shifts_for_phone(self.phone_number, when))
+
+    @property
+    def client(self) -> Optional[str]:
+        shift = self.shift
+        return shift.client if shift is not None else self.client_name
+
+    @cached_property
+    def minutes_off_schedule(self) -> float:
+        if self.shift is not None:
+            scheduled, actual = self.shift.start, self.schedule_store.to_local(self.actual)
+        else:
+            scheduled, actual = parse_timestamp(self.scheduled_time), self.actual
+        return abs((actual - scheduled).total_seconds() / 60)
+
+
+# Checks: (facts, params) -> bool for one event, and the same over a
+# clock_batch.ClockBatchFacts returning (matched, invalid) arrays
+
+def no_schedule(facts: ClockFacts, params: Dict[str, Any]) -> bool:
+    if facts.on_file:
+        return facts.shift is None
+    return not facts.has_schedule or facts.client_name is None
+
+
+def no_schedule_batch(facts, params):
+    import numpy as np
+    matched = np.where(facts.on_file, ~facts.shift_found, facts.reported_no_schedule)
+    return matched, facts.on_file & facts.bad_actual_time
+
+
+def phone_not_registered(facts: ClockFacts, params: Dict[str, Any]) -> bool:
+    """Neither a registered caregiver phone nor one a shift around the event is booked at"""
+    return facts.phone_number not in facts.registered_phones and not facts.phone_on_schedule
+
+
+def phone_not_registered_batch(facts, params):
+    import numpy as np
+    return facts.phone_unknown, np.zeros_like(facts.phone_unknown)
+
+
+def outside_service_area(facts: ClockFacts, params: Dict[str, Any]) -> bool:
+    """Beyond the client's service radius (each client's own, default Config.GPS_RADIUS_MILES)"""
+    area = facts.service_areas.get(facts.client)
+    if area is None:
+        return False
+    return haversine_miles(facts.location["lat"], facts.location["lng"], area.lat, area.lng) > area.radius_miles
+
+
+def outside_service_area_batch(facts, params):
+    import numpy as np
+    invalid = (facts.has_area & np.isnan(facts.distance)) | (facts.on_file & facts.bad_actual_time)
+    return facts.has_area & (facts.distance > facts.radius), invalid
+
+
+def outside_time_window(facts: ClockFacts, params: Dict[str, Any]) -> bool:
+    return facts.minutes_off_schedule > params["window_minutes"]
+
+
+def outside_time_window_batch(facts, params):
+    import numpy as np
+    minutes_off = facts.minutes_off_schedule
+    return minutes_off > params["window_minutes"], np.isnan(minutes_off) | facts.mixed_timezones
+
+
+CLOCK_CHECKS = {
+    "no_schedule": (no_schedule, no_schedule_batch),
+    "phone_not_registered": (phone_not_registered, phone_not_registered_batch),
+    "outside_service_area": (outside_service_area, outside_service_area_batch),
+    "outside_time_window": (outside_time_window, outside_time_window_batch),
+}
+
+# Compiled once from Config.CLOCK_RULES, one pipeline per event type
+clock_pipelines: Dict[str, RulePipeline] = {
+    event_type: RulePipeline(event_type, spec, CLOCK_CHECKS)
+    for event_type, spec in Config.CLOCK_RULES.items()
+}
+
+
+def evaluate_clock_event(event_type: str, facts: ClockFacts) -> str:
+    """Outcome name for one clock-in or clock-out"""
+    return clock_pipelines[event_type].evaluate(facts)
+
+
+def clock_rule_stats() -> Dict[str, Dict[str, Dict[str, float]]]:
+    return {event_type: pipeline.stats() for event_type, pipeline in clock_pipelines.items()}
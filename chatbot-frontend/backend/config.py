@@ -11,9 +11,110 @@ class Config:
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
     
+    # Chat backend: "simple" (scripted templates), "gemini" (CaregiverAI),
+    # "workflows" (CaregiverWorkflows) or "langgraph" (LangGraphWorkflows)
+    CHAT_BACKEND: str = os.getenv("CHAT_BACKEND", "simple")
+    
     # LangGraph Settings
     MAX_CONVERSATION_TURNS: int = 10
     MEMORY_TTL_HOURS: int = 24
+    MAX_CONVERSATIONS: int = 10000
+    MEMORY_BUDGET_BYTES: int = 64 * 1024 * 1024
+    
+    # Prompt context: recent turns kept verbatim, older ones summarised
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_SUMMARY_TOKENS: int = 300
+    
+    # Semantic LLM reply cache (opt-in)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+    
+    # Clock-in/out rules
+    GPS_RADIUS_MILES: float = 0.5  # service radius for clients without their own
+    CLOCK_IN_WINDOW_MINUTES: int = 15
+    CLOCK_BATCH_MAX_EVENTS: int = 10000
+    
+    # Rules per event type in priority order: the first that matches decides the
+    # outcome (a SCRIPTED_RESPONSES key). "cost" only orders evaluation.
+    CLOCK_RULES: dict = {
+        "clock_in": {
+            "rules": [
+                {"rule": "no_schedule", "outcome": "clock_in_no_schedule", "cost": 2},
+                {"rule": "phone_not_registered", "outcome": "phone_not_found", "cost": 1},
+                {"rule": "outside_service_area", "outcome": "clock_in_gps_out_of_range", "cost": 4},
+                {"rule": "outside_time_window", "outcome": "clock_in_out_of_window", "cost": 3,
+                 "window_minutes": CLOCK_IN_WINDOW_MINUTES},
+            ],
+            "default": "clock_in_success",
+        },
+        "clock_out": {
+            "rules": [
+                {"rule": "outside_service_area", "outcome": "clock_out_gps_out_of_range", "cost": 4},
+            ],
+            "default": "clock_out_success",
+        },
+    }
+    
+    # Duplicate clock events (IVR retries): same caregiver, phone, type and minute within the window
+    DEDUP_WINDOW_SECONDS: int = 600
+    DEDUP_BUCKET_SECONDS: int = 60
+    DEDUP_MAX_ENTRIES: int = 100000
+    
+    # Schedules: a clock event belongs to a shift from EARLY minutes before it starts to LATE minutes after it ends
+    SCHEDULE_CSV_PATH: str = os.getenv("SCHEDULE_CSV_PATH", "")
+    SCHEDULE_TIMEZONE: str = os.getenv("SCHEDULE_TIMEZONE", "UTC")
+    SHIFT_EARLY_MATCH_MINUTES: int = 120
+    SHIFT_LATE_MATCH_MINUTES: int = 120
+    
+    # Gemini model for every LLM call; prompts rely on native system instructions
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+    
+    # LLM gateway: per-model concurrency cap and queue, a deadline per call (queue wait,
+    # attempts and backoff), jittered retries and a circuit breaker
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_MAX_QUEUE: int = 200
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = 10.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE_SECONDS: float = 0.25
+    LLM_BACKOFF_CAP_SECONDS: float = 2.0
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    # Identical prompts in flight at the same time share one LLM call
+    LLM_COALESCE_PROMPTS: bool = os.getenv("LLM_COALESCE_PROMPTS", "true").lower() in ("1", "true", "yes")
+    # Hedged chat: if the LLM has produced no text after this many seconds, reply from the script
+    # and send the LLM's answer with the caregiver's next message (0 disables hedging)
+    CHAT_HEDGE_SECONDS: float = float(os.getenv("CHAT_HEDGE_SECONDS", "0"))
+    
+    # Logging: LOG_FORMAT "json" or "text"; DEBUG lines are sampled at LOG_DEBUG_SAMPLE_RATE
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_DEBUG_SAMPLE_RATE: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+    LOG_QUEUE_SIZE: int = 10000
+    
+    # Opt-in: parse request bodies with Pydantic's JSON parser and render models with orjson,
+    # skipping FastAPI's response-model revalidation (see fast_json.FastJSONRoute)
+    FAST_JSON_RESPONSES: bool = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+    
+    # Session storage: "memory" (per process) or "sqlite" (shared by all workers)
+    SESSION_BACKEND: str = os.getenv("SESSION_BACKEND", "memory")
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", "sessions.db")
+    
+    # LangGraph checkpoints (one thread per conversation), so each /chat turn runs one graph step
+    LANGGRAPH_CHECKPOINT_DB_PATH: str = os.getenv("LANGGRAPH_CHECKPOINT_DB_PATH", "checkpoints.db")
+    # How much of a LangGraph workflow one /chat turn may run (see langgraph_workflows.TurnPolicy)
+    LANGGRAPH_MAX_LLM_CALLS_PER_TURN: int = int(os.getenv("LANGGRAPH_MAX_LLM_CALLS_PER_TURN", "1"))
+    LANGGRAPH_TURN_DEADLINE_SECONDS: float = float(os.getenv("LANGGRAPH_TURN_DEADLINE_SECONDS", "25"))
+    
+    # Production server (serve.py): worker processes (0 = one per CPU core), whether the app is
+    # loaded before forking them, and how long a stopping worker may take to finish its requests
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "0"))
+    SERVER_PRELOAD: bool = os.getenv("SERVER_PRELOAD", "true").lower() in ("1", "true", "yes")
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: float = float(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
     
     @classmethod
     def get_google_api_key(cls) -> str:
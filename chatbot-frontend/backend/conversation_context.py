@@ -0,0 +1,168 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from config import Config
+
+# Rough characters-per-token ratio for English text with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+# Longest excerpt of an old turn kept in the running summary
+SUMMARY_EXCERPT_CHARS = 160
+# Trailing messages remembered per conversation to detect which turns are new
+TAIL_MESSAGES = 2
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def format_turn(message: Dict[str, str]) -> str:
+    return f"{message['role']}: {message['content']}"
+
+
+def summarize_turn(message: Dict[str, str]) -> str:
+    """One-line excerpt of a turn that has left the context window"""
+    content = " ".join(message['content'].split())
+    sentence_end = content.find(". ")
+    if 0 < sentence_end < SUMMARY_EXCERPT_CHARS:
+        content = content[:sentence_end + 1]
+    elif len(content) > SUMMARY_EXCERPT_CHARS:
+        content = content[:SUMMARY_EXCERPT_CHARS].rstrip() + "..."
+    return f"- {message['role']}: {content}"
+
+
+class _Context:
+    __slots__ = ("window", "window_tokens", "summary", "summary_tokens", "tail", "seen", "text")
+
+    def __init__(self):
+        self.window: Deque[Tuple[str, int]] = deque()
+        self.window_tokens = 0
+        self.summary: Deque[Tuple[str, int]] = deque()
+        self.summary_tokens = 0
+        # (role, content) of the last rendered messages, used to find where new ones start
+        self.tail: Tuple[Tuple[str, str], ...] = ()
+        self.seen = 0
+        self.text = ""
+
+
+class ContextBuilder:
+    """Builds the "conversation so far" prompt section incrementally.
+
+    Each conversation's rendered context is cached; a new turn only formats
+    and appends the new messages. Once the recent turns exceed
+    ``token_budget``, the oldest ones move into a short running summary
+    (itself capped at ``summary_budget`` tokens), so prompt size stays
+    bounded however long the conversation runs.
+    """
+
+    def __init__(self,
+                 token_budget: int = Config.CONTEXT_TOKEN_BUDGET,
+                 summary_budget: int = Config.CONTEXT_SUMMARY_TOKENS,
+                 max_conversations: int = Config.MAX_CONVERSATIONS):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.max_conversations = max_conversations
+        self._contexts: "OrderedDict[str, _Context]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'incremental': 0, 'rebuilds': 0, 'summarized_turns': 0}
+
+    def render(self, conversation_id: str, history: List[Dict[str, str]]) -> str:
+        """Return the context text for ``history``, reusing what was built for earlier turns"""
+        with self._lock:
+            context = self._contexts.get(conversation_id)
+            new_messages = self._new_messages(context, history)
+            if new_messages is None:
+                context = _Context()
+                new_messages = history
+                self._stats['rebuilds'] += 1
+            else:
+                self._stats['incremental'] += 1
+
+            self._contexts[conversation_id] = context
+            self._contexts.move_to_end(conversation_id)
+            while len(self._contexts) > self.max_conversations:
+                self._contexts.popitem(last=False)
+
+            if new_messages:
+                self._extend(context, new_messages)
+            context.seen = len(history)
+            return context.text
+
+    def token_count(self, conversation_id: str) -> int:
+        """Estimated tokens of the context last rendered for a conversation"""
+        with self._lock:
+            context = self._contexts.get(conversation_id)
+            return context.window_tokens + context.summary_tokens if context else 0
+
+    def forget(self, conversation_id: str) -> None:
+        with self._lock:
+            self._contexts.pop(conversation_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'conversations': len(self._contexts)}
+
+    def _new_messages(self, context: Optional[_Context],
+                      history: List[Dict[str, str]]) -> Optional[List[Dict[str, str]]]:
+        """Messages added since the context was last rendered, or None if it must be rebuilt"""
+        if context is None or not context.tail:
+            return None
+        # History may be windowed by the session store, so locate the last
+        # messages we rendered instead of trusting list positions.
+        size = len(context.tail)
+        seen = context.seen
+        if size <= seen <= len(history) and self._tail_at(history, seen, size) == context.tail:
+            return history[seen:]
+        for end in range(len(history), size - 1, -1):
+            if self._tail_at(history, end, size) == context.tail:
+                return history[end:]
+        return None
+
+    @staticmethod
+    def _tail_at(history: List[Dict[str, str]], end: int, size: int) -> Tuple[Tuple[str, str], ...]:
+        return tuple((m['role'], m['content']) for m in history[end - size:end])
+
+    def _extend(self, context: _Context, messages: List[Dict[str, str]]) -> None:
+        lines = []
+        for message in messages:
+            line = format_turn(message)
+            tokens = count_tokens(line) + 1
+            context.window.append((line, tokens))
+            context.window_tokens += tokens
+            lines.append(line)
+
+        # Slide the window: oldest turns move into the summary
+        slid = False
+        while context.window_tokens > self.token_budget and len(context.window) > 1:
+            line, tokens = context.window.popleft()
+            context.window_tokens -= tokens
+            role, _, content = line.partition(": ")
+            summary_line = summarize_turn({'role': role, 'content': content})
+            summary_tokens = count_tokens(summary_line) + 1
+            context.summary.append((summary_line, summary_tokens))
+            context.summary_tokens += summary_tokens
+            self._stats['summarized_turns'] += 1
+            slid = True
+        while context.summary_tokens > self.summary_budget and context.summary:
+            _, tokens = context.summary.popleft()
+            context.summary_tokens -= tokens
+
+        tail = context.tail + tuple((m['role'], m['content']) for m in messages[-TAIL_MESSAGES:])
+        context.tail = tail[-TAIL_MESSAGES:]
+        if slid or not context.text:
+            # The cached text still holds the turns that moved into the summary
+            context.text = self._join(context)
+        else:
+            context.text += "\n" + "\n".join(lines)
+
+    @staticmethod
+    def _join(context: _Context) -> str:
+        recent = "\n".join(line for line, _ in context.window)
+        if not context.summary:
+            return recent
+        earlier = "\n".join(line for line, _ in context.summary)
+        return f"Summary of earlier turns:\n{earlier}\n\nRecent turns:\n{recent}"
+
+
+# Global instance
+context_builder = ContextBuilder()
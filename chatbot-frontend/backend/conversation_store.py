@@ -0,0 +1,151 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from config import Config
+from session_store import SessionStore
+
+# Approximate per-message overhead of the dict and its two keys
+MESSAGE_OVERHEAD_BYTES = 240
+
+
+def message_size(message: Dict[str, str]) -> int:
+    """Approximate memory held by one {'role', 'content'} message"""
+    return MESSAGE_OVERHEAD_BYTES + sys.getsizeof(message.get('content', ''))
+
+
+class _Conversation:
+    __slots__ = ("messages", "size", "last_access", "total_messages")
+
+    def __init__(self, now: float):
+        self.messages: List[Dict[str, str]] = []
+        self.size = 0
+        self.last_access = now
+        self.total_messages = 0
+
+
+class ConversationStore(SessionStore):
+    """Bounded in-memory conversation history.
+
+    Conversations are kept in least-recently-used order and evicted when
+    they sit idle longer than the TTL, when there are more than
+    ``max_conversations``, or when the total size exceeds ``max_bytes``.
+    Each conversation keeps only its last ``max_turns`` user/assistant turns.
+    """
+
+    def __init__(self,
+                 ttl_seconds: float = Config.MEMORY_TTL_HOURS * 3600,
+                 max_turns: int = Config.MAX_CONVERSATION_TURNS,
+                 max_conversations: int = Config.MAX_CONVERSATIONS,
+                 max_bytes: int = Config.MEMORY_BUDGET_BYTES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_turns * 2
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evicted_lru': 0,
+            'evicted_budget': 0,
+            'trimmed_messages': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def __contains__(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._lookup(conversation_id, self._clock()) is not None
+
+    def get(self, conversation_id: str) -> List[Dict[str, str]]:
+        """Return a copy of the conversation's messages (empty if unknown or expired)"""
+        with self._lock:
+            conversation = self._lookup(conversation_id, self._clock())
+            if conversation is None:
+                self._stats['misses'] += 1
+                return []
+            self._stats['hits'] += 1
+            return list(conversation.messages)
+
+    def append(self, conversation_id: str, *messages: Dict[str, str]) -> int:
+        """Append messages to a conversation; returns how many it has received in total"""
+        with self._lock:
+            now = self._clock()
+            conversation = self._lookup(conversation_id, now)
+            if conversation is None:
+                conversation = _Conversation(now)
+                self._conversations[conversation_id] = conversation
+
+            for message in messages:
+                size = message_size(message)
+                conversation.messages.append(message)
+                conversation.size += size
+                self._bytes += size
+            conversation.total_messages += len(messages)
+
+            # Per-conversation turn cap
+            overflow = len(conversation.messages) - self.max_messages
+            if overflow > 0:
+                dropped = conversation.messages[:overflow]
+                del conversation.messages[:overflow]
+                freed = sum(message_size(message) for message in dropped)
+                conversation.size -= freed
+                self._bytes -= freed
+                self._stats['trimmed_messages'] += overflow
+
+            self._evict(now, keep=conversation_id)
+            return conversation.total_messages
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            conversation = self._conversations.pop(conversation_id, None)
+            if conversation is not None:
+                self._bytes -= conversation.size
+
+    def stats(self) -> Dict[str, int]:
+        """Counters plus current size, for monitoring"""
+        with self._lock:
+            return {
+                **self._stats,
+                'conversations': len(self._conversations),
+                'bytes': self._bytes,
+            }
+
+    def _lookup(self, conversation_id: str, now: float) -> Optional[_Conversation]:
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        if now - conversation.last_access > self.ttl_seconds:
+            self._remove(conversation_id, 'expired')
+            return None
+        conversation.last_access = now
+        self._conversations.move_to_end(conversation_id)
+        return conversation
+
+    def _remove(self, conversation_id: str, reason: str) -> None:
+        conversation = self._conversations.pop(conversation_id)
+        self._bytes -= conversation.size
+        self._stats[reason] += 1
+
+    def _evict(self, now: float, keep: str) -> None:
+        # Oldest entries sit at the front, so expired ones can be swept
+        # without scanning the whole store.
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if oldest_id == keep:
+                break
+            if now - oldest.last_access > self.ttl_seconds:
+                self._remove(oldest_id, 'expired')
+            elif len(self._conversations) > self.max_conversations:
+                self._remove(oldest_id, 'evicted_lru')
+            elif self._bytes > self.max_bytes:
+                self._remove(oldest_id, 'evicted_budget')
+            else:
+                break
@@ -0,0 +1,90 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+from config import Config
+from schedule_store import parse_timestamp
+
+
+class DedupIndex:
+    """Sliding-window index of recently seen clock events.
+
+    Events are keyed on (caregiver, phone, event type, event time rounded
+    to ``bucket_seconds``). An event is a duplicate if the same key, or the
+    one for the previous time bucket, was seen within the last
+    ``window_seconds``, so retries straddling a bucket boundary are still
+    caught. Keys sit in arrival order, which is also expiry order, so
+    expired entries are dropped from the front on every check and the
+    oldest go first once ``max_entries`` is reached.
+
+    Looking an event up (``seen``) and recording it (``record``) are separate
+    so an event is only recorded once it has been evaluated: one that failed
+    or was rejected can be sent again. Neither awaits and both hold the
+    lock only briefly, so they are safe from request threads and the event
+    loop alike.
+    """
+
+    def __init__(self,
+                 window_seconds: float = Config.DEDUP_WINDOW_SECONDS,
+                 bucket_seconds: int = Config.DEDUP_BUCKET_SECONDS,
+                 max_entries: int = Config.DEDUP_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._expires: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'checks': 0, 'duplicates': 0, 'expired': 0, 'evicted': 0}
+
+    def seen(self, caregiver: str, phone: str, event_type: str, timestamp: str) -> bool:
+        """True if the clock event duplicates one recorded within the window"""
+        key, previous = self._keys(caregiver, phone, event_type, timestamp)
+        with self._lock:
+            self._stats['checks'] += 1
+            self._evict_expired(self._clock())
+            if key in self._expires or (previous is not None and previous in self._expires):
+                self._stats['duplicates'] += 1
+                return True
+            return False
+
+    def record(self, caregiver: str, phone: str, event_type: str, timestamp: str) -> None:
+        """Remember a clock event that has been evaluated, so retries of it are duplicates"""
+        key, _ = self._keys(caregiver, phone, event_type, timestamp)
+        now = self._clock()
+        with self._lock:
+            self._evict_expired(now)
+            self._expires[key] = now + self.window_seconds
+            self._expires.move_to_end(key)
+            while len(self._expires) > self.max_entries:
+                self._expires.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._expires)}
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def _keys(self, caregiver: str, phone: str, event_type: str, timestamp: str) -> Tuple[Hashable, Hashable]:
+        try:
+            seconds = parse_timestamp(timestamp).timestamp()
+        except ValueError:
+            # Unparseable times can only match exactly
+            return (caregiver, phone, event_type, timestamp), None
+        bucket = math.floor(seconds / self.bucket_seconds)
+        return (caregiver, phone, event_type, bucket), (caregiver, phone, event_type, bucket - 1)
+
+    def _evict_expired(self, now: float) -> None:
+        while self._expires:
+            key, expires = next(iter(self._expires.items()))
+            if expires > now:
+                break
+            del self._expires[key]
+            self._stats['expired'] += 1
+
+
+# Global instance
+clock_dedup = DedupIndex()
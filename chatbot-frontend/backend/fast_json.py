@@ -0,0 +1,70 @@
+import inspect
+from typing import Any, Callable, Coroutine, Optional
+import orjson
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class FastJSONResponse(Response):
+    """JSON rendered by orjson; Pydantic models are dumped as they are, without being validated again"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            content = content.model_dump()
+        return orjson.dumps(content)
+
+
+def _model_body(route: APIRoute) -> Optional[Any]:
+    """The route's body field if a Pydantic model is all an async endpoint takes, else None"""
+    dependant = route.dependant
+    if (dependant.path_params or dependant.query_params or dependant.header_params or dependant.cookie_params
+            or dependant.dependencies or dependant.request_param_name or dependant.response_param_name
+            or dependant.background_tasks_param_name or len(dependant.body_params) != 1
+            or not inspect.iscoroutinefunction(route.endpoint)):
+        return None
+    field = dependant.body_params[0]
+    annotation = field.field_info.annotation
+    if not (inspect.isclass(annotation) and issubclass(annotation, BaseModel)):
+        return None
+    return field
+
+
+class FastJSONRoute(APIRoute):
+    """Route class for Config.FAST_JSON_RESPONSES.
+
+    Endpoints whose only parameter is a Pydantic model body skip FastAPI's
+    generic request handling: the body is parsed and validated in one step
+    by Pydantic's JSON parser (no ``json.loads`` then field-by-field
+    validation), and a returned model is serialised by orjson instead of
+    being revalidated against ``response_model`` and run through
+    ``jsonable_encoder``. Returned Response objects (the pre-serialised
+    scripted replies) pass through untouched. Any other endpoint is
+    handled by FastAPI as usual, and OpenAPI docs are unchanged.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        field = _model_body(self)
+        if field is None:
+            return super().get_route_handler()
+        model, name, endpoint = field.field_info.annotation, field.name, self.endpoint
+        status_code = self.status_code or 200
+
+        async def handler(request: Request) -> Response:
+            try:
+                value = model.model_validate_json(await request.body())
+            except ValidationError as e:
+                # Same shape as FastAPI's own body errors
+                raise RequestValidationError([
+                    {**error, 'loc': ('body', *error['loc'])} for error in e.errors(include_url=False)
+                ])
+            result = await endpoint(**{name: value})
+            if isinstance(result, Response):
+                return result
+            return FastJSONResponse(result, status_code=status_code)
+
+        return handler
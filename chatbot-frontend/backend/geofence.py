@@ -0,0 +1,157 @@
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from config import Config
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two GPS coordinates in miles"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_miles_array(lat1, lng1, lat2, lng2):
+    """Element-wise haversine_miles over NumPy arrays"""
+    import numpy as np
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(np.asarray(lng2) - np.asarray(lng1))
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class ServiceArea(NamedTuple):
+    client: str
+    lat: float
+    lng: float
+    radius_miles: float
+
+
+class ServiceAreaMatch(NamedTuple):
+    client: str
+    distance_miles: float
+    radius_miles: float
+
+
+class ServiceAreaIndex:
+    """Grid index of client service areas for geofence checks.
+
+    The map is cut into square cells of ``cell_degrees`` (0.01 degrees is
+    about 0.7 miles, close to a typical service radius). Each client is
+    registered in every cell its service circle overlaps, so finding the
+    clients whose area contains a point means reading one cell and running
+    haversine on the few clients in it. Clients are added, moved or removed
+    individually, and ``sync`` applies only what changed between two sets
+    of service areas.
+    """
+
+    def __init__(self, cell_degrees: float = 0.01,
+                 default_radius_miles: float = Config.GPS_RADIUS_MILES):
+        self.cell_degrees = cell_degrees
+        self.default_radius_miles = default_radius_miles
+        self._areas: Dict[str, ServiceArea] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def upsert(self, client: str, lat: float, lng: float, radius_miles: Optional[float] = None) -> bool:
+        """Add or move a client's service area; returns False if nothing changed"""
+        area = ServiceArea(client, lat, lng, radius_miles or self.default_radius_miles)
+        with self._lock:
+            current = self._areas.get(client)
+            if current == area:
+                return False
+            if current is not None:
+                self._unregister(current)
+            self._areas[client] = area
+            for cell in self._covered_cells(area):
+                self._cells[cell].add(client)
+            return True
+
+    def remove(self, client: str) -> bool:
+        with self._lock:
+            area = self._areas.pop(client, None)
+            if area is None:
+                return False
+            self._unregister(area)
+            return True
+
+    def sync(self, areas: Dict[str, Dict[str, float]]) -> Dict[str, int]:
+        """Make the index hold exactly ``areas`` ({client: {"lat", "lng", optional "radius_miles"}})"""
+        changes = {'added': 0, 'moved': 0, 'removed': 0}
+        for client in set(self._areas) - set(areas):
+            self.remove(client)
+            changes['removed'] += 1
+        for client, location in areas.items():
+            current = self._areas.get(client)
+            radius = location.get("radius_miles") or self.default_radius_miles
+            if current is not None and current[1:] == (location["lat"], location["lng"], radius):
+                continue
+            if self.upsert(client, location["lat"], location["lng"], radius):
+                changes['moved' if current is not None else 'added'] += 1
+        return changes
+
+    def get(self, client: Optional[str]) -> Optional[ServiceArea]:
+        return self._areas.get(client) if client is not None else None
+
+    def distance_to(self, client: Optional[str], lat: float, lng: float) -> Optional[float]:
+        """Miles from a point to a client's service-area centre, or None for unknown clients"""
+        area = self.get(client)
+        return haversine_miles(lat, lng, area.lat, area.lng) if area else None
+
+    def nearby(self, lat: float, lng: float) -> List[ServiceAreaMatch]:
+        """Clients whose service area contains the point, nearest first"""
+        cell = self._cell(lat, lng)
+        with self._lock:
+            candidates = [self._areas[client] for client in self._cells.get(cell, ())]
+        matches = []
+        for area in candidates:
+            distance = haversine_miles(lat, lng, area.lat, area.lng)
+            if distance <= area.radius_miles:
+                matches.append(ServiceAreaMatch(area.client, distance, area.radius_miles))
+        matches.sort(key=lambda match: match.distance_miles)
+        return matches
+
+    def clients_at(self, lat: Optional[float], lng: Optional[float]) -> List[str]:
+        """Clients whose service area contains the point, nearest first; none for missing coordinates"""
+        if lat is None or lng is None or not (math.isfinite(lat) and math.isfinite(lng)):
+            return []
+        return [match.client for match in self.nearby(lat, lng)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'clients': len(self._areas), 'cells': len(self._cells)}
+
+    def __len__(self) -> int:
+        return len(self._areas)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def _covered_cells(self, area: ServiceArea) -> Iterator[Tuple[int, int]]:
+        lat_span = area.radius_miles / MILES_PER_DEGREE_LAT
+        # Longitude degrees shrink towards the poles; clamp to avoid blowing up near them
+        lng_span = lat_span / max(math.cos(math.radians(area.lat)), 0.01)
+        low_lat, low_lng = self._cell(area.lat - lat_span, area.lng - lng_span)
+        high_lat, high_lng = self._cell(area.lat + lat_span, area.lng + lng_span)
+        for cell_lat in range(low_lat, high_lat + 1):
+            for cell_lng in range(low_lng, high_lng + 1):
+                yield cell_lat, cell_lng
+
+    def _unregister(self, area: ServiceArea) -> None:
+        for cell in self._covered_cells(area):
+            clients = self._cells.get(cell)
+            if clients is not None:
+                clients.discard(area.client)
+                if not clients:
+                    del self._cells[cell]
+
+
+# Global instance
+service_areas = ServiceAreaIndex()
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Optional, Tuple
+from metrics import metrics
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+hedge_outcomes = metrics.counter(
+    "chat_hedge_total",
+    "Hedged chat turns: llm (text within budget), scripted (budget ran out), busy (earlier reply still running), "
+    "attached (late reply sent with the next turn), failed or expired (late reply never sent)",
+    labels=("outcome",)
+)
+
+
+class FirstTokenTimeout(Exception):
+    """The backend produced no text within the hedge budget"""
+
+
+class HedgedReply:
+    """A backend reply produced by its own task, so the caller can stop waiting for it.
+
+    The task reads the backend's frames as they come and queues them for
+    ``frames``. If the caller gives up before the first token the task
+    keeps running and the complete reply stays in ``reply``.
+    """
+
+    def __init__(self, frames: AsyncIterator[Dict[str, Any]]):
+        self.reply: Dict[str, Any] = {'response': "", 'scenario_detected': None, 'suggestions': [],
+                                      'conversation_id': None}
+        self.abandoned = False
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._pump(frames))
+        self.task.add_done_callback(self._finished)
+
+    async def _pump(self, frames: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            async for frame in frames:
+                if frame['type'] == 'meta':
+                    self.reply.update(scenario_detected=frame['scenario_detected'],
+                                      suggestions=frame['suggestions'],
+                                      conversation_id=frame.get('conversation_id'))
+                elif frame['type'] == 'token':
+                    self.reply['response'] += frame['content']
+                self._queue.put_nowait(frame)
+        except Exception as e:
+            self._queue.put_nowait(e)
+            raise
+        self._queue.put_nowait(None)
+
+    def _finished(self, task: "asyncio.Task") -> None:
+        # Retrieve the error so an abandoned reply that failed is logged once, not as "never retrieved"
+        error = None if task.cancelled() else task.exception()
+        if error is not None and self.abandoned:
+            logger.warning("Late LLM reply failed: %r", error)
+            hedge_outcomes.inc("failed")
+
+    def succeeded(self) -> bool:
+        return self.task.done() and not self.task.cancelled() and self.task.exception() is None
+
+    async def frames(self, budget: float) -> AsyncIterator[Dict[str, Any]]:
+        """The backend's frames as they arrive; raises FirstTokenTimeout if no text comes within ``budget`` seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        sent_text = False
+        try:
+            while True:
+                if sent_text or not self._queue.empty():
+                    item = await self._queue.get()
+                else:
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), deadline - loop.time())
+                    except asyncio.TimeoutError:
+                        self.abandoned = True
+                        hedge_outcomes.inc("scripted")
+                        raise FirstTokenTimeout() from None
+                if isinstance(item, Exception):
+                    raise item
+                if not sent_text and (item is None or item['type'] == 'token'):
+                    sent_text = True
+                    hedge_outcomes.inc("llm")
+                if item is None:
+                    return
+                yield item
+        finally:
+            if not self.abandoned:
+                # Done, failed or the client went away: nothing will read the rest
+                self.task.cancel()
+
+
+class FollowUps:
+    """Late replies of hedged turns, kept for the caregiver's next turn.
+
+    Held per process: with several workers the next turn is only attached
+    when it reaches the same one.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, HedgedReply]]" = OrderedDict()
+
+    def put(self, key: Hashable, hedge: HedgedReply) -> None:
+        now = self._clock()
+        self._entries[key] = (now, hedge)
+        self._entries.move_to_end(key)
+        while self._entries:
+            oldest_key, (added, oldest) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - added <= self.ttl_seconds:
+                break
+            del self._entries[oldest_key]
+            oldest.task.cancel()
+            if oldest.succeeded():
+                hedge_outcomes.inc("expired")
+
+    async def collect(self, key: Hashable, timeout: float) -> Tuple[bool, Optional[str]]:
+        """(ready, late reply) for a conversation's next turn.
+
+        A late reply still running is waited for up to ``timeout``; if it is
+        not done by then ``ready`` is False and it stays pending, so the
+        conversation never has two LLM replies in progress at once.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return True, None
+        added, hedge = entry
+        if self._clock() - added > self.ttl_seconds:
+            del self._entries[key]
+            if hedge.succeeded():
+                hedge_outcomes.inc("expired")
+            return True, None
+        if not hedge.task.done():
+            await asyncio.wait({hedge.task}, timeout=max(timeout, 0))
+            if not hedge.task.done():
+                hedge_outcomes.inc("busy")
+                return False, None
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        if not hedge.succeeded():
+            return True, None
+        hedge_outcomes.inc("attached")
+        return True, hedge.reply['response']
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': len(self._entries)}
+
+
+# Global instance
+follow_ups = FollowUps()
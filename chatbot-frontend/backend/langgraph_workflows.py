@@ -1,20 +1,160 @@
 from typing import Dict, Any, List, Optional
-from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage, AIMessage
+import asyncio
+from langgraph.graph import StateGraph, START, END
 from pydantic import BaseModel
-import json
+import threading
+import uuid
 from config import Config
+from checkpoint_store import checkpoint_store
+from llm_client import invoke_llm
+from llm_gateway import LLMUnavailable
+from metrics import metrics
+from conversation_context import context_builder
+from scenario_classifier import scenario_classifier
+from semantic_cache import semantic_cache
+from prompt_registry import prompts
 
-# Initialize Gemini LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-pro",
-    google_api_key=Config.get_google_api_key(),
-    temperature=0.7
-)
+# Classifier scenario -> workflow key
+SCENARIO_WORKFLOWS = {
+    "Schedule Issue": "schedule_issue",
+    "Location Issue": "location_issue",
+    "Phone Issue": "phone_issue",
+    "Timing Issue": "timing_issue",
+}
+
+turn_llm_calls = metrics.histogram("langgraph_turn_llm_calls", "LLM calls made by one LangGraph /chat turn",
+                                   labels=("scenario",), buckets=(0, 1, 2, 3, 5, 8))
+turn_stops = metrics.counter("langgraph_turn_stops_total",
+                             "LangGraph turns cut short by the turn policy, with the workflow left to resume",
+                             labels=("scenario", "reason"))
+
+# Entry nodes see the caregiver's details and opening message; later nodes the conversation so far
+START_SCHEDULE_ANALYSIS = prompts.register("langgraph:start_schedule_analysis", instructions="""
+    A caregiver has a schedule issue.
+    
+    Analyze the schedule problem and ask the appropriate first question to help resolve it.
+    Be professional, empathetic, and follow the company scripts.
+    
+    Determine if this is:
+    1. Missing schedule (no client showing)
+    2. Wrong schedule (different client/time)
+    3. Schedule conflict
+    
+    Respond as Rosella would, asking for clarification.
+""", variables="""
+    User Info: {user_info}
+    Issue: {issue}
+""")
+GATHER_SCHEDULE_DETAILS = prompts.register("langgraph:gather_schedule_details", instructions="""
+    Continue the conversation. The caregiver is providing more details about their schedule issue.
+    
+    Based on their response, either:
+    1. Ask for more specific details if needed
+    2. Provide the appropriate solution/next steps
+    3. Escalate to coordinator if necessary
+    
+    Use the Independence Care scripts and be helpful and professional.
+""", variables="""
+    Previous conversation:
+    {conversation}
+""")
+ANALYZE_LOCATION_ISSUE = prompts.register("langgraph:analyze_location_issue", instructions="""
+    A caregiver has a location/GPS issue.
+    
+    This could be:
+    1. GPS showing wrong location
+    2. Can't clock in due to location
+    3. Clocked in/out outside service area
+    
+    Respond professionally as Rosella, following company policy about location verification.
+    Ask appropriate questions to understand the situation.
+""", variables="""
+    User Info: {user_info}
+    Issue: {issue}
+""")
+VERIFY_LOCATION_DETAILS = prompts.register("langgraph:verify_location_details", instructions="""
+    Continue handling the location issue.
+    
+    Based on their explanation, provide appropriate guidance:
+    - If legitimate reason (picking up supplies), verify with client
+    - If GPS error, guide them to try again from correct location
+    - If policy violation, explain compliance requirements
+    
+    Be firm but helpful about location requirements.
+""", variables="""
+    Conversation:
+    {conversation}
+""")
+ANALYZE_PHONE_ISSUE = prompts.register("langgraph:analyze_phone_issue", instructions="""
+    A caregiver has a phone/IVR issue.
+    
+    This could be:
+    1. Phone number not registered
+    2. Using wrong phone (personal vs client's)
+    3. IVR system not working
+    
+    Ask appropriate questions to diagnose the phone issue.
+    Be helpful and guide them to the right solution.
+""", variables="""
+    User Info: {user_info}
+    Issue: {issue}
+""")
+RESOLVE_PHONE_ISSUE = prompts.register("langgraph:resolve_phone_issue", instructions="""
+    Continue resolving the phone issue.
+    
+    Provide the appropriate solution:
+    - Guide them to use client's house phone
+    - Help update phone number in system
+    - Escalate to technical support if needed
+    - Suggest using the mobile app as alternative
+""", variables="""
+    Conversation:
+    {conversation}
+""")
+ANALYZE_TIMING_ISSUE = prompts.register("langgraph:analyze_timing_issue", instructions="""
+    A caregiver has a timing issue.
+    
+    This could be:
+    1. Clocked in late
+    2. Clocked in early
+    3. Forgot to clock in on time
+    4. Schedule timing conflict
+    
+    Ask about the reason for the timing issue and offer solutions.
+    Be understanding but explain policy requirements.
+""", variables="""
+    User Info: {user_info}
+    Issue: {issue}
+""")
+RESOLVE_TIMING_ISSUE = prompts.register("langgraph:resolve_timing_issue", instructions="""
+    Continue handling the timing issue.
+    
+    Based on their reason, offer appropriate solutions:
+    - Suggest making up hours later in the week
+    - Adjust today's schedule if possible
+    - Explain policy about time adjustments
+    - Get client confirmation if needed
+""", variables="""
+    Conversation:
+    {conversation}
+""")
+HANDLE_GENERAL_ISSUE = prompts.register("langgraph:handle_general_issue", instructions="""
+    Handle this general caregiver inquiry.
+    
+    Provide helpful, professional assistance. If it's not a standard scenario,
+    offer to connect them with the appropriate department or supervisor.
+""", variables="""
+    User Info: {user_info}
+    Issue: {issue}
+""")
+
+def conversation_context(state: Dict) -> str:
+    """Render the conversation for a prompt, reusing the text built on earlier steps"""
+    return context_builder.render(state['conversation_id'], state['messages'])
 
 class ConversationState(BaseModel):
     """State management for LangGraph workflows"""
+    conversation_id: Optional[str] = None
     messages: List[Dict[str, str]] = []
     user_info: Dict[str, Any] = {}
     scenario_type: Optional[str] = None
@@ -24,62 +164,105 @@ class ConversationState(BaseModel):
     suggestions: List[str] = []
     workflow_complete: bool = False
 
+class TurnPolicy:
+    """How much of a workflow one /chat turn may run.
+    
+    Every node makes one LLM call, so ``max_llm_calls`` is also the number
+    of nodes a turn runs before it pauses. A turn that spends its budget or
+    reaches its deadline replies with the latest answer; the conversation's
+    checkpoint resumes at the node that did not run (or did not finish).
+    A turn cut off before its first node finished has no answer to give
+    and fails; the next turn starts the workflow over.
+    """
+    
+    def __init__(self,
+                 max_llm_calls: int = Config.LANGGRAPH_MAX_LLM_CALLS_PER_TURN,
+                 deadline_seconds: float = Config.LANGGRAPH_TURN_DEADLINE_SECONDS):
+        self.max_llm_calls = max_llm_calls
+        self.deadline_seconds = deadline_seconds
+
+def compile_workflow(workflow: StateGraph):
+    """Compile a graph, without a checkpointer so it can be built before forking workers.
+    
+    LangGraphWorkflows.checkpointed binds it to the worker's checkpoint
+    database: the next /chat turn resumes from the saved checkpoint with
+    the caregiver's reply appended instead of running the graph from its
+    entry point again; how far each turn gets is up to the TurnPolicy.
+    """
+    return workflow.compile()
+
+def entry_node(workflow) -> str:
+    """Name of the first node a compiled graph runs"""
+    return next(end for start, end in workflow.builder.edges if start == START)
+
+def resume_node(workflow, next_nodes) -> Optional[str]:
+    """Node to record the caregiver's reply as, so the paused step still runs next.
+    
+    Any node with a plain edge into the paused step routes there; LangGraph
+    cannot infer one itself when the checkpoint was seeded from a cached reply.
+    None when the paused step is the entry node, which only START leads to.
+    """
+    return next((start for start, end in workflow.builder.edges if end in next_nodes and start != START), None)
+
 class LangGraphWorkflows:
     """LangGraph workflow manager for caregiver scenarios"""
     
-    def __init__(self):
-        self.workflows = {
-            "schedule_issue": self.create_schedule_workflow(),
-            "location_issue": self.create_location_workflow(), 
-            "phone_issue": self.create_phone_workflow(),
-            "timing_issue": self.create_timing_workflow(),
-            "general": self.create_general_workflow()
+    # Compiled graphs are built on first use and shared by every instance
+    # (and, when the app is preloaded before forking, by every worker).
+    _compiled: Dict[str, Any] = {}
+    _compile_lock = threading.Lock()
+    
+    def __init__(self, turn_policy: Optional[TurnPolicy] = None):
+        self.turn_policy = turn_policy or TurnPolicy()
+        # Compiled graphs bound to the current checkpointer, by scenario
+        self._checkpointed: Dict[str, Any] = {}
+        self.builders = {
+            "schedule_issue": self.create_schedule_workflow,
+            "location_issue": self.create_location_workflow,
+            "phone_issue": self.create_phone_workflow,
+            "timing_issue": self.create_timing_workflow,
+            "general": self.create_general_workflow
         }
     
+    def get_workflow(self, scenario_type: str):
+        """Return the compiled graph for a scenario, compiling it on first use"""
+        if scenario_type not in self.builders:
+            scenario_type = "general"
+        workflow = self._compiled.get(scenario_type)
+        if workflow is None:
+            with self._compile_lock:
+                workflow = self._compiled.get(scenario_type)
+                if workflow is None:
+                    workflow = self.builders[scenario_type]()
+                    self._compiled[scenario_type] = workflow
+        return workflow
+    
+    async def checkpointed(self, scenario_type: str):
+        """The scenario's compiled graph, checkpointing to the conversation store"""
+        saver = await checkpoint_store.saver()
+        workflow = self._checkpointed.get(scenario_type)
+        if workflow is None or workflow.checkpointer is not saver:
+            workflow = self.get_workflow(scenario_type).copy(update={'checkpointer': saver})
+            self._checkpointed[scenario_type] = workflow
+        return workflow
+    
+    def precompile(self) -> None:
+        """Compile every graph up front, e.g. before forking worker processes"""
+        for scenario_type in self.builders:
+            self.get_workflow(scenario_type)
+    
     def analyze_scenario(self, user_message: str, reason: str) -> str:
         """Analyze user input to determine which workflow to use"""
-        combined_text = f"{reason} {user_message}".lower()
-        
-        # Schedule-related keywords
-        if any(word in combined_text for word in ["schedule", "calendar", "missing", "not showing", "removed"]):
-            return "schedule_issue"
-        
-        # Location/GPS keywords  
-        if any(word in combined_text for word in ["location", "gps", "address", "outside", "range", "distance"]):
-            return "location_issue"
-            
-        # Phone/communication keywords
-        if any(word in combined_text for word in ["phone", "number", "call", "ivr", "registered"]):
-            return "phone_issue"
-            
-        # Timing keywords
-        if any(word in combined_text for word in ["late", "early", "time", "clock", "hours"]):
-            return "timing_issue"
-            
-        return "general"
+        scenario = scenario_classifier.classify(user_message, reason)
+        return SCENARIO_WORKFLOWS.get(scenario, "general")
     
     def create_schedule_workflow(self) -> StateGraph:
         """Workflow for schedule-related issues"""
         
-        def start_schedule_analysis(state: Dict) -> Dict:
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver has a schedule issue.
+        async def start_schedule_analysis(state: Dict) -> Dict:
+            prompt = START_SCHEDULE_ANALYSIS.render(user_info=state['user_info'], issue=state['messages'][-1]['content'])
             
-            User Info: {state['user_info']}
-            Issue: {state['messages'][-1]['content']}
-            
-            Analyze the schedule problem and ask the appropriate first question to help resolve it.
-            Be professional, empathetic, and follow the company scripts.
-            
-            Determine if this is:
-            1. Missing schedule (no client showing)
-            2. Wrong schedule (different client/time)
-            3. Schedule conflict
-            
-            Respond as Rosella would, asking for clarification.
-            """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:start_schedule_analysis")
             
             state['current_step'] = 'gather_details'
             state['suggestions'] = [
@@ -93,21 +276,10 @@ class LangGraphWorkflows:
                 'messages': state['messages'] + [{'role': 'assistant', 'content': response.content}]
             }
         
-        def gather_schedule_details(state: Dict) -> Dict:
-            prompt = f"""
-            Continue the conversation as Rosella. The caregiver is providing more details about their schedule issue.
-            
-            Previous conversation: {state['messages']}
+        async def gather_schedule_details(state: Dict) -> Dict:
+            prompt = GATHER_SCHEDULE_DETAILS.render(conversation=conversation_context(state))
             
-            Based on their response, either:
-            1. Ask for more specific details if needed
-            2. Provide the appropriate solution/next steps
-            3. Escalate to coordinator if necessary
-            
-            Use the Independence Care scripts and be helpful and professional.
-            """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:gather_schedule_details")
             
             # Determine if we need more info or can provide solution
             if len(state['messages']) < 6:  # Continue gathering info
@@ -144,28 +316,15 @@ class LangGraphWorkflows:
             {"gather_details": "gather_details", END: END}
         )
         
-        return workflow.compile()
+        return compile_workflow(workflow)
     
     def create_location_workflow(self) -> StateGraph:
         """Workflow for GPS/location issues"""
         
-        def analyze_location_issue(state: Dict) -> Dict:
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver has a location/GPS issue.
-            
-            User Info: {state['user_info']}
-            Issue: {state['messages'][-1]['content']}
-            
-            This could be:
-            1. GPS showing wrong location
-            2. Can't clock in due to location
-            3. Clocked in/out outside service area
+        async def analyze_location_issue(state: Dict) -> Dict:
+            prompt = ANALYZE_LOCATION_ISSUE.render(user_info=state['user_info'], issue=state['messages'][-1]['content'])
             
-            Respond professionally as Rosella, following company policy about location verification.
-            Ask appropriate questions to understand the situation.
-            """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:analyze_location_issue")
             
             state['current_step'] = 'verify_location'
             state['suggestions'] = [
@@ -179,21 +338,10 @@ class LangGraphWorkflows:
                 'messages': state['messages'] + [{'role': 'assistant', 'content': response.content}]
             }
         
-        def verify_location_details(state: Dict) -> Dict:
-            prompt = f"""
-            Continue as Rosella handling the location issue.
-            
-            Conversation: {state['messages']}
-            
-            Based on their explanation, provide appropriate guidance:
-            - If legitimate reason (picking up supplies), verify with client
-            - If GPS error, guide them to try again from correct location
-            - If policy violation, explain compliance requirements
+        async def verify_location_details(state: Dict) -> Dict:
+            prompt = VERIFY_LOCATION_DETAILS.render(conversation=conversation_context(state))
             
-            Be firm but helpful about location requirements.
-            """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:verify_location_details")
             
             state['current_step'] = 'provide_solution'
             state['suggestions'] = [
@@ -216,28 +364,15 @@ class LangGraphWorkflows:
         workflow.add_edge("analyze_location", "verify_location")
         workflow.add_edge("verify_location", END)
         
-        return workflow.compile()
+        return compile_workflow(workflow)
     
     def create_phone_workflow(self) -> StateGraph:
         """Workflow for phone/IVR issues"""
         
-        def analyze_phone_issue(state: Dict) -> Dict:
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver has a phone/IVR issue.
-            
-            User Info: {state['user_info']}
-            Issue: {state['messages'][-1]['content']}
+        async def analyze_phone_issue(state: Dict) -> Dict:
+            prompt = ANALYZE_PHONE_ISSUE.render(user_info=state['user_info'], issue=state['messages'][-1]['content'])
             
-            This could be:
-            1. Phone number not registered
-            2. Using wrong phone (personal vs client's)
-            3. IVR system not working
-            
-            Ask appropriate questions to diagnose the phone issue.
-            Be helpful and guide them to the right solution.
-            """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:analyze_phone_issue")
             
             state['current_step'] = 'diagnose_phone'
             state['suggestions'] = [
@@ -251,20 +386,10 @@ class LangGraphWorkflows:
                 'messages': state['messages'] + [{'role': 'assistant', 'content': response.content}]
             }
         
-        def resolve_phone_issue(state: Dict) -> Dict:
-            prompt = f"""
-            Continue as Rosella resolving the phone issue.
-            
-            Conversation: {state['messages']}
-            
-            Provide the appropriate solution:
-            - Guide them to use client's house phone
-            - Help update phone number in system
-            - Escalate to technical support if needed
-            - Suggest using the mobile app as alternative
-            """
+        async def resolve_phone_issue(state: Dict) -> Dict:
+            prompt = RESOLVE_PHONE_ISSUE.render(conversation=conversation_context(state))
             
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:resolve_phone_issue")
             
             state['current_step'] = 'provide_solution'
             state['suggestions'] = [
@@ -287,29 +412,15 @@ class LangGraphWorkflows:
         workflow.add_edge("analyze_phone", "resolve_phone")
         workflow.add_edge("resolve_phone", END)
         
-        return workflow.compile()
+        return compile_workflow(workflow)
     
     def create_timing_workflow(self) -> StateGraph:
         """Workflow for timing/late arrival issues"""
         
-        def analyze_timing_issue(state: Dict) -> Dict:
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver has a timing issue.
+        async def analyze_timing_issue(state: Dict) -> Dict:
+            prompt = ANALYZE_TIMING_ISSUE.render(user_info=state['user_info'], issue=state['messages'][-1]['content'])
             
-            User Info: {state['user_info']}
-            Issue: {state['messages'][-1]['content']}
-            
-            This could be:
-            1. Clocked in late
-            2. Clocked in early
-            3. Forgot to clock in on time
-            4. Schedule timing conflict
-            
-            Ask about the reason for the timing issue and offer solutions.
-            Be understanding but explain policy requirements.
-            """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:analyze_timing_issue")
             
             state['current_step'] = 'understand_reason'
             state['suggestions'] = [
@@ -323,20 +434,10 @@ class LangGraphWorkflows:
                 'messages': state['messages'] + [{'role': 'assistant', 'content': response.content}]
             }
         
-        def resolve_timing_issue(state: Dict) -> Dict:
-            prompt = f"""
-            Continue as Rosella handling the timing issue.
-            
-            Conversation: {state['messages']}
-            
-            Based on their reason, offer appropriate solutions:
-            - Suggest making up hours later in the week
-            - Adjust today's schedule if possible
-            - Explain policy about time adjustments
-            - Get client confirmation if needed
-            """
+        async def resolve_timing_issue(state: Dict) -> Dict:
+            prompt = RESOLVE_TIMING_ISSUE.render(conversation=conversation_context(state))
             
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:resolve_timing_issue")
             
             state['current_step'] = 'provide_solution'
             state['suggestions'] = [
@@ -359,23 +460,15 @@ class LangGraphWorkflows:
         workflow.add_edge("analyze_timing", "resolve_timing")
         workflow.add_edge("resolve_timing", END)
         
-        return workflow.compile()
+        return compile_workflow(workflow)
     
     def create_general_workflow(self) -> StateGraph:
         """General workflow for other issues"""
         
-        def handle_general_issue(state: Dict) -> Dict:
-            prompt = f"""
-            You are Rosella from Independence Care. Handle this general caregiver inquiry.
+        async def handle_general_issue(state: Dict) -> Dict:
+            prompt = HANDLE_GENERAL_ISSUE.render(user_info=state['user_info'], issue=state['messages'][-1]['content'])
             
-            User Info: {state['user_info']}
-            Issue: {state['messages'][-1]['content']}
-            
-            Provide helpful, professional assistance. If it's not a standard scenario,
-            offer to connect them with the appropriate department or supervisor.
-            """
-            
-            response = llm.invoke([HumanMessage(content=prompt)])
+            response = await invoke_llm(prompt, node="langgraph:handle_general_issue")
             
             state['current_step'] = 'provide_assistance'
             state['suggestions'] = [
@@ -395,18 +488,55 @@ class LangGraphWorkflows:
         workflow.set_entry_point("handle_general")
         workflow.add_edge("handle_general", END)
         
-        return workflow.compile()
+        return compile_workflow(workflow)
+    
+    async def process_message(self, user_info: Dict, message: str, conversation_history: List[Dict] = None,
+                              conversation_id: str = None) -> Dict:
+        """Advance the conversation's LangGraph workflow by one step.
+        
+        A workflow paused on an earlier turn resumes at its next node with
+        the new message appended. Otherwise the message starts the workflow
+        for its scenario, carrying over the messages of a finished one.
+        """
+        reply = await self.advance(user_info, message, conversation_history, conversation_id)
+        await checkpoint_store.finish_turn(reply['conversation_id'])
+        return reply
     
-    async def process_message(self, user_info: Dict, message: str, conversation_history: List[Dict] = None) -> Dict:
-        """Process a message through the appropriate LangGraph workflow"""
+    async def advance(self, user_info: Dict, message: str, conversation_history: Optional[List[Dict]],
+                      conversation_id: Optional[str]) -> Dict:
+        if not conversation_id:
+            conversation_id = f"{user_info.get('user_name', 'unknown')}_{uuid.uuid4().hex[:12]}"
+        config = {'configurable': {'thread_id': conversation_id}}
+        user_message = {'role': 'user', 'content': message}
+        
+        # StateGraph(dict) keeps the whole state in its root channel
+        saved = await (await checkpoint_store.saver()).aget_tuple(config)
+        previous = saved.checkpoint['channel_values'].get('__root__') if saved else None
+        if previous:
+            workflow = await self.checkpointed(previous['scenario_type'])
+            snapshot = await workflow.aget_state(config)
+            resume_as = resume_node(workflow, snapshot.next) if snapshot.next else None
+            if resume_as is not None:
+                await workflow.aupdate_state(config, {
+                    **snapshot.values,
+                    'user_info': user_info,
+                    'messages': snapshot.values['messages'] + [user_message]
+                }, as_node=resume_as)
+                result = await self.run_turn(workflow, None, config, previous['scenario_type'])
+                return self.reply(conversation_id, previous['scenario_type'], result)
+            if not snapshot.next:
+                conversation_history = previous['messages'] + [user_message]
+            # Otherwise the first step failed or ran out of time and nothing was answered:
+            # the new message starts the workflow over
         
         # Determine scenario
         scenario_type = self.analyze_scenario(message, user_info.get('reason_for_contact', ''))
         
         # Initialize state
         state = {
+            'conversation_id': conversation_id,
             'user_info': user_info,
-            'messages': conversation_history or [{'role': 'user', 'content': message}],
+            'messages': conversation_history or [user_message],
             'scenario_type': scenario_type,
             'current_step': 'start',
             'collected_data': {},
@@ -415,15 +545,79 @@ class LangGraphWorkflows:
         }
         
         # Get appropriate workflow
-        workflow = self.workflows.get(scenario_type, self.workflows['general'])
+        workflow = await self.checkpointed(scenario_type)
+        
+        # A fresh conversation depends only on the opening message, so a
+        # similar earlier one can answer it without running the graph
+        cache_key = f"langgraph:{scenario_type}"
+        user_name = user_info.get('user_name', '')
+        if not conversation_history:
+            cached = semantic_cache.lookup(cache_key, message, user_name)
+            if cached is not None:
+                # Checkpoint the cached reply as the entry node's step, so the next turn resumes after it
+                await workflow.aupdate_state(config, {
+                    **state,
+                    'messages': state['messages'] + [{'role': 'assistant', 'content': cached['response']}],
+                    'suggestions': cached['suggestions'],
+                    'current_step': cached['next_step'],
+                    'workflow_complete': cached['workflow_complete']
+                }, as_node=entry_node(workflow))
+                return {**cached, 'conversation_id': conversation_id}
+        
+        # Start the workflow
+        result = await self.run_turn(workflow, state, config, scenario_type)
+        
+        reply = self.reply(conversation_id, scenario_type, result)
+        if not conversation_history:
+            # Every assistant turn the graph added cost one LLM call
+            llm_calls = len(result['messages']) - len(state['messages'])
+            cacheable = {key: value for key, value in reply.items() if key != 'conversation_id'}
+            semantic_cache.store(cache_key, message, cacheable, user_name, llm_calls=max(llm_calls, 1))
+        return reply
+    
+    async def run_turn(self, workflow, graph_input: Optional[Dict], config: Dict, scenario_type: str) -> Dict:
+        """Run the workflow within the turn policy; returns the state after the last node that finished"""
+        policy = self.turn_policy
+        result, llm_calls, stop = None, 0, None
         
-        # Execute workflow
-        result = workflow.invoke(state)
+        async def consume() -> None:
+            nonlocal result, llm_calls, stop
+            # Synchronous checkpoints, so a turn stopped early can always be resumed
+            async for mode, chunk in workflow.astream(graph_input, config, stream_mode=["tasks", "values"],
+                                                      durability="sync"):
+                if mode == "values":
+                    # A resumed run first repeats the saved state
+                    if llm_calls:
+                        result = chunk
+                elif 'result' in chunk:
+                    llm_calls += 1
+                elif llm_calls >= policy.max_llm_calls:
+                    # The next node is only about to start: leave it to the next turn
+                    stop = "llm_budget"
+                    break
         
+        try:
+            await asyncio.wait_for(consume(), policy.deadline_seconds)
+        except asyncio.TimeoutError:
+            stop = "deadline"
+        
+        turn_llm_calls.observe(llm_calls, scenario_type)
+        if stop:
+            turn_stops.inc(scenario_type, stop)
+        if result is None:
+            raise LLMUnavailable(f"LangGraph turn got no reply within {policy.deadline_seconds:g}s")
+        return result
+    
+    @staticmethod
+    def reply(conversation_id: str, scenario_type: str, result: Dict) -> Dict:
         return {
             'response': result['messages'][-1]['content'],
             'scenario_detected': scenario_type,
             'suggestions': result.get('suggestions', []),
             'workflow_complete': result.get('workflow_complete', False),
-            'next_step': result.get('current_step', 'complete')
-        } 
\ No newline at end of file
+            'next_step': result.get('current_step', 'complete'),
+            'conversation_id': conversation_id
+        }
+
+# Global instance
+langgraph_assistant = LangGraphWorkflows()
@@ -0,0 +1,130 @@
+import threading
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
+from config import Config
+from conversation_context import count_tokens
+from llm_gateway import llm_gateway
+from metrics import metrics
+from name_masking import NAME_PLACEHOLDER, mask_name
+from single_flight import llm_flights, prompt_key
+
+_llm: Optional[Any] = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    """Return the shared Gemini chat client, creating it on first use.
+
+    langchain_google_genai is imported here rather than at module import so
+    workers start without paying for it (or for API key setup) until the
+    first LLM-backed request arrives.
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                _llm = ChatGoogleGenerativeAI(
+                    model=Config.LLM_MODEL,
+                    google_api_key=Config.get_google_api_key(),
+                    temperature=0.7,
+                    max_retries=1  # a single attempt; llm_gateway owns retries and timeouts
+                )
+    return _llm
+
+
+def set_llm(llm: Any) -> None:
+    """Replace the shared client (e.g. with a local fake for benchmarks)"""
+    global _llm
+    _llm = llm
+
+
+llm_latency = metrics.histogram("llm_request_duration_seconds", "LLM call latency by workflow node",
+                                labels=("node", "outcome"))
+llm_first_token = metrics.histogram("llm_first_token_seconds", "Time to the first streamed LLM chunk",
+                                    labels=("node",))
+llm_coalesced = metrics.counter("llm_coalesced_total",
+                                "LLM calls answered by joining an identical prompt already in flight",
+                                labels=("node",))
+llm_tokens = metrics.counter("llm_tokens_total", "LLM tokens by workflow node (estimated when the model reports none)",
+                             labels=("node", "direction"))
+
+
+def _record_tokens(node: str, messages: List[Any], reply: str, usage: Optional[Dict[str, int]]) -> None:
+    if usage:
+        input_tokens, output_tokens = usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+    else:
+        input_tokens = sum(count_tokens(str(message.content)) for message in messages)
+        output_tokens = count_tokens(reply)
+    llm_tokens.inc(node, "input", amount=input_tokens)
+    llm_tokens.inc(node, "output", amount=output_tokens)
+
+
+def model_name(llm: Any) -> str:
+    """The gateway's key for a client: its model, or its class for test doubles"""
+    return getattr(llm, 'model', None) or type(llm).__name__
+
+
+async def invoke_llm(messages: List[Any], node: str, llm: Any = None, user_name: str = ""):
+    """``ainvoke`` on the chat client through llm_gateway, recording latency and token counts under ``node``.
+    
+    Concurrent calls with the same normalised prompt share one provider
+    call (see single_flight). Pass the caregiver's ``user_name`` when it
+    appears in the prompt: it is masked in the coalescing key, so the same
+    question from different caregivers is asked once, and each caller gets
+    its own copy of the reply addressed to them.
+    """
+    llm = llm or get_llm()
+    model = model_name(llm)
+    
+    async def call():
+        response = await llm_gateway.call(model, lambda: llm.ainvoke(messages))
+        _record_tokens(node, messages, str(response.content), getattr(response, 'usage_metadata', None))
+        if user_name and isinstance(response.content, str):
+            response = response.model_copy(update={'content': mask_name(response.content, user_name)})
+        return response
+    
+    start = time.perf_counter()
+    try:
+        shared_response, coalesced = await llm_flights.do(prompt_key(model, messages, user_name), call)
+    except BaseException:
+        llm_latency.observe(time.perf_counter() - start, node, "error")
+        raise
+    llm_latency.observe(time.perf_counter() - start, node, "ok")
+    if coalesced:
+        llm_coalesced.inc(node)
+    content = shared_response.content
+    if user_name and isinstance(content, str):
+        content = content.replace(NAME_PLACEHOLDER, user_name)
+    return shared_response.model_copy(update={'content': content}, deep=True)
+
+
+async def stream_llm(messages: List[Any], node: str, llm: Any = None) -> AsyncIterator[Any]:
+    """``astream`` on the chat client through llm_gateway, recording time to first chunk, latency and tokens"""
+    llm = llm or get_llm()
+    start = time.perf_counter()
+    parts: List[str] = []
+    usage: Dict[str, int] = {}
+    outcome = "error"
+    try:
+        # aclosing: give the gateway slot back as soon as the caller stops reading
+        async with aclosing(llm_gateway.stream(model_name(llm), lambda: llm.astream(messages))) as chunks:
+            async for chunk in chunks:
+                if not parts:
+                    llm_first_token.observe(time.perf_counter() - start, node)
+                parts.append(str(chunk.content))
+                # Chunks report usage deltas
+                for key, value in (getattr(chunk, 'usage_metadata', None) or {}).items():
+                    if key in ('input_tokens', 'output_tokens'):
+                        usage[key] = usage.get(key, 0) + value
+                yield chunk
+        outcome = "ok"
+    except GeneratorExit:
+        # The caller stopped reading (client went away)
+        outcome = "cancelled"
+        raise
+    finally:
+        llm_latency.observe(time.perf_counter() - start, node, outcome)
+        if outcome == "ok":
+            _record_tokens(node, messages, "".join(parts), usage)
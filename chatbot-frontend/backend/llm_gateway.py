@@ -0,0 +1,340 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+from config import Config
+from metrics import metrics
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying; other 4xx are our fault and would fail again
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+# Provider errors caused by the request itself (matched by name so the
+# Google client libraries are not imported here)
+CLIENT_ERROR_NAMES = frozenset({
+    "ChatGoogleGenerativeAIError", "InvalidArgument", "PermissionDenied", "Unauthenticated", "NotFound",
+    "FailedPrecondition",
+})
+
+queue_wait = metrics.histogram("llm_gateway_queue_wait_seconds", "Time LLM calls wait for a concurrency slot",
+                               labels=("model",))
+retries = metrics.counter("llm_gateway_retries_total", "LLM attempts retried after a transient error",
+                          labels=("model",))
+timeouts = metrics.counter("llm_gateway_timeouts_total", "LLM attempts that ran out of time", labels=("model",))
+rejections = metrics.counter("llm_gateway_rejected_total", "LLM calls refused without reaching the provider",
+                             labels=("model", "reason"))
+circuit_opened = metrics.counter("llm_gateway_circuit_opened_total", "Times the circuit breaker opened",
+                                 labels=("model",))
+
+
+class LLMUnavailable(Exception):
+    """The provider cannot answer in time: circuit open, queue full or deadline passed"""
+
+
+class CircuitOpenError(LLMUnavailable):
+    pass
+
+
+class LLMOverloaded(LLMUnavailable):
+    pass
+
+
+class LLMTimeout(LLMUnavailable, TimeoutError):
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an LLM error is transient (worth retrying, and a sign of provider trouble)"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    if isinstance(error, (ValueError, TypeError, KeyError)) or type(error).__name__ in CLIENT_ERROR_NAMES:
+        return False
+    return True
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` transient failures in a row the circuit
+    opens and calls are refused for ``cooldown_seconds``. Then one probe
+    call is let through (half-open): success closes the circuit, failure
+    opens it for another cooldown.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow(self) -> Tuple[bool, bool]:
+        """(allowed, is_probe) for a new call"""
+        if self.state == self.CLOSED:
+            return True, False
+        if self.state == self.OPEN and self._clock() - self.opened_at >= self.cooldown_seconds:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True, True
+        return False, False
+
+    def is_open(self) -> bool:
+        """Open and still cooling down (a half-open circuit accepts its probe)"""
+        return self.state == self.OPEN and self._clock() - self.opened_at < self.cooldown_seconds
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Count a transient failure; returns True if this opened the circuit"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+            self.probe_in_flight = False
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """The probe ended without a verdict (e.g. the client went away)"""
+        self.probe_in_flight = False
+
+
+class _ModelState:
+    __slots__ = ("semaphore", "loop", "breaker", "waiting", "in_flight")
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.loop = None
+        self.breaker = breaker
+        self.waiting = 0
+        self.in_flight = 0
+
+
+class LLMGateway:
+    """The one path from the app to LLM providers.
+
+    Per model it enforces:
+
+    - a concurrency cap (an asyncio semaphore), with at most ``max_queue``
+      calls waiting for a slot; further calls are refused at once
+    - a deadline of ``timeout`` seconds per call, covering the queue wait,
+      every attempt and the backoff between them, with each attempt also
+      capped at ``attempt_timeout``
+    - up to ``max_retries`` retries of transient errors, after a fully
+      jittered exponential backoff
+    - a circuit breaker that refuses calls while the provider is failing,
+      so chats go straight to the scripted templates instead of queueing
+
+    All refusals raise LLMUnavailable.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = Config.LLM_MAX_CONCURRENCY,
+                 max_queue: int = Config.LLM_MAX_QUEUE,
+                 timeout: float = Config.LLM_TIMEOUT_SECONDS,
+                 attempt_timeout: float = Config.LLM_ATTEMPT_TIMEOUT_SECONDS,
+                 max_retries: int = Config.LLM_MAX_RETRIES,
+                 backoff_base: float = Config.LLM_BACKOFF_BASE_SECONDS,
+                 backoff_cap: float = Config.LLM_BACKOFF_CAP_SECONDS,
+                 breaker_failures: int = Config.LLM_BREAKER_FAILURES,
+                 breaker_cooldown: float = Config.LLM_BREAKER_COOLDOWN_SECONDS,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: Callable[[], float] = random.random):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._clock = clock
+        self._rng = rng
+        self._models: Dict[str, _ModelState] = {}
+
+    async def call(self, model: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run ``attempt`` (e.g. ``lambda: llm.ainvoke(messages)``) under the model's policy"""
+        state = self._state(model)
+        deadline = self._clock() + self.timeout
+        async with self._admitted(model, state, deadline):
+            return await self._attempts(model, state, deadline, attempt)
+
+    async def stream(self, model: str, open_stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Stream from ``open_stream`` (e.g. ``lambda: llm.astream(messages)``) under the model's policy.
+
+        Attempts are retried until the first chunk arrives; after that the
+        reply is on its way to the user and errors propagate. Each later
+        chunk must arrive within ``attempt_timeout``.
+        """
+        state = self._state(model)
+        deadline = self._clock() + self.timeout
+
+        async def first_chunk():
+            iterator = open_stream().__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, None
+            except BaseException:
+                await _aclose(iterator)
+                raise
+
+        async with self._admitted(model, state, deadline):
+            iterator, chunk = await self._attempts(model, state, deadline, first_chunk)
+            try:
+                while chunk is not None:
+                    yield chunk
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), self.attempt_timeout)
+                    except StopAsyncIteration:
+                        chunk = None
+                    except asyncio.TimeoutError:
+                        timeouts.inc(model)
+                        self._failure(model, state)
+                        raise LLMTimeout(f"{model}: stream stalled for {self.attempt_timeout}s")
+                    except Exception as e:
+                        if is_retryable(e):
+                            self._failure(model, state)
+                        raise
+            finally:
+                await _aclose(iterator)
+
+    def degraded(self) -> bool:
+        """Whether any model's circuit is open, i.e. LLM-backed replies would be refused"""
+        return any(state.breaker.is_open() for state in self._models.values())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            model: {
+                'waiting': state.waiting,
+                'in_flight': state.in_flight,
+                'circuit': state.breaker.state,
+                'consecutive_failures': state.breaker.failures,
+            }
+            for model, state in self._models.items()
+        }
+
+    def samples(self) -> Iterator[Tuple[str, str, str, Dict[str, str], float]]:
+        """Queue depth, in-flight calls and circuit state per model, for /metrics"""
+        prefix = f"{metrics.prefix}_llm_gateway"
+        for model, stats in self.stats().items():
+            labels = {"model": model}
+            yield f"{prefix}_waiting", "gauge", "LLM calls waiting for a concurrency slot", labels, stats['waiting']
+            yield f"{prefix}_in_flight", "gauge", "LLM calls holding a concurrency slot", labels, stats['in_flight']
+            yield (f"{prefix}_circuit_open", "gauge", "1 while the circuit breaker refuses calls", labels,
+                   float(stats['circuit'] != CircuitBreaker.CLOSED))
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(
+                CircuitBreaker(self.breaker_failures, self.breaker_cooldown, self._clock))
+        loop = asyncio.get_running_loop()
+        if state.loop is not loop:
+            # Semaphores belong to one event loop (tests and benchmarks run several)
+            state.semaphore, state.loop = asyncio.Semaphore(self.max_concurrency), loop
+        return state
+
+    @asynccontextmanager
+    async def _admitted(self, model: str, state: _ModelState, deadline: float):
+        """Pass the circuit breaker and take a concurrency slot before the deadline"""
+        allowed, is_probe = state.breaker.allow()
+        if not allowed:
+            rejections.inc(model, "circuit_open")
+            raise CircuitOpenError(f"{model}: circuit open")
+        try:
+            if state.semaphore.locked():
+                if state.waiting >= self.max_queue:
+                    rejections.inc(model, "queue_full")
+                    raise LLMOverloaded(f"{model}: {state.waiting} calls already waiting")
+                start = self._clock()
+                state.waiting += 1
+                try:
+                    await asyncio.wait_for(state.semaphore.acquire(), max(deadline - self._clock(), 0))
+                except asyncio.TimeoutError:
+                    rejections.inc(model, "queue_timeout")
+                    raise LLMTimeout(f"{model}: no slot free within {self.timeout}s") from None
+                finally:
+                    state.waiting -= 1
+                queue_wait.observe(self._clock() - start, model)
+            else:
+                await state.semaphore.acquire()
+                queue_wait.observe(0.0, model)
+            state.in_flight += 1
+            try:
+                yield
+            finally:
+                state.in_flight -= 1
+                state.semaphore.release()
+        finally:
+            if is_probe and state.breaker.probe_in_flight:
+                state.breaker.release_probe()
+
+    async def _attempts(self, model: str, state: _ModelState, deadline: float,
+                        attempt: Callable[[], Awaitable[T]]) -> T:
+        number = 0
+        while True:
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                timeouts.inc(model)
+                raise LLMTimeout(f"{model}: deadline of {self.timeout}s passed")
+            limit = min(self.attempt_timeout, remaining)
+            try:
+                result = await asyncio.wait_for(attempt(), limit)
+            except asyncio.TimeoutError:
+                timeouts.inc(model)
+                error: BaseException = LLMTimeout(f"{model}: no reply within {limit:.1f}s")
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                error = e
+            else:
+                state.breaker.record_success()
+                return result
+
+            if self._failure(model, state):
+                raise CircuitOpenError(f"{model}: circuit opened after {state.breaker.failures} failures") from error
+            delay = self._rng() * min(self.backoff_cap, self.backoff_base * 2 ** number)
+            out_of_time = self._clock() + delay >= deadline
+            if number >= self.max_retries or out_of_time or state.breaker.state != CircuitBreaker.CLOSED:
+                if isinstance(error, LLMUnavailable):
+                    raise error
+                raise LLMUnavailable(f"{model}: {error!r} after {number + 1} attempts") from error
+            number += 1
+            retries.inc(model)
+            logger.debug("Retrying %s in %.2fs after %r", model, delay, error)
+            await asyncio.sleep(delay)
+
+    def _failure(self, model: str, state: _ModelState) -> bool:
+        opened = state.breaker.record_failure()
+        if opened:
+            circuit_opened.inc(model)
+            logger.warning("Circuit opened for %s after %d failures; serving scripted replies for %gs",
+                           model, state.breaker.failures, self.breaker_cooldown)
+        return opened
+
+
+async def _aclose(iterator: Any) -> None:
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+# Global instance
+llm_gateway = LLMGateway()
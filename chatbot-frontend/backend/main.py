@@ -1,12 +1,49 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import datetime
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Optional, Dict, Any, AsyncIterator, Callable, Hashable, List, Literal
+import json
+import time
+from contextlib import asynccontextmanager
+import uuid
 from enum import Enum
+from config import Config
 from simple_ai import simple_ai
-
-app = FastAPI(title="Caregiver AI Agent Backend", version="1.0.0")
+from scenario_classifier import scenario_classifier
+from response_cache import ResponseCache
+from clock_batch import evaluate_clock_events
+from clock_rules import ClockFacts, evaluate_clock_event, clock_rule_stats, PHONE_NOT_FOUND, INVALID_EVENT
+from geofence import haversine_miles, service_areas
+from schedule_store import ScheduleStore
+from dedup_index import DedupIndex, clock_dedup
+from fast_json import FastJSONRoute
+from conversation_context import context_builder
+from semantic_cache import semantic_cache
+from metrics import metrics, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from structured_logging import setup_logging, get_logger, logging_stats, RequestIdMiddleware
+from llm_gateway import llm_gateway, LLMUnavailable
+from single_flight import llm_flights
+from hedging import HedgedReply, FirstTokenTimeout, follow_ups
+
+setup_logging()
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the LangGraph checkpoint database in each worker, after any fork, and close it on shutdown"""
+    store = None
+    if Config.CHAT_BACKEND == "langgraph":
+        # Imported only for that backend, like the backend itself
+        from checkpoint_store import checkpoint_store as store
+        await store.saver()
+    yield
+    if store is not None:
+        await store.close()
+
+app = FastAPI(title="Caregiver AI Agent Backend", version="1.0.0", lifespan=lifespan)
+if Config.FAST_JSON_RESPONSES:
+    app.router.route_class = FastJSONRoute
 
 # Enable CORS for frontend connection
 app.add_middleware(
@@ -17,6 +54,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+request_latency = metrics.histogram("http_request_duration_seconds", "Request latency by route and status",
+                                    labels=("method", "path", "status"))
+chat_scenarios = metrics.counter("chat_scenarios_total", "Chat replies by detected scenario", labels=("scenario",))
+chat_fallbacks = metrics.counter("chat_fallbacks_total",
+                                 "Chat replies served by a scripted fallback: the LLM was degraded or the backend failed",
+                                 labels=("endpoint", "reason"))
+app.add_middleware(MetricsMiddleware, histogram=request_latency)
+app.add_middleware(RequestIdMiddleware)
+
 # Data models
 class ScenarioType(str, Enum):
     NO_SCHEDULE = "no_schedule"
@@ -31,6 +77,8 @@ class ChatRequest(BaseModel):
     contact_number: str
     reason_for_contact: str
     message: str
+    # Returned with the first reply; sending it back continues that conversation
+    conversation_id: Optional[str] = None
 
 class ClockInRequest(BaseModel):
     caregiver_name: str
@@ -49,16 +97,104 @@ class ClockOutRequest(BaseModel):
     scheduled_time: str
     actual_time: str
 
+class ClockEvent(BaseModel):
+    """One clock-in or clock-out in a batch delivered by the EVV vendor"""
+    event_type: Literal["clock_in", "clock_out"]
+    caregiver_name: str
+    client_name: Optional[str] = None
+    phone_number: str
+    location: Dict[str, float]
+    scheduled_time: str
+    actual_time: str
+    has_schedule: bool = True
+
 class ScenarioResponse(BaseModel):
     scenario_type: ScenarioType
     agent_script: str
     actions_required: list[str]
     priority: str  # "high", "medium", "low"
 
+class ClockEventResult(BaseModel):
+    """Outcome of one event in a batch: its agent script, or why it could not be evaluated"""
+    status: Literal["ok", "invalid"]
+    result: Optional[ScenarioResponse] = None
+    error: Optional[str] = None
+
 class ChatResponse(BaseModel):
     response: str
     scenario_detected: Optional[str] = None
     suggestions: list[str] = []
+    conversation_id: Optional[str] = None
+    # The LLM's answer to the previous message, when a scripted reply was sent in its place
+    follow_up: Optional[str] = None
+
+# Fixed agent scripts for clock-in/out outcomes
+SCRIPTED_RESPONSES: Dict[str, ScenarioResponse] = {
+    "clock_in_no_schedule": ScenarioResponse(
+        scenario_type=ScenarioType.NO_SCHEDULE,
+        agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today?
+            
+I see you clocked in but there seems to be no schedule on your Calendar, can you confirm the client you are working with today?
+
+[Wait for response]
+
+No, please do not leave. Unfortunately, the app can malfunction at times and remove Caregivers from schedules. I will add you to the schedule and clock you in, if for any reason this causes an error your coordinator will reach out to you to clarify.""",
+        actions_required=["Add caregiver to schedule", "Clock in caregiver", "Notify coordinator"],
+        priority="high"
+    ),
+    "clock_in_gps_out_of_range": ScenarioResponse(
+        scenario_type=ScenarioType.GPS_OUT_OF_RANGE,
+        agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
+
+I have noticed you have clocked in outside of the client's service area, which is not close to your client's house. Can you please clock in again once you are at your client's house, because we are not able to accept this clock in.
+
+[Listen for explanation]
+
+Remember it is state law that a Home Care agency cannot bill for visits that are rendered outside of the client's home.""",
+        actions_required=["Request re-clock in", "Verify location", "Document exception if valid"],
+        priority="high"
+    ),
+    "clock_in_out_of_window": ScenarioResponse(
+        scenario_type=ScenarioType.OUT_OF_WINDOW,
+        agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
+
+I have noticed that you clocked in late for your shift today, I just wanted to confirm what was the reason for that?
+
+[Listen for reason]
+
+Would you be willing to make up for the hours you missed today by staying late on your shift today? Or any other day throughout the week?""",
+        actions_required=["Confirm reason", "Adjust schedule if needed", "Document time change"],
+        priority="medium"
+    ),
+    "clock_in_success": ScenarioResponse(
+        scenario_type=ScenarioType.NO_SCHEDULE,  # Will add more specific success type
+        agent_script="Clock-in successful. Have a great shift!",
+        actions_required=["Log successful clock-in"],
+        priority="low"
+    ),
+    "clock_out_gps_out_of_range": ScenarioResponse(
+        scenario_type=ScenarioType.GPS_OUT_OF_RANGE,
+        agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
+
+I have noticed your clock out is outside of the client's service area, and we are not able to accept that. Can you please go back and clock out from your client's house? Because we can't complete the visit without your clock out.
+
+I apologize for the inconvenience this causes but we will not be able to mark your shift as completed without a clock out, so it is really important.""",
+        actions_required=["Request return to client location", "Re-clock out", "Document issue"],
+        priority="high"
+    ),
+    "clock_out_success": ScenarioResponse(
+        scenario_type=ScenarioType.NO_SCHEDULE,  # Success type
+        agent_script="Clock-out successful. Thank you for your service today!",
+        actions_required=["Log successful clock-out"],
+        priority="low"
+    ),
+    "duplicate_call": ScenarioResponse(
+        scenario_type=ScenarioType.DUPLICATE_CALL,
+        agent_script="Duplicate call detected - no action required",
+        actions_required=["Reject duplicate event"],
+        priority="low"
+    )
+}
 
 # In-memory storage (replace with database in production)
 registered_phones = {
@@ -66,6 +202,7 @@ registered_phones = {
     "+0987654321": "Jane Client"
 }
 
+# Seed schedules, loaded into schedule_store below
 caregiver_schedules = {
     "Mary Caregiver": {
         "client": "John Client",
@@ -75,6 +212,228 @@ caregiver_schedules = {
     }
 }
 
+def load_schedules() -> ScheduleStore:
+    """Build the schedule store from caregiver_schedules and Config.SCHEDULE_CSV_PATH.
+    
+    Client service areas are re-synced from the loaded data; only clients
+    whose area changed are re-indexed.
+    """
+    store = ScheduleStore()
+    for caregiver, schedule in caregiver_schedules.items():
+        store.add_schedule_text(caregiver, schedule["client"], schedule["phone"], schedule["schedule"])
+        if schedule.get("location"):
+            store.client_locations[schedule["client"]] = schedule["location"]
+    if Config.SCHEDULE_CSV_PATH:
+        count = store.load_csv(Config.SCHEDULE_CSV_PATH)
+        logger.info("Loaded %d shifts from %s", count, Config.SCHEDULE_CSV_PATH)
+    store.build()
+    service_areas.sync(store.client_locations)
+    return store
+
+# Replace (rather than mutate) to reload: schedule_store = load_schedules()
+schedule_store = load_schedules()
+
+def clock_facts(request: BaseModel) -> ClockFacts:
+    """Rule inputs for a ClockInRequest or ClockOutRequest"""
+    return ClockFacts(
+        request.caregiver_name, request.phone_number, request.location, request.actual_time,
+        client_name=request.client_name,
+        scheduled_time=request.scheduled_time,
+        has_schedule=getattr(request, "has_schedule", True),
+        schedule_store=schedule_store,
+        service_areas=service_areas,
+        registered_phones=registered_phones
+    )
+
+# Config.CHAT_BACKEND values whose replies come from the LLM
+LLM_CHAT_BACKENDS = ("gemini", "workflows", "langgraph")
+# Backends that keep multi-turn state under the request's conversation_id
+CONVERSATION_CHAT_BACKENDS = ("workflows", "langgraph")
+
+def llm_chat_backend():
+    """The LLM-backed chat backend named by Config.CHAT_BACKEND, or None for the scripted one"""
+    # Imported lazily so the scripted backend never builds a Gemini client
+    if Config.CHAT_BACKEND == "gemini":
+        from ai_workflows import ai_assistant
+        return ai_assistant
+    if Config.CHAT_BACKEND == "workflows":
+        from workflows import caregiver_workflows
+        return caregiver_workflows
+    if Config.CHAT_BACKEND == "langgraph":
+        from langgraph_workflows import langgraph_assistant
+        return langgraph_assistant
+    return None
+
+def uses_llm() -> bool:
+    return Config.CHAT_BACKEND in LLM_CHAT_BACKENDS
+
+def get_chat_backend():
+    """Return the AI backend selected by Config.CHAT_BACKEND.
+    
+    While the LLM gateway's circuit is open, chats go straight to the
+    scripted templates instead of waiting on a failing provider.
+    """
+    if uses_llm() and not llm_gateway.degraded():
+        return llm_chat_backend()
+    return simple_ai
+
+def conversation_kwargs(backend, request: ChatRequest) -> Dict[str, Any]:
+    """The conversation_id argument, for backends that take one"""
+    if backend is not simple_ai and Config.CHAT_BACKEND in CONVERSATION_CHAT_BACKENDS:
+        return {'conversation_id': request.conversation_id}
+    return {}
+
+async def backend_frames(backend, user_info: Dict[str, str], message: str,
+                         **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+    """The backend's stream frames; backends that cannot stream send their whole reply as one token frame"""
+    if hasattr(backend, 'stream_message'):
+        async for frame in backend.stream_message(user_info, message):
+            yield frame
+        return
+    result = await backend.process_message(user_info=user_info, message=message, **kwargs)
+    yield {
+        'type': 'meta',
+        'scenario_detected': result['scenario_detected'],
+        'suggestions': result['suggestions'],
+        'conversation_id': result.get('conversation_id')
+    }
+    yield {'type': 'token', 'content': result['response']}
+
+def new_conversation_id(user_name: str) -> str:
+    # Same form as the IDs the workflow backends generate
+    return f"{user_name or 'unknown'}_{uuid.uuid4().hex[:12]}"
+
+async def hedged_frames(backend, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+    """backend_frames raced against Config.CHAT_HEDGE_SECONDS.
+    
+    If the backend has sent no text when the budget runs out, the scripted
+    reply's frames are sent instead. The backend keeps going, and its reply
+    opens the caregiver's next turn as a "follow_up" frame. A turn arriving
+    while the previous reply is still running waits for it within its own
+    budget, then answers from the script, so a conversation never has two
+    LLM replies in progress at once.
+    """
+    deadline = time.monotonic() + Config.CHAT_HEDGE_SECONDS
+    kwargs = conversation_kwargs(backend, request)
+    if 'conversation_id' in kwargs and not kwargs['conversation_id']:
+        # Chosen here so a scripted first reply can hand it out too
+        kwargs['conversation_id'] = new_conversation_id(request.user_name)
+    key = kwargs.get('conversation_id') or (request.user_name, request.contact_number)
+    
+    ready, follow_up = await follow_ups.collect(key, deadline - time.monotonic())
+    if follow_up:
+        yield {'type': 'follow_up', 'content': follow_up}
+    sent_meta = False
+    if ready:
+        hedge = HedgedReply(backend_frames(backend, chat_user_info(request), request.message, **kwargs))
+        try:
+            async for frame in hedge.frames(deadline - time.monotonic()):
+                sent_meta = sent_meta or frame['type'] == 'meta'
+                yield frame
+            return
+        except FirstTokenTimeout:
+            follow_ups.put(key, hedge)
+    
+    scripted = degraded_chat_response(request)
+    if not sent_meta:
+        yield {
+            'type': 'meta',
+            'scenario_detected': scripted.scenario_detected,
+            'suggestions': scripted.suggestions,
+            'conversation_id': kwargs.get('conversation_id')
+        }
+    yield {'type': 'token', 'content': scripted.response}
+
+async def collect_frames(frames: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+    """A whole reply from stream frames"""
+    result = {'response': "", 'scenario_detected': None, 'suggestions': [], 'follow_up': None}
+    async for frame in frames:
+        if frame['type'] == 'meta':
+            result.update(scenario_detected=frame['scenario_detected'], suggestions=frame['suggestions'],
+                          conversation_id=frame.get('conversation_id'))
+        elif frame['type'] == 'token':
+            result['response'] += frame['content']
+        elif frame['type'] == 'follow_up':
+            result['follow_up'] = frame['content']
+    return result
+
+def chat_user_info(request: ChatRequest) -> Dict[str, str]:
+    return {
+        'user_name': request.user_name,
+        'contact_number': request.contact_number,
+        'reason_for_contact': request.reason_for_contact
+    }
+
+def fallback_chat_response(request: ChatRequest) -> ChatResponse:
+    """Scripted reply used when the AI backend fails"""
+    # Determine scenario without AI
+    scenario = scenario_classifier.classify(request.message, request.reason_for_contact)
+    
+    return ChatResponse(
+        response=f"Hello {request.user_name}! This is Rosella from Independence Care. I understand you're contacting us about: {request.reason_for_contact}. How can I help you with this specific issue?",
+        scenario_detected=scenario,
+        suggestions=["Tell me more details", "What should I do next?", "Is this urgent?"]
+    )
+
+def degraded_chat_response(request: ChatRequest) -> ChatResponse:
+    """The scripted template reply, used when the LLM is unavailable"""
+    scenario = simple_ai.analyze_scenario(request.message, request.reason_for_contact)
+    return ChatResponse(**simple_ai.scripted_reply(scenario, simple_ai.is_first_message(request.message)))
+
+# Pre-serialised bodies for scripted replies (keyed on their normalised inputs)
+script_cache = ResponseCache()
+
+def cached_json_response(key: Hashable, build: Callable[[], BaseModel]) -> Response:
+    """Serve a scripted reply from cached JSON bytes, validating and serialising it only once"""
+    body = script_cache.get_or_build(key, lambda: build().model_dump_json().encode())
+    return Response(content=body, media_type="application/json")
+
+def scripted_response(name: str) -> Response:
+    """Serve one of the fixed SCRIPTED_RESPONSES"""
+    return cached_json_response(name, lambda: SCRIPTED_RESPONSES[name])
+
+def warm_script_cache() -> None:
+    """Serialise every scripted reply up front, e.g. before forking worker processes"""
+    for name in SCRIPTED_RESPONSES:
+        scripted_response(name)
+    for scenario in simple_ai.scenario_responses:
+        for first_message in (True, False):
+            cached_json_response(("chat", scenario, first_message),
+                                 lambda: ChatResponse(**simple_ai.scripted_reply(scenario, first_message)))
+
+def outcome_json(outcome: str, phone_number: str) -> bytes:
+    """JSON body for a clock rule outcome"""
+    if outcome == PHONE_NOT_FOUND:
+        return phone_not_found_json(phone_number)
+    return script_cache.get_or_build(outcome, lambda: SCRIPTED_RESPONSES[outcome].model_dump_json().encode())
+
+# Stands in for the phone number in the pre-serialised phone_not_found body
+PHONE_MARKER = "\x00phone_number\x00"
+PHONE_MARKER_JSON = json.dumps(PHONE_MARKER)[1:-1].encode()
+
+def phone_not_found_json(phone_number: str) -> bytes:
+    """phone_not_found_response as JSON; only the number is serialised per request"""
+    template = script_cache.get_or_build(
+        PHONE_NOT_FOUND, lambda: phone_not_found_response(PHONE_MARKER).model_dump_json().encode()
+    )
+    return template.replace(PHONE_MARKER_JSON, json.dumps(phone_number)[1:-1].encode())
+
+def phone_not_found_response(phone_number: str) -> ScenarioResponse:
+    return ScenarioResponse(
+        scenario_type=ScenarioType.PHONE_NOT_FOUND,
+        agent_script=f"""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
+
+I have noticed that you have clocked in using a phone number that is not registered with us. Can you confirm whose number this is? ({phone_number})
+
+[Wait for confirmation]
+
+Okay, can your client confirm that?
+
+[Get client on phone for verification]""",
+        actions_required=["Verify phone number", "Update client profile", "Confirm with client"],
+        priority="medium"
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Caregiver AI Agent Backend is running", "status": "online"}
@@ -84,204 +443,300 @@ async def handle_chat(request: ChatRequest):
     """Handle general chat messages from the frontend using Gemini AI"""
     
     try:
-        print(f"📥 Received chat request from {request.user_name}")
+        logger.debug("Received chat request from %s", request.user_name)
+        
+        backend = get_chat_backend()
+        if backend is simple_ai:
+            if uses_llm():
+                chat_fallbacks.inc("/chat", "degraded")
+            # Scripted replies depend only on (scenario, first message)
+            scenario = simple_ai.analyze_scenario(request.message, request.reason_for_contact)
+            first_message = simple_ai.is_first_message(request.message)
+            chat_scenarios.inc(scenario)
+            return cached_json_response(
+                ("chat", scenario, first_message),
+                lambda: ChatResponse(**simple_ai.scripted_reply(scenario, first_message))
+            )
         
         # Use AI workflows to process the message
-        result = await simple_ai.process_message(
-            user_info={
-                'user_name': request.user_name,
-                'contact_number': request.contact_number,
-                'reason_for_contact': request.reason_for_contact
-            },
-            message=request.message
-        )
+        if Config.CHAT_HEDGE_SECONDS > 0:
+            result = await collect_frames(hedged_frames(backend, request))
+        else:
+            result = await backend.process_message(
+                user_info=chat_user_info(request),
+                message=request.message,
+                **conversation_kwargs(backend, request)
+            )
         
-        print(f"📤 Sending AI response: {result['response'][:100]}...")
+        logger.debug("Sending AI response: %.100s...", result['response'])
+        chat_scenarios.inc(str(result['scenario_detected']))
         
         return ChatResponse(
             response=result['response'],
             scenario_detected=result['scenario_detected'],
-            suggestions=result['suggestions']
+            suggestions=result['suggestions'],
+            conversation_id=result.get('conversation_id'),
+            follow_up=result.get('follow_up')
         )
         
     except Exception as e:
         # Fallback to simple response if AI fails
-        print(f"❌ AI Error: {e}")
-        print("🔄 Using fallback response")
-        
-        # Determine scenario without AI
-        scenario = "General Inquiry"
-        if "schedule" in request.message.lower() or "schedule" in request.reason_for_contact.lower():
-            scenario = "Schedule Issue"
-        elif "location" in request.message.lower() or "gps" in request.message.lower():
-            scenario = "Location Issue"
-        elif "phone" in request.message.lower():
-            scenario = "Phone Issue"
-        elif "late" in request.message.lower() or "time" in request.message.lower():
-            scenario = "Timing Issue"
-        
-        return ChatResponse(
-            response=f"Hello {request.user_name}! This is Rosella from Independence Care. I understand you're contacting us about: {request.reason_for_contact}. How can I help you with this specific issue?",
-            scenario_detected=scenario,
-            suggestions=["Tell me more details", "What should I do next?", "Is this urgent?"]
-        )
-
-@app.post("/clock-in", response_model=ScenarioResponse)
-async def handle_clock_in(request: ClockInRequest):
-    """Handle clock-in events and return appropriate agent script"""
+        logger.warning("AI error, using fallback response: %r", e)
+        if isinstance(e, LLMUnavailable):
+            chat_fallbacks.inc("/chat", "degraded")
+            fallback = degraded_chat_response(request)
+        else:
+            chat_fallbacks.inc("/chat", "error")
+            fallback = fallback_chat_response(request)
+        chat_scenarios.inc(str(fallback.scenario_detected))
+        return fallback
+
+def sse_frame(frame: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(frame)}\n\n"
+
+@app.post("/chat/stream")
+async def handle_chat_stream(request: ChatRequest):
+    """Stream the chat reply as Server-Sent Events.
     
-    # Scenario 1: No schedule on calendar
-    if not request.has_schedule or request.client_name is None:
-        return ScenarioResponse(
-            scenario_type=ScenarioType.NO_SCHEDULE,
-            agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today?
-            
-I see you clocked in but there seems to be no schedule on your Calendar, can you confirm the client you are working with today?
-
-[Wait for response]
-
-No, please do not leave. Unfortunately, the app can malfunction at times and remove Caregivers from schedules. I will add you to the schedule and clock you in, if for any reason this causes an error your coordinator will reach out to you to clarify.""",
-            actions_required=["Add caregiver to schedule", "Clock in caregiver", "Notify coordinator"],
-            priority="high"
-        )
+    The first frame carries the detected scenario and suggestions, then
+    "token" frames follow as the backend produces text, and a final "done"
+    frame closes the stream. With hedging on, a "follow_up" frame may come
+    first: the LLM's late answer to the previous message.
+    """
     
-    # Check if phone number is registered
-    if request.phone_number not in registered_phones:
-        return ScenarioResponse(
-            scenario_type=ScenarioType.PHONE_NOT_FOUND,
-            agent_script=f"""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
-
-I have noticed that you have clocked in using a phone number that is not registered with us. Can you confirm whose number this is? ({request.phone_number})
-
-[Wait for confirmation]
-
-Okay, can your client confirm that?
-
-[Get client on phone for verification]""",
-            actions_required=["Verify phone number", "Update client profile", "Confirm with client"],
-            priority="medium"
-        )
+    async def frames() -> AsyncIterator[str]:
+        sent_meta = False
+        sent_text = False
+        try:
+            backend = get_chat_backend()
+            if backend is simple_ai and uses_llm():
+                chat_fallbacks.inc("/chat/stream", "degraded")
+            if Config.CHAT_HEDGE_SECONDS > 0 and backend is not simple_ai:
+                source = hedged_frames(backend, request)
+            else:
+                source = backend_frames(backend, chat_user_info(request), request.message,
+                                        **conversation_kwargs(backend, request))
+            async for frame in source:
+                if frame['type'] == 'meta':
+                    sent_meta = True
+                    chat_scenarios.inc(str(frame['scenario_detected']))
+                elif frame['type'] == 'token':
+                    sent_text = True
+                yield sse_frame(frame)
+        except Exception as e:
+            if sent_text:
+                # Part of the reply is already on screen - don't append a second one
+                logger.warning("AI error after partial reply, stream interrupted: %r", e)
+                yield sse_frame({'type': 'error', 'message': 'Response interrupted'})
+            else:
+                logger.warning("AI error, using fallback response: %r", e)
+                if isinstance(e, LLMUnavailable):
+                    chat_fallbacks.inc("/chat/stream", "degraded")
+                    fallback = degraded_chat_response(request)
+                else:
+                    chat_fallbacks.inc("/chat/stream", "error")
+                    fallback = fallback_chat_response(request)
+                if not sent_meta:
+                    chat_scenarios.inc(str(fallback.scenario_detected))
+                    yield sse_frame({
+                        'type': 'meta',
+                        'scenario_detected': fallback.scenario_detected,
+                        'suggestions': fallback.suggestions
+                    })
+                yield sse_frame({'type': 'token', 'content': fallback.response})
+        yield sse_frame({'type': 'done'})
     
-    # Check location (GPS out of range)
-    expected_location = caregiver_schedules.get(request.caregiver_name, {}).get("location")
-    if expected_location:
-        distance = calculate_distance(request.location, expected_location)
-        if distance > 0.5:  # More than 0.5 miles away
-            return ScenarioResponse(
-                scenario_type=ScenarioType.GPS_OUT_OF_RANGE,
-                agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
-
-I have noticed you have clocked in outside of the client's service area, which is not close to your client's house. Can you please clock in again once you are at your client's house, because we are not able to accept this clock in.
-
-[Listen for explanation]
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-Remember it is state law that a Home Care agency cannot bill for visits that are rendered outside of the client's home.""",
-                actions_required=["Request re-clock in", "Verify location", "Document exception if valid"],
-                priority="high"
-            )
+@app.post("/clock-in", response_model=ScenarioResponse)
+async def handle_clock_in(request: ClockInRequest):
+    """Handle clock-in events and return appropriate agent script"""
     
-    # Check timing (out of window)
-    scheduled_dt = datetime.datetime.fromisoformat(request.scheduled_time.replace('Z', '+00:00'))
-    actual_dt = datetime.datetime.fromisoformat(request.actual_time.replace('Z', '+00:00'))
-    time_diff = abs((actual_dt - scheduled_dt).total_seconds() / 60)  # minutes
+    # Retried events are answered before any rule runs
+    if clock_dedup.seen(request.caregiver_name, request.phone_number, "clock_in", request.actual_time):
+        return scripted_response("duplicate_call")
     
-    if time_diff > 15:  # More than 15 minutes late/early
-        return ScenarioResponse(
-            scenario_type=ScenarioType.OUT_OF_WINDOW,
-            agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
-
-I have noticed that you clocked in late for your shift today, I just wanted to confirm what was the reason for that?
-
-[Listen for reason]
-
-Would you be willing to make up for the hours you missed today by staying late on your shift today? Or any other day throughout the week?""",
-            actions_required=["Confirm reason", "Adjust schedule if needed", "Document time change"],
-            priority="medium"
-        )
-    
-    # Default successful clock-in
-    return ScenarioResponse(
-        scenario_type=ScenarioType.NO_SCHEDULE,  # Will add more specific success type
-        agent_script="Clock-in successful. Have a great shift!",
-        actions_required=["Log successful clock-in"],
-        priority="low"
-    )
+    # No schedule -> phone registration -> GPS -> time window (see Config.CLOCK_RULES)
+    outcome = evaluate_clock_event("clock_in", clock_facts(request))
+    # Only once evaluated: an event that failed can be sent again
+    clock_dedup.record(request.caregiver_name, request.phone_number, "clock_in", request.actual_time)
+    if outcome == PHONE_NOT_FOUND:
+        return Response(content=phone_not_found_json(request.phone_number), media_type="application/json")
+    return scripted_response(outcome)
 
 @app.post("/clock-out", response_model=ScenarioResponse)
 async def handle_clock_out(request: ClockOutRequest):
     """Handle clock-out events and return appropriate agent script"""
     
-    # Check location for clock-out
-    expected_location = caregiver_schedules.get(request.caregiver_name, {}).get("location")
-    if expected_location:
-        distance = calculate_distance(request.location, expected_location)
-        if distance > 0.5:  # More than 0.5 miles away
-            return ScenarioResponse(
-                scenario_type=ScenarioType.GPS_OUT_OF_RANGE,
-                agent_script="""Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
-
-I have noticed your clock out is outside of the client's service area, and we are not able to accept that. Can you please go back and clock out from your client's house? Because we can't complete the visit without your clock out.
-
-I apologize for the inconvenience this causes but we will not be able to mark your shift as completed without a clock out, so it is really important.""",
-                actions_required=["Request return to client location", "Re-clock out", "Document issue"],
-                priority="high"
-            )
+    if clock_dedup.seen(request.caregiver_name, request.phone_number, "clock_out", request.actual_time):
+        return scripted_response("duplicate_call")
     
-    return ScenarioResponse(
-        scenario_type=ScenarioType.NO_SCHEDULE,  # Success type
-        agent_script="Clock-out successful. Thank you for your service today!",
-        actions_required=["Log successful clock-out"],
-        priority="low"
+    # Location is checked against the shift's client, if there is one on file
+    outcome = evaluate_clock_event("clock_out", clock_facts(request))
+    clock_dedup.record(request.caregiver_name, request.phone_number, "clock_out", request.actual_time)
+    return scripted_response(outcome)
+
+clock_event_batch = TypeAdapter(List[ClockEvent])
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def parse_clock_events(body: bytes, content_type: str) -> List[ClockEvent]:
+    """Validate a JSON array or newline-delimited JSON batch of clock events"""
+    if content_type.split(";")[0].strip() in NDJSON_TYPES:
+        lines = [line for line in body.splitlines() if line.strip()]
+        body = b"[" + b",".join(lines) + b"]"
+    return clock_event_batch.validate_json(body)
+
+# Pre-serialised result for events whose location or timestamps cannot be evaluated
+INVALID_EVENT_JSON = ClockEventResult(status="invalid", error="Invalid location or timestamps").model_dump_json().encode()
+
+@app.post("/clock-events/batch", response_model=List[ClockEventResult])
+async def handle_clock_event_batch(request: Request):
+    """Evaluate a burst of clock-in/out events with the same rules as /clock-in and /clock-out.
+    
+    Accepts a JSON array, or NDJSON when sent as application/x-ndjson, and
+    returns one ClockEventResult per event, in order. An event that cannot
+    be evaluated gets status "invalid" and an error; the others are still
+    evaluated, and it can be sent again once corrected.
+    """
+    try:
+        events = parse_clock_events(await request.body(), request.headers.get("content-type", ""))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    if len(events) > Config.CLOCK_BATCH_MAX_EVENTS:
+        raise HTTPException(status_code=413, detail=f"At most {Config.CLOCK_BATCH_MAX_EVENTS} events per batch")
+    
+    # Duplicates (including repeats within the batch) skip the rule chain
+    outcomes = ["duplicate_call"] * len(events)
+    in_batch = DedupIndex(clock_dedup.window_seconds, clock_dedup.bucket_seconds, max_entries=len(events))
+    fresh = []
+    for i, e in enumerate(events):
+        key = (e.caregiver_name, e.phone_number, e.event_type, e.actual_time)
+        if not clock_dedup.seen(*key) and not in_batch.seen(*key):
+            in_batch.record(*key)
+            fresh.append(i)
+    fresh_events = [events[i] for i in fresh]
+    fresh_outcomes = evaluate_clock_events(
+        event_types=[e.event_type for e in fresh_events],
+        caregivers=[e.caregiver_name for e in fresh_events],
+        clients=[e.client_name for e in fresh_events],
+        phones=[e.phone_number for e in fresh_events],
+        locations=[e.location for e in fresh_events],
+        scheduled_times=[e.scheduled_time for e in fresh_events],
+        actual_times=[e.actual_time for e in fresh_events],
+        has_schedule=[e.has_schedule for e in fresh_events],
+        registered_phones=registered_phones,
+        schedule_store=schedule_store,
+        service_areas=service_areas
     )
+    for i, outcome in zip(fresh, fresh_outcomes):
+        outcomes[i] = outcome
+    for i in fresh:
+        if outcomes[i] != INVALID_EVENT:
+            clock_dedup.record(events[i].caregiver_name, events[i].phone_number, events[i].event_type,
+                               events[i].actual_time)
+    
+    # Splice the JSON of each outcome into one array; most events share a few bodies
+    bodies: Dict[tuple, bytes] = {}
+    parts = []
+    for event, outcome in zip(events, outcomes):
+        key = (outcome, event.phone_number if outcome == PHONE_NOT_FOUND else None)
+        body = bodies.get(key)
+        if body is None:
+            if outcome == INVALID_EVENT:
+                body = INVALID_EVENT_JSON
+            else:
+                body = b'{"status":"ok","result":' + outcome_json(outcome, event.phone_number) + b',"error":null}'
+            bodies[key] = body
+        parts.append(body)
+    return Response(content=b"[" + b",".join(parts) + b"]", media_type="application/json")
+
+def chat_session_stats() -> Dict[str, int]:
+    """Session store counters of the configured chat backend (the scripted one keeps none)"""
+    backend = llm_chat_backend() if uses_llm() else None
+    # Only CaregiverWorkflows keeps conversation history
+    store = getattr(backend, 'conversation_memory', None)
+    return store.stats() if store is not None else {}
+
+def langgraph_checkpoint_stats() -> Dict[str, int]:
+    """Checkpoint store counters, when the LangGraph backend is the one configured"""
+    if Config.CHAT_BACKEND != "langgraph":
+        return {}
+    from checkpoint_store import checkpoint_store
+    return checkpoint_store.stats()
+
+def clock_rule_samples():
+    for event_type, rules in clock_rule_stats().items():
+        for rule, stats in rules.items():
+            labels = {"event_type": event_type, "rule": rule}
+            for key in ('evaluated', 'matched', 'decided', 'errors', 'seconds'):
+                if key in stats:
+                    yield (f"{metrics.prefix}_clock_rule_{key}_total", "counter", f"Clock rule {key}",
+                           labels, stats[key])
+
+# Component stats, read when /metrics is scraped
+metrics.register_stats("cache", script_cache.stats, gauges=("entries",), cache="script")
+metrics.register_stats("cache", semantic_cache.stats, gauges=("entries",), cache="semantic")
+metrics.register_stats("context_builder", context_builder.stats, gauges=("conversations",))
+metrics.register_stats("session_store", chat_session_stats, gauges=("conversations", "bytes"))
+metrics.register_stats("langgraph_checkpoints", langgraph_checkpoint_stats, gauges=("threads",))
+metrics.register_stats("clock_dedup", clock_dedup.stats, gauges=("entries",))
+metrics.register_stats("logging", logging_stats, gauges=("queued",))
+metrics.register_stats("llm_single_flight", llm_flights.stats, gauges=("in_flight", "coalesce_rate"))
+metrics.register_stats("chat_follow_ups", follow_ups.stats, gauges=("pending",))
+metrics.register_stats("schedule_store", lambda: schedule_store.stats(),
+                       gauges=("shifts", "caregivers", "clients", "phones"))
+metrics.register_collector(clock_rule_samples)
+metrics.register_collector(llm_gateway.samples)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of request, LLM, cache and rule metrics"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/clock-rules/stats")
+async def get_clock_rule_stats():
+    """Per-rule evaluation, match and decision counts and mean latency, in evaluation order"""
+    return clock_rule_stats()
 
 @app.post("/duplicate-call")
 async def handle_duplicate_call():
     """Handle duplicate clock-in/out events - no call needed"""
     return {"message": "Duplicate call detected - no action required", "action": "reject"}
 
+SCENARIO_GUIDANCE = {
+    "Schedule Issue": {
+        "response": "It sounds like there might be a scheduling conflict. Let me help you resolve this.",
+        "suggestions": ["Check your current schedule", "Contact your coordinator", "Report the issue"]
+    },
+    "Timing Issue": {
+        "response": "I can help you with timing adjustments and make-up hours if needed.",
+        "suggestions": ["Explain the reason for timing issue", "Request schedule adjustment", "Speak with client"]
+    },
+    "Location Issue": {
+        "response": "Location verification is important for compliance. Let me guide you through the proper procedure.",
+        "suggestions": ["Verify you're at client location", "Try clocking in again", "Contact support"]
+    },
+    "Phone Issue": {
+        "response": "Phone number verification is required. Let me help you get this sorted out.",
+        "suggestions": ["Use client's house phone", "Verify phone number", "Update contact info"]
+    }
+}
+
 def analyze_message_for_scenario(message: str, reason: str) -> Optional[Dict]:
     """Analyze user message to detect caregiver scenarios"""
-    combined_text = f"{message} {reason}".lower()
-    
-    # Clock-in/out issues
-    if any(word in combined_text for word in ["clock", "schedule", "late", "early", "time"]):
-        if "schedule" in combined_text or "calendar" in combined_text:
-            return {
-                "type": "Schedule Issue",
-                "response": "It sounds like there might be a scheduling conflict. Let me help you resolve this.",
-                "suggestions": ["Check your current schedule", "Contact your coordinator", "Report the issue"]
-            }
-        if "late" in combined_text or "early" in combined_text:
-            return {
-                "type": "Timing Issue", 
-                "response": "I can help you with timing adjustments and make-up hours if needed.",
-                "suggestions": ["Explain the reason for timing issue", "Request schedule adjustment", "Speak with client"]
-            }
-    
-    # Location/GPS issues
-    if any(word in combined_text for word in ["location", "gps", "address", "house", "outside"]):
-        return {
-            "type": "Location Issue",
-            "response": "Location verification is important for compliance. Let me guide you through the proper procedure.",
-            "suggestions": ["Verify you're at client location", "Try clocking in again", "Contact support"]
-        }
-    
-    # Phone issues
-    if any(word in combined_text for word in ["phone", "number", "call", "ivr"]):
-        return {
-            "type": "Phone Issue",
-            "response": "Phone number verification is required. Let me help you get this sorted out.",
-            "suggestions": ["Use client's house phone", "Verify phone number", "Update contact info"]
-        }
-    
-    return None
+    scenario = scenario_classifier.classify(message, reason)
+    guidance = SCENARIO_GUIDANCE.get(scenario)
+    if guidance is None:
+        return None
+    return {"type": scenario, **guidance}
 
 def calculate_distance(loc1: Dict[str, float], loc2: Dict[str, float]) -> float:
-    """Calculate distance between two GPS coordinates (simplified)"""
-    # Simple distance calculation (in real app, use proper geolocation library)
-    lat_diff = abs(loc1["lat"] - loc2["lat"])
-    lng_diff = abs(loc1["lng"] - loc2["lng"])
-    return (lat_diff + lng_diff) * 69  # Rough miles conversion
+    """Calculate distance between two GPS coordinates in miles (haversine)"""
+    return haversine_miles(loc1["lat"], loc1["lng"], loc2["lat"], loc2["lng"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,242 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; tuned for in-process handlers (sub-millisecond) up to slow LLM turns
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name, type, help, labels, value) as produced by collectors at scrape time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram:
+    """Bucketed observations per label combination.
+
+    Buckets are stored non-cumulatively so ``observe`` is one bisect and
+    three additions; they are summed into Prometheus' cumulative ``le``
+    buckets only when rendered.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (+Inf last)..., sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            series_list = [(label_values, list(series)) for label_values, series in self._series.items()]
+        for label_values, series in series_list:
+            labels = dict(zip(self.labels, label_values))
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                running += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, running
+            yield f"{self.name}_sum", labels, series[-1]
+            yield f"{self.name}_count", labels, running
+
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format.
+
+    Counters and histograms are updated inline on the request path. Stats
+    that components already keep (cache hits, store sizes, rule counters)
+    are not duplicated: collectors read them only when ``/metrics`` is
+    scraped.
+    """
+
+    def __init__(self, prefix: str = "caregiver"):
+        self.prefix = prefix
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", help, labels, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Add a callable yielding (name, type, help, labels, value) samples at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def register_stats(self, name: str, stats: Callable[[], Dict[str, Any]],
+                       gauges: Sequence[str] = (), **labels: str) -> None:
+        """Expose a component's ``stats()`` dict.
+
+        Each numeric key becomes ``<prefix>_<name>_<key>_total``, or a gauge
+        ``<prefix>_<name>_<key>`` for keys listed in ``gauges`` (sizes rather
+        than running counts). When the stats include hits and misses, a
+        ``<prefix>_<name>_hit_ratio`` gauge is added.
+        """
+        base = f"{self.prefix}_{name}"
+        gauges = frozenset(gauges)
+
+        def collect() -> Iterator[Sample]:
+            values = stats()
+            for key, value in values.items():
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                if key in gauges:
+                    yield f"{base}_{key}", "gauge", f"{name} {key}", labels, value
+                else:
+                    yield f"{base}_{key}_total", "counter", f"{name} {key}", labels, value
+            if 'hits' in values and 'misses' in values:
+                lookups = values['hits'] + values['misses']
+                yield (f"{base}_hit_ratio", "gauge", f"{name} hits / (hits + misses)", labels,
+                       values['hits'] / lookups if lookups else 0.0)
+
+        self.register_collector(collect)
+
+    def render(self) -> str:
+        """The current value of every metric in Prometheus text format"""
+        families: Dict[str, Tuple[str, str, List[str]]] = {}
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            kind = "histogram" if isinstance(metric, Histogram) else "counter"
+            lines = families.setdefault(metric.name, (kind, metric.help, []))[2]
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for collector in collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                logger.exception("Metrics collector failed")
+                continue
+            for name, kind, help, labels, value in samples:
+                lines = families.setdefault(name, (kind, help, []))[2]
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        output = []
+        for name, (kind, help, lines) in families.items():
+            output.append(f"# HELP {name} {help}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template and status.
+
+    The route is read from the scope after the router has matched it, so
+    "/chat" and "/clock-in" are separate series while unmatched paths share
+    one ("unmatched") and cannot blow up label cardinality. Streaming
+    responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.histogram.observe(time.perf_counter() - start, scope["method"], path, str(status))
+
+
+# Global instance
+metrics = MetricsRegistry()
@@ -0,0 +1,12 @@
+import re
+
+SPACES = re.compile(r"\s+")
+# Stands in for the caregiver's name in coalescing keys, shared replies and cached replies
+NAME_PLACEHOLDER = "\x00user_name\x00"
+
+
+def mask_name(text: str, user_name: str) -> str:
+    """Text with the caregiver's name, as a whole word, replaced by NAME_PLACEHOLDER"""
+    if not user_name:
+        return text
+    return re.sub(rf"\b{re.escape(user_name)}\b", NAME_PLACEHOLDER, text)
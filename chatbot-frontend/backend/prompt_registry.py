@@ -0,0 +1,75 @@
+import string
+import textwrap
+from typing import Any, Dict, List, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from conversation_context import count_tokens
+from metrics import metrics
+
+# Leads every system message, so all prompts share it as a common prefix
+PERSONA = "You are Rosella from Independence Care, supporting home care caregivers."
+
+prompt_tokens = metrics.counter("prompt_tokens_total",
+                                "Estimated prompt tokens by template, static system prefix vs variable part",
+                                labels=("template", "part"))
+
+
+class PromptTemplate:
+    """A prompt split into a static system message and a variable human message.
+
+    The system message (the persona followed by the template's instructions
+    and scripts) is built once and the same object is sent on every call,
+    so a provider that caches prompt prefixes can reuse it. The variable
+    part is parsed once; rendering only joins the values into it.
+    """
+
+    def __init__(self, name: str, instructions: str, variables: str):
+        self.name = name
+        self.system_message = SystemMessage(content=f"{PERSONA}\n\n{textwrap.dedent(instructions).strip()}")
+        self.static_tokens = count_tokens(self.system_message.content)
+        self._parts: List[Tuple[str, str]] = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(textwrap.dedent(variables).strip()):
+            if format_spec or conversion:
+                raise ValueError(f"Prompt {name}: only plain {{name}} fields are supported, not {field!r}")
+            self._parts.append((literal, field or ""))
+        self.fields = frozenset(field for _, field in self._parts if field)
+        self._stats = {'renders': 0, 'variable_tokens': 0}
+
+    def render(self, **values: Any) -> List[BaseMessage]:
+        """[system message, human message] for one call"""
+        text = "".join(literal + (str(values[field]) if field else "") for literal, field in self._parts)
+        variable_tokens = count_tokens(text)
+        self._stats['renders'] += 1
+        self._stats['variable_tokens'] += variable_tokens
+        prompt_tokens.inc(self.name, "static", amount=self.static_tokens)
+        prompt_tokens.inc(self.name, "variable", amount=variable_tokens)
+        return [self.system_message, HumanMessage(content=text)]
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, 'static_tokens': self.static_tokens}
+
+
+class PromptRegistry:
+    """Every prompt template by name, each compiled once when registered"""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+
+    def register(self, name: str, instructions: str, variables: str) -> PromptTemplate:
+        if name in self._templates:
+            raise ValueError(f"Prompt {name} is already registered")
+        template = self._templates[name] = PromptTemplate(name, instructions, variables)
+        return template
+
+    def __getitem__(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'templates': len(self._templates),
+            'renders': sum(template.stats()['renders'] for template in self._templates.values()),
+            'static_tokens': sum(template.static_tokens for template in self._templates.values()),
+        }
+
+
+# Global instance
+prompts = PromptRegistry()
@@ -0,0 +1,33 @@
+from typing import Callable, Dict, Hashable
+
+
+class ResponseCache:
+    """Pre-serialised JSON bodies for responses that depend only on their key.
+
+    Scripted replies are fully determined by a small key (scenario, first
+    message, ...), so they are validated and serialised once and the bytes
+    are served directly afterwards.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, bytes] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        body = self._entries.get(key)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        self.misses += 1
+        body = build()
+        if len(self._entries) >= self.max_entries:
+            # Drop the oldest entry; keys are bounded in practice
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = body
+        return body
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
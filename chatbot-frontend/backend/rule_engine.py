@@ -0,0 +1,135 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# A check answers "does this rule match?" for one event (facts, params) -> bool,
+# or for many at once (facts, params) -> (matched, invalid) boolean arrays
+ScalarCheck = Callable[[Any, Dict[str, Any]], bool]
+BatchCheck = Callable[[Any, Dict[str, Any]], Tuple[Any, Any]]
+
+
+class Rule(NamedTuple):
+    name: str
+    outcome: str
+    priority: int  # position in the declared order; lower wins
+    cost: float
+    params: Dict[str, Any]
+    check: ScalarCheck
+    check_batch: Optional[BatchCheck]
+
+
+class RulePipeline:
+    """An ordered set of rules compiled from a declarative spec.
+
+    Rules are declared in priority order (the first that matches decides
+    the outcome) with a relative ``cost``. Evaluation runs them cheapest
+    first and skips any rule that can no longer change the result because
+    a higher-priority rule already matched, so the outcome is exactly that
+    of the declared if-chain. A rule whose check raises only fails the
+    evaluation if no higher-priority rule matched, again as in the chain.
+
+    Each rule records how often it was evaluated, matched and decided the
+    outcome, and the time spent in it, to guide cost tuning.
+    """
+
+    def __init__(self, name: str, spec: Dict[str, Any], checks: Dict[str, Tuple[ScalarCheck, Optional[BatchCheck]]]):
+        self.name = name
+        self.default = spec["default"]
+        rules = []
+        for priority, entry in enumerate(spec["rules"]):
+            entry = dict(entry)
+            check_name = entry.pop("rule")
+            if check_name not in checks:
+                raise ValueError(f"{name}: unknown rule {check_name!r}")
+            check, check_batch = checks[check_name]
+            rules.append(Rule(check_name, entry.pop("outcome"), priority, entry.pop("cost", 1), entry,
+                              check, check_batch))
+        self.rules: List[Rule] = rules
+        self.evaluation_order: List[Rule] = sorted(rules, key=lambda rule: (rule.cost, rule.priority))
+        self._lock = threading.Lock()
+        self._stats = {rule.name: {'evaluated': 0, 'matched': 0, 'decided': 0, 'errors': 0, 'seconds': 0.0}
+                       for rule in rules}
+        self._stats[self.default] = {'decided': 0}
+
+    def evaluate(self, facts: Any) -> str:
+        """Outcome of the first rule (in priority order) matching ``facts``, or the default"""
+        decided = len(self.rules)
+        error: Optional[Tuple[int, Exception]] = None
+        timings = []
+        for rule in self.evaluation_order:
+            if rule.priority >= decided:
+                continue
+            start = time.perf_counter()
+            try:
+                matched = rule.check(facts, rule.params)
+            except (ValueError, KeyError, TypeError) as e:
+                timings.append((rule, time.perf_counter() - start, None))
+                if error is None or rule.priority < error[0]:
+                    error = (rule.priority, e)
+                continue
+            timings.append((rule, time.perf_counter() - start, matched))
+            if matched:
+                decided = rule.priority
+        outcome = self.rules[decided].outcome if decided < len(self.rules) else self.default
+        self._record(timings, decided, error)
+        if error is not None and error[0] < decided:
+            raise error[1]
+        return outcome
+
+    def evaluate_batch(self, facts: Any, rows: Sequence[int], invalid_outcome: str) -> List[str]:
+        """Outcomes for ``rows`` of a vectorised facts object.
+
+        Rules run in priority order over the rows still undecided; rows a
+        rule cannot evaluate get ``invalid_outcome``.
+        """
+        import numpy as np
+        rows = np.asarray(rows, dtype=np.intp)
+        outcomes = np.full(len(rows), self.default, dtype=object)
+        undecided = np.ones(len(rows), dtype=bool)
+        for rule in self.rules:
+            if not undecided.any():
+                break
+            start = time.perf_counter()
+            matched, invalid = rule.check_batch(facts, rule.params)
+            elapsed = time.perf_counter() - start
+            matched, invalid = matched[rows] & undecided, invalid[rows] & undecided
+            outcomes[invalid] = invalid_outcome
+            outcomes[matched & ~invalid] = rule.outcome
+            evaluated = int(undecided.sum())
+            undecided &= ~(matched | invalid)
+            with self._lock:
+                stats = self._stats[rule.name]
+                stats['evaluated'] += evaluated
+                stats['matched'] += int(matched.sum())
+                stats['decided'] += int((matched & ~invalid).sum())
+                stats['errors'] += int(invalid.sum())
+                stats['seconds'] += elapsed
+        with self._lock:
+            self._stats[self.default]['decided'] += int(undecided.sum())
+        return outcomes.tolist()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-rule counters, listed in evaluation order, with mean latency in microseconds"""
+        with self._lock:
+            report = {}
+            for rule in self.evaluation_order:
+                stats = dict(self._stats[rule.name])
+                stats['mean_us'] = stats['seconds'] / stats['evaluated'] * 1e6 if stats['evaluated'] else 0.0
+                report[rule.name] = stats
+            report[self.default] = dict(self._stats[self.default])
+            return report
+
+    def _record(self, timings, decided: int, error) -> None:
+        with self._lock:
+            for rule, elapsed, matched in timings:
+                stats = self._stats[rule.name]
+                stats['evaluated'] += 1
+                stats['seconds'] += elapsed
+                if matched is None:
+                    stats['errors'] += 1
+                elif matched:
+                    stats['matched'] += 1
+            if decided < len(self.rules):
+                self._stats[self.rules[decided].name]['decided'] += 1
+            elif error is None:
+                self._stats[self.default]['decided'] += 1
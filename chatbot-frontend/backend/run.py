@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Simple script to run the FastAPI backend server
+Simple script to run the FastAPI backend server in development (one process,
+auto-reload); serve.py runs it in production with several workers
 """
 import uvicorn
 from main import app
@@ -0,0 +1,66 @@
+import re
+from typing import Dict, List, Tuple
+
+GENERAL_INQUIRY = "General Inquiry"
+
+# Keyword tables in priority order - when a message mentions several
+# scenarios, the one listed first wins.
+SCENARIO_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("Schedule Issue", ["schedule", "calendar", "missing", "not showing", "removed"]),
+    ("Location Issue", ["location", "gps", "outside", "range", "distance", "address"]),
+    ("Phone Issue", ["phone", "number", "call", "ivr", "registered"]),
+    ("Timing Issue", ["late", "early", "time", "clock", "hours", "forgot"]),
+]
+
+# Inflections accepted after a keyword ("clocked", "calls", "scheduled")
+KEYWORD_SUFFIXES = ["", "s", "es", "d", "ed", "ing"]
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class ScenarioClassifier:
+    """Keyword scenario classifier compiled once into a word lookup table.
+
+    Messages are split into whole words with one regex pass and intersected
+    with the keyword vocabulary, so "sometimes" no longer matches "time" and
+    the cost does not grow with the number of keywords.
+    """
+
+    def __init__(self, keyword_table: List[Tuple[str, List[str]]] = SCENARIO_KEYWORDS,
+                 default: str = GENERAL_INQUIRY):
+        self.scenarios = [scenario for scenario, _ in keyword_table]
+        self.default = default
+
+        # word -> priority (index into self.scenarios)
+        self._priorities: Dict[str, int] = {}
+        # last word of a multi-word keyword -> [(priority, phrase regex)]
+        self._phrases: Dict[str, List[Tuple[int, re.Pattern]]] = {}
+
+        for priority, (_, keywords) in enumerate(keyword_table):
+            for keyword in keywords:
+                words = keyword.lower().split()
+                if len(words) == 1:
+                    for suffix in KEYWORD_SUFFIXES:
+                        self._priorities.setdefault(words[0] + suffix, priority)
+                else:
+                    phrase = re.compile(r"\b" + r"\s+".join(map(re.escape, words)) + r"\b")
+                    self._phrases.setdefault(words[-1], []).append((priority, phrase))
+
+        self._vocabulary = frozenset(self._priorities) | frozenset(self._phrases)
+
+    def classify(self, message: str, reason: str = "") -> str:
+        """Return the highest-priority scenario mentioned in the message or reason"""
+        text = f"{reason} {message}".lower() if reason else message.lower()
+        best = len(self.scenarios)
+        for word in self._vocabulary.intersection(_WORD.findall(text)):
+            priority = self._priorities.get(word, best)
+            if priority < best:
+                best = priority
+            for phrase_priority, phrase in self._phrases.get(word, ()):
+                if phrase_priority < best and phrase.search(text):
+                    best = phrase_priority
+        return self.scenarios[best] if best < len(self.scenarios) else self.default
+
+
+# Global instance
+scenario_classifier = ScenarioClassifier()
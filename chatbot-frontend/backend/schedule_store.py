@@ -0,0 +1,299 @@
+import bisect
+import csv
+import datetime
+import functools
+import gc
+import re
+import threading
+from collections import defaultdict
+from typing import Collection, Dict, Hashable, List, NamedTuple, Optional, TextIO, Union
+from zoneinfo import ZoneInfo
+from config import Config
+
+SECONDS_PER_DAY = 24 * 60 * 60
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_TIME = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s*$", re.IGNORECASE)
+_SCHEDULE_TEXT = re.compile(r"^\s*(?P<days>[A-Za-z ,\-]+?)\s+(?P<start>[\d:]+\s*[ap]m|[\d:]+)\s*-\s*"
+                            r"(?P<end>[\d:]+\s*[ap]m|[\d:]+)\s*$", re.IGNORECASE)
+
+
+class Shift(NamedTuple):
+    caregiver: str
+    client: str
+    phone: str
+    start: datetime.datetime  # agency wall-clock time (naive)
+    end: datetime.datetime
+
+
+class _ShiftRule(NamedTuple):
+    caregiver: str
+    client: str
+    phone: str
+    day: Union[datetime.date, int]  # a calendar date, or a weekday (0 = Monday) for weekly shifts
+    start: datetime.time
+    duration: datetime.timedelta
+
+
+class _Entry(NamedTuple):
+    start: float  # seconds from the bucket day's midnight, including the early-match margin
+    end: float
+    rule: _ShiftRule
+    days_back: int  # how many days before the bucket day the shift starts
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    """Parse an ISO timestamp as sent by the app ("Z" suffix allowed)"""
+    return datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_time_of_day(value: str) -> datetime.time:
+    """Parse "9am", "5:30pm", "17:30" or "09:00" """
+    match = _TIME.match(value)
+    if not match:
+        raise ValueError(f"Unrecognised time of day: {value!r}")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").lower()
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    return datetime.time(hour, minute)
+
+
+def parse_days(value: str) -> List[Union[datetime.date, int]]:
+    """Parse an ISO date, a weekday, a weekday range ("Monday-Friday", "Mon-Fri") or a comma list"""
+    value = value.strip()
+    try:
+        return [datetime.date.fromisoformat(value)]
+    except ValueError:
+        pass
+    days: List[Union[datetime.date, int]] = []
+    for part in value.split(","):
+        first, _, last = part.strip().partition("-")
+        start, end = _weekday(first), _weekday(last or first)
+        days.extend((start + offset) % 7 for offset in range((end - start) % 7 + 1))
+    return days
+
+
+def _weekday(name: str) -> int:
+    name = name.strip().lower()
+    for index, weekday in enumerate(WEEKDAYS):
+        if len(name) >= 3 and weekday.startswith(name):
+            return index
+    raise ValueError(f"Unrecognised day: {name!r}")
+
+
+class IntervalIndex:
+    """Intervals of one day, sorted by start with a running maximum of ends.
+
+    Finding the intervals that contain a point is a binary search for the
+    last start at or before it, then a walk back that stops as soon as no
+    earlier interval can reach the point (the running maximum end drops
+    below it), i.e. O(log n + k) for the k intervals walked past.
+    Intervals are appended as they are added and sorted once, by ``build``
+    or the next lookup, so a bulk load costs O(n log n).
+    """
+
+    __slots__ = ("_starts", "_entries", "_max_ends")
+
+    def __init__(self):
+        self._starts: List[float] = []
+        self._entries: List[_Entry] = []
+        self._max_ends: Optional[List[float]] = None
+
+    def add(self, entry: _Entry) -> None:
+        self._entries.append(entry)
+        self._max_ends = None
+
+    def build(self) -> None:
+        if self._max_ends is not None:
+            return
+        # Stable, so intervals with equal starts stay in the order they were added
+        self._entries.sort(key=lambda entry: entry.start)
+        self._starts = [entry.start for entry in self._entries]
+        self._max_ends, running = [], float("-inf")
+        for entry in self._entries:
+            running = max(running, entry.end)
+            self._max_ends.append(running)
+
+    def stab(self, point: float) -> List[_Entry]:
+        self.build()
+        found = []
+        for i in range(bisect.bisect_right(self._starts, point) - 1, -1, -1):
+            if self._max_ends[i] < point:
+                break
+            if self._entries[i].end >= point:
+                found.append(self._entries[i])
+        return found
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ScheduleStore:
+    """Caregiver shifts indexed by caregiver, client and phone.
+
+    Each index maps a key to one IntervalIndex per day: calendar dates for
+    one-off shifts and weekdays for weekly ones ("Monday-Friday 9am-5pm").
+    A shift matches a clock event from ``early_minutes`` before it starts
+    until ``late_minutes`` after it ends; shifts spanning midnight are
+    indexed under every day they touch. Times are agency wall-clock time;
+    timestamps with a UTC offset are converted to ``timezone`` first.
+    """
+
+    def __init__(self,
+                 early_minutes: int = Config.SHIFT_EARLY_MATCH_MINUTES,
+                 late_minutes: int = Config.SHIFT_LATE_MATCH_MINUTES,
+                 timezone: str = Config.SCHEDULE_TIMEZONE):
+        self.early_seconds = early_minutes * 60
+        self.late_seconds = late_minutes * 60
+        self.timezone = ZoneInfo(timezone)
+        self._lock = threading.Lock()
+        self._by_caregiver: Dict[str, Dict[Hashable, IntervalIndex]] = defaultdict(dict)
+        self._by_client: Dict[str, Dict[Hashable, IntervalIndex]] = defaultdict(dict)
+        self._by_phone: Dict[str, Dict[Hashable, IntervalIndex]] = defaultdict(dict)
+        # Service-area centres ({"lat", "lng", optional "radius_miles"}) seen while loading
+        self.client_locations: Dict[str, Dict[str, float]] = {}
+        self._shift_count = 0
+
+    def add_shift(self, caregiver: str, client: str, phone: str,
+                  day: Union[datetime.date, int], start: datetime.time, end: datetime.time) -> None:
+        """Add a shift on a date or a weekday; an end at or before the start runs past midnight"""
+        start_s = start.hour * 3600 + start.minute * 60 + start.second
+        end_s = end.hour * 3600 + end.minute * 60 + end.second
+        if end_s <= start_s:
+            end_s += SECONDS_PER_DAY
+        rule = _ShiftRule(caregiver, client, phone, day, start, datetime.timedelta(seconds=end_s - start_s))
+        match_start, match_end = start_s - self.early_seconds, end_s + self.late_seconds
+        with self._lock:
+            for offset in range(int(match_start // SECONDS_PER_DAY), int(match_end // SECONDS_PER_DAY) + 1):
+                base = offset * SECONDS_PER_DAY
+                entry = _Entry(match_start - base, match_end - base, rule, offset)
+                bucket = self._shift_day(day, offset)
+                for index, key in ((self._by_caregiver, caregiver), (self._by_client, client),
+                                   (self._by_phone, phone)):
+                    days = index[key]
+                    intervals = days.get(bucket)
+                    if intervals is None:
+                        intervals = days[bucket] = IntervalIndex()
+                    intervals.add(entry)
+            self._shift_count += 1
+
+    def add_schedule_text(self, caregiver: str, client: str, phone: str, schedule: str) -> int:
+        """Add weekly shifts described like "Monday-Friday 9am-5pm"; returns the number of shifts"""
+        match = _SCHEDULE_TEXT.match(schedule)
+        if not match:
+            raise ValueError(f"Unrecognised schedule: {schedule!r}")
+        start, end = parse_time_of_day(match.group("start")), parse_time_of_day(match.group("end"))
+        days = parse_days(match.group("days"))
+        for day in days:
+            self.add_shift(caregiver, client, phone, day, start, end)
+        return len(days)
+
+    def load_csv(self, source: Union[str, TextIO]) -> int:
+        """Bulk-load shifts from CSV.
+
+        Columns: caregiver, client, phone, day (ISO date or weekdays such as
+        "Mon-Fri"), start, end, and optionally lat, lng and radius_miles for
+        the client's service area. Returns the number of shifts added.
+
+        The cyclic garbage collector is paused meanwhile: the load only
+        allocates, and would otherwise rescan everything loaded so far
+        over and over (about half the load time).
+        """
+        if isinstance(source, str):
+            with open(source, newline="") as handle:
+                return self.load_csv(handle)
+        added = 0
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for line, row in enumerate(csv.DictReader(source), start=2):
+                try:
+                    start, end = parse_time_of_day(row["start"]), parse_time_of_day(row["end"])
+                    for day in parse_days(row["day"]):
+                        self.add_shift(row["caregiver"], row["client"], row["phone"], day, start, end)
+                        added += 1
+                    if row.get("lat") and row.get("lng"):
+                        location = {"lat": float(row["lat"]), "lng": float(row["lng"])}
+                        if row.get("radius_miles"):
+                            location["radius_miles"] = float(row["radius_miles"])
+                        self.client_locations[row["client"]] = location
+                except (KeyError, ValueError) as e:
+                    raise ValueError(f"Schedule CSV line {line}: {e}") from e
+            self.build()
+        finally:
+            if collecting:
+                gc.enable()
+        return added
+
+    def build(self) -> None:
+        """Sort every index now rather than on its first lookup, e.g. before forking worker processes"""
+        with self._lock:
+            for index in (self._by_caregiver, self._by_client, self._by_phone):
+                for days in index.values():
+                    for intervals in days.values():
+                        intervals.build()
+
+    def has_caregiver(self, caregiver: str) -> bool:
+        return caregiver in self._by_caregiver
+
+    def to_local(self, when: datetime.datetime) -> datetime.datetime:
+        """Agency wall-clock time for a timestamp"""
+        if when.utcoffset() is None:
+            return when
+        return when.astimezone(self.timezone).replace(tzinfo=None)
+
+    def find_shift(self, caregiver: str, when: datetime.datetime, phone: Optional[str] = None,
+                   clients_here: Collection[str] = ()) -> Optional[Shift]:
+        """The caregiver's shift a clock event at ``when`` belongs to.
+
+        A shift booked at ``phone`` wins, then one with a client in
+        ``clients_here`` (those whose service area contains the event's
+        location); otherwise the shift whose start is closest to ``when``.
+        """
+        shifts = self._lookup(self._by_caregiver, caregiver, when)
+        if not shifts:
+            return None
+        when = self.to_local(when)
+        return min(shifts, key=lambda shift: (shift.phone != phone, shift.client not in clients_here,
+                                              abs((when - shift.start).total_seconds())))
+
+    def shifts_for_client(self, client: str, when: datetime.datetime) -> List[Shift]:
+        return self._lookup(self._by_client, client, when)
+
+    def shifts_for_phone(self, phone: str, when: datetime.datetime) -> List[Shift]:
+        """Shifts around ``when`` booked at ``phone`` (a caregiver's own or the client's landline)"""
+        return self._lookup(self._by_phone, phone, when)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'shifts': self._shift_count,
+            'caregivers': len(self._by_caregiver),
+            'clients': len(self._by_client),
+            'phones': len(self._by_phone),
+        }
+
+    def _lookup(self, index: Dict[str, Dict[Hashable, IntervalIndex]], key: str,
+                when: datetime.datetime) -> List[Shift]:
+        days = index.get(key)
+        if not days:
+            return []
+        when = self.to_local(when)
+        date = when.date()
+        seconds = (when - datetime.datetime.combine(date, datetime.time())).total_seconds()
+        shifts = []
+        with self._lock:
+            for bucket in (date, date.weekday()):
+                intervals = days.get(bucket)
+                if intervals is None:
+                    continue
+                for entry in intervals.stab(seconds):
+                    rule = entry.rule
+                    start = datetime.datetime.combine(date - datetime.timedelta(days=entry.days_back), rule.start)
+                    shifts.append(Shift(rule.caregiver, rule.client, rule.phone, start, start + rule.duration))
+        return shifts
+
+    @staticmethod
+    def _shift_day(day: Union[datetime.date, int], offset: int) -> Hashable:
+        if isinstance(day, int):
+            return (day + offset) % 7
+        return day + datetime.timedelta(days=offset)
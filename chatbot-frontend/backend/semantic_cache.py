@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional
+from config import Config
+from name_masking import NAME_PLACEHOLDER, SPACES, mask_name
+
+_APOSTROPHES = re.compile(r"['\u2019]")
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+
+
+def normalize_message(message: str) -> str:
+    text = _NON_WORD.sub(" ", _APOSTROPHES.sub("", message.lower()))
+    return SPACES.sub(" ", text).strip()
+
+
+class SemanticCache:
+    """Opt-in cache of LLM replies looked up by message similarity.
+
+    Messages are embedded locally as hashed character-trigram and word
+    vectors (no network calls) and compared by cosine similarity against
+    earlier messages with the same scenario. A reply is reused when the
+    best match clears ``threshold``. Entries expire after ``ttl_seconds``
+    and the oldest are overwritten once ``max_entries`` is reached.
+
+    Replies are stored with the caregiver's name replaced by a placeholder
+    and personalised again on the way out. NumPy is only imported, and the
+    index only allocated, once the cache is first used while enabled.
+    """
+
+    def __init__(self,
+                 enabled: bool = Config.SEMANTIC_CACHE_ENABLED,
+                 threshold: float = Config.SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds: float = Config.SEMANTIC_CACHE_TTL_SECONDS,
+                 max_entries: int = Config.SEMANTIC_CACHE_MAX_ENTRIES,
+                 dimensions: int = 512,
+                 clock: Callable[[], float] = time.monotonic):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # Fixed-size ring of entries; row i of every array belongs to entry i
+        self._vectors = None
+        self._scenarios = None
+        self._expires = None
+        self._costs = None
+        self._values: list = [None] * max_entries
+        self._next_slot = 0
+        self._size = 0
+        self._scenario_ids: Dict[str, int] = {}
+
+        self._stats = {'lookups': 0, 'hits': 0, 'misses': 0, 'stores': 0, 'llm_calls_avoided': 0}
+
+    def _allocate(self) -> None:
+        import numpy as np
+        with self._lock:
+            if self._vectors is None:
+                self._scenarios = np.full(self.max_entries, -1, dtype=np.int32)
+                self._expires = np.zeros(self.max_entries, dtype=np.float64)
+                self._costs = np.zeros(self.max_entries, dtype=np.int32)
+                self._vectors = np.zeros((self.max_entries, self.dimensions), dtype=np.float32)
+
+    def embed(self, message: str):
+        """Unit-length hashed n-gram vector for a message"""
+        import numpy as np
+        text = normalize_message(message)
+        padded = f" {text} "
+        features = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        features += [f"w:{word}" for word in text.split()]
+        if not features:
+            return np.zeros(self.dimensions, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features),
+                             dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        vector = np.bincount(hashes % self.dimensions, weights=signs,
+                             minlength=self.dimensions).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, scenario: str, message: str, user_name: str = "") -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached value for a similar message, or None"""
+        if not self.enabled:
+            return None
+        import numpy as np
+        if self._vectors is None:
+            self._allocate()
+        vector = self.embed(message)
+        with self._lock:
+            self._stats['lookups'] += 1
+            scenario_id = self._scenario_ids.get(scenario)
+            if scenario_id is not None:
+                size = self._size
+                live = (self._scenarios[:size] == scenario_id) & (self._expires[:size] > self._clock())
+                similarities = np.where(live, self._vectors[:size] @ vector, -1.0)
+                slot = int(np.argmax(similarities))
+                if similarities[slot] >= self.threshold:
+                    self._stats['hits'] += 1
+                    self._stats['llm_calls_avoided'] += int(self._costs[slot])
+                    return self._personalise(self._values[slot], user_name)
+            self._stats['misses'] += 1
+            return None
+
+    def store(self, scenario: str, message: str, value: Dict[str, Any],
+              user_name: str = "", llm_calls: int = 1) -> None:
+        """Remember the value produced for a message (``llm_calls`` is what it cost to generate)"""
+        if not self.enabled:
+            return
+        if self._vectors is None:
+            self._allocate()
+        vector = self.embed(message)
+        value = dict(value)
+        if user_name and isinstance(value.get('response'), str):
+            value['response'] = mask_name(value['response'], user_name)
+        with self._lock:
+            scenario_id = self._scenario_ids.setdefault(scenario, len(self._scenario_ids))
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.max_entries
+            self._size = max(self._size, slot + 1)
+            self._vectors[slot] = vector
+            self._scenarios[slot] = scenario_id
+            self._expires[slot] = self._clock() + self.ttl_seconds
+            self._values[slot] = value
+            self._costs[slot] = llm_calls
+            self._stats['stores'] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            if self._vectors is None:
+                return {**self._stats, 'entries': 0}
+            live = int(((self._scenarios >= 0) & (self._expires > self._clock())).sum())
+            return {**self._stats, 'entries': live}
+
+    @staticmethod
+    def _personalise(value: Dict[str, Any], user_name: str) -> Dict[str, Any]:
+        value = dict(value)
+        if isinstance(value.get('response'), str):
+            value['response'] = value['response'].replace(NAME_PLACEHOLDER, user_name or "there")
+        return value
+
+
+# Global instance
+semantic_cache = SemanticCache()
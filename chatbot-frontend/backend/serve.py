@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Production server: a pre-forking supervisor running several uvicorn workers
+(uvloop event loop, httptools HTTP parser) on one shared listening socket.
+
+With Config.SERVER_PRELOAD the app is imported once, in the supervisor,
+before the workers are forked. Schedules, scripted reply bodies, the
+classifier's keyword tables, compiled prompts and (for the LangGraph
+backend) compiled graphs are then built once and shared copy-on-write.
+gc.freeze() moves them out of the collector's reach, so garbage collection
+in a worker does not write to (and so copy) those pages. LLM clients and
+database connections are still made by each worker on first use.
+
+Each worker keeps its own metrics, caches, follow-ups and LLM concurrency
+cap. Use SESSION_BACKEND=sqlite so a conversation survives reaching
+another worker.
+
+Signals to the supervisor:
+    TERM, INT   workers finish their in-flight requests, then everything exits
+    HUP         zero-downtime reload: the supervisor re-executes itself,
+                keeping the listening socket, loads the new code and starts
+                new workers. The old workers are told to finish only once
+                the new ones accept connections, and keep serving if the
+                new code fails to load.
+
+Workers that die are replaced, no sooner than RESPAWN_DELAY_SECONDS after
+they started, without holding up signal handling meanwhile.
+
+Why not gunicorn with uvicorn workers and --preload: there, HUP restarts
+the workers from the app the master already imported, so deploying new
+code takes the USR2 / WINCH / TERM sequence with a second master. Here HUP
+alone reloads the code, with the socket and old workers handed over, and
+uvicorn is the only server dependency. tests/test_serve.py covers startup,
+respawn, reload and shutdown.
+
+Run from the backend directory:
+    python serve.py
+    python serve.py --workers 4 --port 8000
+    kill -HUP <supervisor pid>    # after deploying new code
+"""
+import argparse
+import asyncio
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Set
+
+import uvicorn
+
+from config import Config
+from structured_logging import setup_logging, get_logger
+
+logger = get_logger(__name__)
+
+# Handed to the re-executed supervisor on reload
+LISTEN_FD_ENV = "CAREGIVER_LISTEN_FD"
+OLD_WORKERS_ENV = "CAREGIVER_OLD_WORKERS"
+
+# How long new workers may take to accept connections before a reload is abandoned
+READY_TIMEOUT_SECONDS = 60.0
+# A worker that dies sooner than this after starting is replaced only this long after it started
+RESPAWN_DELAY_SECONDS = 1.0
+# A stopping worker stops accepting, then waits this long before closing idle connections, so a
+# connection it accepted just before the stop still gets its request read and answered
+DRAIN_SECONDS = 0.5
+
+
+def preload() -> None:
+    """Import the app and build its read-only tables, to be shared by the forked workers"""
+    import main
+    main.warm_script_cache()
+    backend = main.llm_chat_backend()
+    if hasattr(backend, 'precompile'):
+        backend.precompile()
+
+
+def listen_socket(host: str, port: int) -> socket.socket:
+    """The listening socket: inherited from the previous supervisor on reload, else newly bound"""
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+    else:
+        sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the supervisor once it accepts connections"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"%d\n" % os.getpid())
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        # uvicorn closes connections that have not sent a request yet right after it stops
+        # accepting; the other workers keep accepting from the shared socket meanwhile
+        for server in self.servers:
+            server.close()
+        await asyncio.sleep(DRAIN_SECONDS)
+        await super().shutdown(sockets=sockets)
+
+
+def run_worker(sock: socket.socket, ready_fd: int, close_fds: List[int]) -> None:
+    """Body of a forked worker process; never returns"""
+    status = 1
+    try:
+        # uvicorn installs its own TERM and INT handlers; reloads are the supervisor's business
+        signal.set_wakeup_fd(-1)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for fd in close_fds:
+            os.close(fd)
+        # The supervisor's log thread did not survive the fork
+        setup_logging()
+
+        from main import app
+        # log_config=None: uvicorn's own loggers keep the handler setup_logging gave them
+        config = uvicorn.Config(app, loop="uvloop", http="httptools", log_level=Config.LOG_LEVEL.lower(),
+                                log_config=None, access_log=False,
+                                timeout_graceful_shutdown=int(Config.SERVER_GRACEFUL_TIMEOUT_SECONDS))
+        WorkerServer(config, ready_fd).run(sockets=[sock])
+        status = 0
+    except BaseException:
+        logger.exception("Worker %d failed", os.getpid())
+    finally:
+        # Stops the log thread, writing out what it still holds
+        setup_logging(use_queue=False)
+        os._exit(status)
+
+
+class Supervisor:
+    """Forks the workers, replaces any that die and handles the signals above"""
+
+    def __init__(self, sock: socket.socket, workers: int):
+        self.sock = sock
+        self.count = workers
+        self.workers: Dict[int, float] = {}  # pid -> start time
+        self.ready: Set[int] = set()
+        self.old_workers: Set[int] = set()  # serving until the new workers are ready
+        self.respawns: List[float] = []  # when to replace workers that died, sorted
+        self.can_spawn = False
+        self.stopping = False
+        self._ready_deadline = 0.0
+        self._stop_deadline = 0.0
+        self._signals: List[int] = []
+        self._ready_r, self._ready_w = os.pipe()
+        self._wake_r, self._wake_w = os.pipe()
+        for fd in (self._ready_r, self._wake_r, self._wake_w):
+            os.set_blocking(fd, False)
+
+    def start(self, old_workers: List[int]) -> None:
+        """Fork the workers, to replace ``old_workers`` once they are all ready"""
+        self.can_spawn = True
+        self.old_workers = set(old_workers)
+        self._ready_deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        for _ in range(self.count):
+            self.spawn()
+
+    def adopt(self, old_workers: List[int]) -> None:
+        """Keep supervising the previous workers without forking new ones (the new code failed to load)"""
+        self.workers = {pid: time.monotonic() for pid in old_workers}
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.sock, self._ready_w, [self._ready_r, self._wake_r, self._wake_w])
+        self.workers[pid] = time.monotonic()
+
+    def run(self) -> None:
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, lambda signum, frame: self._signals.append(signum))
+        signal.set_wakeup_fd(self._wake_w)
+        logger.info("Serving on %s with %d workers (pid %d)", self.sock.getsockname(), len(self.workers),
+                    os.getpid())
+        while self.workers or self.old_workers or self.respawns:
+            timeout = min(1.0, max(0.0, self.respawns[0] - time.monotonic())) if self.respawns else 1.0
+            readable, _, _ = select.select([self._ready_r, self._wake_r], [], [], timeout)
+            if self._wake_r in readable:
+                self._drain(self._wake_r)
+            if self._ready_r in readable:
+                self.ready.update(int(pid) for pid in self._drain(self._ready_r).split())
+            while self._signals:
+                self.handle(self._signals.pop(0))
+            self.reap()
+            self.spawn_due()
+            if self.stopping and time.monotonic() > self._stop_deadline:
+                # Whoever is still serving after the grace period is killed
+                self.kill(set(self.workers) | self.old_workers, signal.SIGKILL)
+            elif self.old_workers and not self.stopping:
+                self.retire_old_workers()
+
+    def handle(self, signum: int) -> None:
+        if signum in (signal.SIGTERM, signal.SIGINT) and not self.stopping:
+            logger.info("Stopping %d workers", len(self.workers) + len(self.old_workers))
+            self.stopping = True
+            self.respawns = []
+            self._stop_deadline = time.monotonic() + Config.SERVER_GRACEFUL_TIMEOUT_SECONDS + 5
+            self.kill(set(self.workers) | self.old_workers, signal.SIGTERM)
+        elif signum == signal.SIGHUP and not self.stopping:
+            self.reload()
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.ready.discard(pid)
+            self.old_workers.discard(pid)
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping or not self.can_spawn:
+                continue
+            logger.warning("Worker %d exited with status %d; replacing it", pid, os.waitstatus_to_exitcode(status))
+            # Not sleeping here: signals and other exits are handled while a crashing worker waits
+            self.respawns.append(max(time.monotonic(), started + RESPAWN_DELAY_SECONDS))
+            self.respawns.sort()
+
+    def spawn_due(self) -> None:
+        """Replace the dead workers whose respawn delay has passed"""
+        now = time.monotonic()
+        while self.respawns and self.respawns[0] <= now and self.can_spawn and not self.stopping:
+            self.respawns.pop(0)
+            self.spawn()
+
+    def retire_old_workers(self) -> None:
+        """Tell the previous workers to finish once every new one is ready, or give up on the new ones"""
+        if not self.respawns and self.ready >= set(self.workers):
+            logger.info("Reload done; %d old workers finishing", len(self.old_workers))
+            self.kill(self.old_workers, signal.SIGTERM)
+        elif time.monotonic() > self._ready_deadline:
+            logger.error("New workers not ready after %.0fs; keeping the old ones", READY_TIMEOUT_SECONDS)
+            self.can_spawn = False
+            self.respawns = []
+            self.kill(set(self.workers), signal.SIGTERM)
+            self.adopt(list(self.old_workers))
+        else:
+            return
+        self.old_workers = set()
+
+    def reload(self) -> None:
+        """Re-execute this supervisor (loading the code afresh), handing over the socket and workers"""
+        logger.info("Reloading")
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        os.environ[OLD_WORKERS_ENV] = ",".join(map(str, set(self.workers) | self.old_workers))
+        # Until the new supervisor handles HUP itself, another one must not kill it
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.set_wakeup_fd(-1)
+        try:
+            os.execv(sys.executable, [sys.executable, *sys.orig_argv[1:]])
+        except OSError:
+            logger.exception("Reload failed")
+            del os.environ[LISTEN_FD_ENV], os.environ[OLD_WORKERS_ENV]
+            signal.signal(signal.SIGHUP, lambda signum, frame: self._signals.append(signum))
+            signal.set_wakeup_fd(self._wake_w)
+
+    @staticmethod
+    def kill(pids: Set[int], signum: int) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    @staticmethod
+    def _drain(fd: int) -> bytes:
+        data = b""
+        while True:
+            try:
+                chunk = os.read(fd, 4096)
+            except BlockingIOError:
+                return data
+            if not chunk:
+                return data
+            data += chunk
+
+
+def serve(host: str = Config.SERVER_HOST, port: int = Config.SERVER_PORT,
+          workers: int = Config.SERVER_WORKERS, preload_app: bool = Config.SERVER_PRELOAD) -> None:
+    setup_logging()
+    old_workers = [int(pid) for pid in os.environ.pop(OLD_WORKERS_ENV, "").split(",") if pid]
+    supervisor = Supervisor(listen_socket(host, port), workers or os.cpu_count() or 1)
+    if supervisor.count > 1 and Config.SESSION_BACKEND == "memory":
+        logger.warning("SESSION_BACKEND=memory keeps conversations per worker; use sqlite with several workers")
+    try:
+        if preload_app:
+            preload()
+    except Exception:
+        if not old_workers:
+            raise
+        logger.exception("Reload failed to load the app; the %d old workers keep serving", len(old_workers))
+        supervisor.adopt(old_workers)
+    else:
+        # No thread may be running across fork(); the workers start their own log thread
+        setup_logging(use_queue=False)
+        gc.collect()
+        gc.freeze()
+        supervisor.start(old_workers)
+    supervisor.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend with several worker processes")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS, help="0 = one per CPU core")
+    parser.add_argument("--no-preload", dest="preload", action="store_false", default=Config.SERVER_PRELOAD,
+                        help="import the app in each worker instead of once before forking")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.preload)
+
+
+if __name__ == "__main__":
+    main()
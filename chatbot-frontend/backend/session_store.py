@@ -0,0 +1,233 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+
+
+class SessionStore(ABC):
+    """Conversation history storage used by the workflow classes"""
+
+    @abstractmethod
+    def get(self, conversation_id: str) -> List[Dict[str, str]]:
+        """Return the conversation's messages, oldest first (empty if unknown or expired)"""
+
+    @abstractmethod
+    def append(self, conversation_id: str, *messages: Dict[str, str]) -> int:
+        """Append messages to a conversation; returns how many it has received in total"""
+
+    async def aget(self, conversation_id: str) -> List[Dict[str, str]]:
+        """``get`` for async callers; stores that block override it to run off the event loop"""
+        return self.get(conversation_id)
+
+    async def aappend(self, conversation_id: str, *messages: Dict[str, str]) -> int:
+        """``append`` for async callers; stores that block override it to run off the event loop"""
+        return self.append(conversation_id, *messages)
+
+    @abstractmethod
+    def delete(self, conversation_id: str) -> None:
+        """Forget a conversation"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring"""
+
+
+class _PendingAppend:
+    __slots__ = ("conversation_id", "messages", "done", "result", "error")
+
+    def __init__(self, conversation_id: str, messages: Tuple[Dict[str, str], ...]):
+        self.conversation_id = conversation_id
+        self.messages = messages
+        self.done = False
+        self.result = 0
+        self.error: Optional[BaseException] = None
+
+
+class SQLiteSessionStore(SessionStore):
+    """Conversation history in a SQLite database shared by every worker process.
+
+    The database runs in WAL mode so readers never block the writer.
+    ``aget`` and ``aappend`` run the queries on worker threads
+    (asyncio.to_thread), so the event loop never waits on SQLite or its
+    busy timeout. Appends use group commit: concurrent writer threads queue
+    their messages and whichever takes the write lock first commits the
+    whole queue in a single transaction. All SQL is static so sqlite3's
+    statement cache keeps it prepared across calls.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            conversation_id TEXT PRIMARY KEY,
+            total_messages INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS conversations_last_access ON conversations (last_access);
+        CREATE TABLE IF NOT EXISTS messages (
+            conversation_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            PRIMARY KEY (conversation_id, seq)
+        ) WITHOUT ROWID;
+    """
+    _SELECT_CONVERSATION = "SELECT total_messages, last_access FROM conversations WHERE conversation_id = ?"
+    _SELECT_MESSAGES = "SELECT role, content FROM messages WHERE conversation_id = ? AND seq >= ? ORDER BY seq"
+    _INSERT_MESSAGE = "INSERT INTO messages (conversation_id, seq, role, content) VALUES (?, ?, ?, ?)"
+    _UPSERT_CONVERSATION = """
+        INSERT INTO conversations (conversation_id, total_messages, last_access) VALUES (?, ?, ?)
+        ON CONFLICT (conversation_id) DO UPDATE
+        SET total_messages = excluded.total_messages, last_access = excluded.last_access
+    """
+    _TRIM_MESSAGES = "DELETE FROM messages WHERE conversation_id = ? AND seq < ?"
+    _DELETE_MESSAGES = "DELETE FROM messages WHERE conversation_id = ?"
+    _DELETE_CONVERSATION = "DELETE FROM conversations WHERE conversation_id = ?"
+    _SWEEP_MESSAGES = """
+        DELETE FROM messages WHERE conversation_id IN
+        (SELECT conversation_id FROM conversations WHERE last_access < ?)
+    """
+    _SWEEP_CONVERSATIONS = "DELETE FROM conversations WHERE last_access < ?"
+    _COUNT_CONVERSATIONS = "SELECT COUNT(*) FROM conversations"
+
+    def __init__(self,
+                 path: str = Config.SESSION_DB_PATH,
+                 ttl_seconds: float = Config.MEMORY_TTL_HOURS * 3600,
+                 max_turns: int = Config.MAX_CONVERSATION_TURNS,
+                 sweep_interval: float = 60.0,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_turns * 2
+        self.sweep_interval = sweep_interval
+        # Wall-clock time: last_access is compared across processes
+        self._clock = clock
+        self._local = threading.local()
+        self._pending: List[_PendingAppend] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._next_sweep = 0.0
+        self._stats = {
+            'reads': 0,
+            'appends': 0,
+            'commits': 0,
+            'expired': 0,
+            'conversations': 0,
+        }
+        connection = self._connection()
+        connection.executescript(self._SCHEMA)
+        self._stats['conversations'] = connection.execute(self._COUNT_CONVERSATIONS).fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after fork so worker processes
+        # never share a handle inherited from the parent.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None,
+                                         cached_statements=64)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _is_expired(self, last_access: float, now: float) -> bool:
+        return now - last_access > self.ttl_seconds
+
+    def get(self, conversation_id: str) -> List[Dict[str, str]]:
+        connection = self._connection()
+        self._stats['reads'] += 1
+        row = connection.execute(self._SELECT_CONVERSATION, (conversation_id,)).fetchone()
+        if row is None or self._is_expired(row[1], self._clock()):
+            return []
+        first_seq = max(0, row[0] - self.max_messages)
+        rows = connection.execute(self._SELECT_MESSAGES, (conversation_id, first_seq)).fetchall()
+        return [{'role': role, 'content': content} for role, content in rows]
+
+    async def aget(self, conversation_id: str) -> List[Dict[str, str]]:
+        return await asyncio.to_thread(self.get, conversation_id)
+
+    async def aappend(self, conversation_id: str, *messages: Dict[str, str]) -> int:
+        return await asyncio.to_thread(self.append, conversation_id, *messages)
+
+    def append(self, conversation_id: str, *messages: Dict[str, str]) -> int:
+        request = _PendingAppend(conversation_id, messages)
+        with self._pending_lock:
+            self._pending.append(request)
+
+        with self._write_lock:
+            # Another writer may already have committed this request with its batch
+            if not request.done:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                self._write_batch(batch)
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _write_batch(self, batch: List[_PendingAppend]) -> None:
+        connection = self._connection()
+        now = self._clock()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                row = connection.execute(self._SELECT_CONVERSATION, (request.conversation_id,)).fetchone()
+                total = 0
+                if row is not None:
+                    if self._is_expired(row[1], now):
+                        connection.execute(self._DELETE_MESSAGES, (request.conversation_id,))
+                        self._stats['expired'] += 1
+                    else:
+                        total = row[0]
+
+                connection.executemany(self._INSERT_MESSAGE, [
+                    (request.conversation_id, total + i, message['role'], message['content'])
+                    for i, message in enumerate(request.messages)
+                ])
+                total += len(request.messages)
+                connection.execute(self._UPSERT_CONVERSATION, (request.conversation_id, total, now))
+                if total > self.max_messages:
+                    connection.execute(self._TRIM_MESSAGES, (request.conversation_id, total - self.max_messages))
+                request.result = total
+
+            if now >= self._next_sweep:
+                cutoff = now - self.ttl_seconds
+                connection.execute(self._SWEEP_MESSAGES, (cutoff,))
+                self._stats['expired'] += connection.execute(self._SWEEP_CONVERSATIONS, (cutoff,)).rowcount
+                self._stats['conversations'] = connection.execute(self._COUNT_CONVERSATIONS).fetchone()[0]
+                self._next_sweep = now + self.sweep_interval
+
+            connection.execute("COMMIT")
+            self._stats['appends'] += len(batch)
+            self._stats['commits'] += 1
+        except BaseException as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done = True
+
+    def delete(self, conversation_id: str) -> None:
+        with self._write_lock:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(self._DELETE_MESSAGES, (conversation_id,))
+            connection.execute(self._DELETE_CONVERSATION, (conversation_id,))
+            connection.execute("COMMIT")
+
+    def stats(self) -> Dict[str, int]:
+        # "conversations" is as of the last sweep, so reading stats never queries the database
+        return dict(self._stats)
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store selected by Config.SESSION_BACKEND"""
+    if Config.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore()
+    from conversation_store import ConversationStore
+    return ConversationStore()
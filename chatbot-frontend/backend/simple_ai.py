@@ -1,5 +1,9 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator
 import asyncio
+from scenario_classifier import scenario_classifier
+from structured_logging import get_logger
+
+logger = get_logger(__name__)
 
 class SimpleCaregiverAI:
     """Simplified AI that provides intelligent responses without external API calls"""
@@ -37,48 +41,63 @@ class SimpleCaregiverAI:
                 "suggestions": ["Tell me more", "What should I do?", "Who can help?"]
             }
         }
+        # Replies depend only on (scenario, first message), so each is built once
+        self._replies: Dict[tuple, Dict] = {}
     
     def analyze_scenario(self, message: str, reason: str) -> str:
         """Analyze user input to determine scenario"""
-        combined = f"{reason} {message}".lower()
-        
-        if any(word in combined for word in ["schedule", "calendar", "missing", "not showing", "removed"]):
-            return "Schedule Issue"
-        elif any(word in combined for word in ["location", "gps", "outside", "range", "distance", "address"]):
-            return "Location Issue"
-        elif any(word in combined for word in ["phone", "number", "call", "ivr", "registered"]):
-            return "Phone Issue"
-        elif any(word in combined for word in ["late", "early", "time", "clock", "hours", "forgot"]):
-            return "Timing Issue"
-        else:
-            return "General Inquiry"
+        return scenario_classifier.classify(message, reason)
+    
+    def is_first_message(self, message: str) -> bool:
+        return "initial contact" in message.lower()
+    
+    def scripted_reply(self, scenario: str, first_message: bool) -> Dict:
+        """Return the scripted reply for a scenario, building it on first use"""
+        key = (scenario, first_message)
+        reply = self._replies.get(key)
+        if reply is None:
+            # Get appropriate response template
+            template = self.scenario_responses[scenario]
+            
+            # Build response
+            if first_message:
+                # First message - use greeting + main response
+                response = f"{template['greeting']}\n\n{template['main_response']}"
+            else:
+                # Follow-up message - use follow-up response
+                response = template['follow_up']
+            
+            reply = {
+                'response': response,
+                'scenario_detected': scenario,
+                'suggestions': template['suggestions']
+            }
+            self._replies[key] = reply
+        return reply
     
     async def process_message(self, user_info: Dict, message: str) -> Dict:
         """Process message and return intelligent response"""
-        print(f"🔍 Processing: {message}")
+        logger.debug("Processing: %s", message)
         
         # Determine scenario
         scenario = self.analyze_scenario(message, user_info.get('reason_for_contact', ''))
-        print(f"🎯 Scenario: {scenario}")
-        
-        # Get appropriate response template
-        template = self.scenario_responses[scenario]
+        logger.debug("Scenario: %s", scenario)
         
-        # Build response
-        if "initial contact" in message.lower():
-            # First message - use greeting + main response
-            response = f"{template['greeting']}\n\n{template['main_response']}"
-        else:
-            # Follow-up message - use follow-up response
-            response = template['follow_up']
+        reply = self.scripted_reply(scenario, self.is_first_message(message))
         
-        print(f"✅ Response ready")
+        logger.debug("Response ready")
         
-        return {
-            'response': response,
-            'scenario_detected': scenario,
-            'suggestions': template['suggestions']
+        return dict(reply)
+    
+    async def stream_message(self, user_info: Dict, message: str) -> AsyncIterator[Dict]:
+        """Stream the scripted reply in the same frame format as the LLM backends"""
+        result = await self.process_message(user_info, message)
+        yield {
+            'type': 'meta',
+            'scenario_detected': result['scenario_detected'],
+            'suggestions': result['suggestions']
         }
+        yield {'type': 'token', 'content': result['response']}
 
 # Global instance
 simple_ai = SimpleCaregiverAI() 
\ No newline at end of file
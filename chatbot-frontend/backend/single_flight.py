@@ -0,0 +1,84 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple, TypeVar
+from config import Config
+from name_masking import SPACES, mask_name
+
+T = TypeVar("T")
+
+
+def normalize_prompt(text: str, user_name: str = "") -> str:
+    """Prompt text with the caregiver's name masked, case folded and whitespace collapsed"""
+    return SPACES.sub(" ", mask_name(text, user_name)).strip().casefold()
+
+
+def prompt_key(model: str, messages: List[Any], user_name: str = "") -> Tuple:
+    return (model,) + tuple((type(message).__name__, normalize_prompt(str(message.content), user_name))
+                            for message in messages)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Shares one in-flight call among concurrent callers with the same key.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it runs await the same task instead of starting their own. The
+    key is forgotten as soon as the task finishes, so results are never
+    reused afterwards (that is the semantic cache's job).
+
+    A caller that is cancelled (its client went away) stops waiting without
+    cancelling the call for the others; the call is only cancelled once
+    nobody is waiting for it.
+    """
+
+    def __init__(self, enabled: bool = Config.LLM_COALESCE_PROMPTS):
+        self.enabled = enabled
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {'calls': 0, 'flights': 0, 'coalesced': 0}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """(result, shared): ``shared`` is True when another caller's call was joined"""
+        self._stats['calls'] += 1
+        if not self.enabled:
+            self._stats['flights'] += 1
+            return await call(), False
+
+        flight = self._flights.get(key)
+        # Tasks belong to one event loop (tests and benchmarks run several)
+        shared = flight is not None and flight.task.get_loop() is asyncio.get_running_loop()
+        if shared:
+            self._stats['coalesced'] += 1
+        else:
+            self._stats['flights'] += 1
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(call()))
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self._stats['calls']
+        return {
+            **self._stats,
+            'in_flight': len(self._flights),
+            'coalesce_rate': self._stats['coalesced'] / calls if calls else 0.0,
+        }
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+# Global instance
+llm_flights = SingleFlight()
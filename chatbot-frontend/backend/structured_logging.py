@@ -0,0 +1,199 @@
+import atexit
+import datetime
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
+from config import Config
+
+ROOT_LOGGER = "caregiver"
+# Loggers of the server running the app, written through the same handler when
+# it leaves logging alone (serve.py starts uvicorn with log_config=None)
+SERVER_LOGGERS = ("uvicorn",)
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._\-]{1,64}$")
+
+# Correlation ID of the request being handled; asyncio tasks inherit it
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+# (uvicorn adds color_message, its message with terminal colour codes)
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id",
+                                                                        "color_message"}
+
+_listener: Optional[QueueListener] = None
+_debug_sample_rate = 1.0
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Application logger whose DEBUG lines are sampled.
+
+    The sampling decision is made before a LogRecord is created, so a
+    dropped line costs a level check and one random number.
+    """
+
+    def debug(self, msg, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG) and random.random() < _debug_sample_rate:
+            self.logger._log(logging.DEBUG, msg, args, **kwargs)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+
+def get_logger(name: str) -> SampledLogger:
+    """Logger under the application namespace (configured by setup_logging)"""
+    return SampledLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"))
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request ID, message and any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting or blocking.
+
+    The request ID is stamped here, in the caller's context, but the message
+    is left unformatted: ``%``-style arguments are only rendered by the
+    listener, so pass immutable values. When the queue is full the record
+    is dropped and counted rather than stalling the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _RequestIdFilter(logging.Filter):
+    """Stamps the request ID on records written synchronously"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def setup_logging(level: str = Config.LOG_LEVEL,
+                  log_format: str = Config.LOG_FORMAT,
+                  debug_sample_rate: float = Config.LOG_DEBUG_SAMPLE_RATE,
+                  stream: Optional[TextIO] = None,
+                  use_queue: bool = True) -> logging.Logger:
+    """Configure the application loggers; safe to call again to reconfigure.
+
+    Records go through a bounded queue to a listener thread that formats
+    and writes them, so request handlers never wait on stdout. Set
+    ``use_queue=False`` to write synchronously instead (for comparison).
+    """
+    global _listener, _debug_sample_rate
+    _debug_sample_rate = debug_sample_rate
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+
+    if use_queue:
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+    else:
+        handler = output
+        handler.addFilter(_RequestIdFilter())
+
+    for name in (ROOT_LOGGER, *SERVER_LOGGERS):
+        logger = logging.getLogger(name)
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+        logger.addHandler(handler)
+        logger.setLevel(level.upper())
+        logger.propagate = False
+    return logging.getLogger(ROOT_LOGGER)
+
+
+def logging_stats() -> Dict[str, int]:
+    dropped = sum(getattr(handler, "dropped", 0) for handler in logging.getLogger(ROOT_LOGGER).handlers)
+    queued = _listener.queue.qsize() if _listener is not None else 0
+    return {"dropped": dropped, "queued": queued}
+
+
+def _stop_listener() -> None:
+    # Flush whatever is still queued at interpreter exit
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving each request a correlation ID.
+
+    An incoming X-Request-ID header is reused (so IDs follow a request
+    across services), otherwise a new one is generated. The ID is set for
+    every log record written while handling the request and echoed back in
+    the response's X-Request-ID header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                if _VALID_REQUEST_ID.match(value):
+                    request_id = value.decode()
+                break
+        request_id = request_id or new_request_id()
+        header = (REQUEST_ID_HEADER, request_id.encode())
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
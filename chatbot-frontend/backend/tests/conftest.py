@@ -0,0 +1,37 @@
+import asyncio
+from typing import List
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import llm_client
+from config import Config
+
+
+class StubLLM:
+    """Chat model double: answers after ``delay`` seconds, or fails while ``failing`` is set"""
+
+    def __init__(self):
+        self.calls = 0
+        self.delay = 0.0
+        self.failing = False
+
+    async def ainvoke(self, messages: List) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.failing:
+            raise ConnectionError("provider unavailable")
+        return AIMessage(content=f"Reply {self.calls}")
+
+
+@pytest.fixture
+def llm():
+    stub = StubLLM()
+    llm_client.set_llm(stub)
+    yield stub
+    llm_client.set_llm(None)
+
+
+@pytest.fixture
+def checkpoint_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "LANGGRAPH_CHECKPOINT_DB_PATH", str(tmp_path / "checkpoints.db"))
@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+
+from clock_batch import evaluate_clock_events
+from clock_rules import PHONE_NOT_FOUND, ClockFacts, evaluate_clock_event
+from geofence import ServiceAreaIndex
+from schedule_store import ScheduleStore
+
+DAY = datetime.date(2026, 10, 19)
+LOPEZ = {"lat": 40.70, "lng": -74.00}
+KIM = {"lat": 40.80, "lng": -73.90}
+
+
+@pytest.fixture
+def lookups():
+    store = ScheduleStore()
+    store.add_shift("Ann", "Lopez", "+15550001", DAY, datetime.time(9), datetime.time(11))
+    store.add_shift("Ann", "Kim", "+15550002", DAY, datetime.time(11, 30), datetime.time(13))
+    store.add_shift("Bob", "Reyes", "+15550003", DAY + datetime.timedelta(days=1), datetime.time(9), datetime.time(17))
+    areas = ServiceAreaIndex()
+    areas.sync({"Lopez": LOPEZ, "Kim": KIM})
+    return {'schedule_store': store, 'service_areas': areas, 'registered_phones': {"+15559999": "Ann"}}
+
+
+def outcomes(lookups, events):
+    """Clock-in outcomes for (phone, location, actual_time) events, one at a time and as a batch"""
+    single = [evaluate_clock_event("clock_in", ClockFacts("Ann", phone, location, actual, **lookups))
+              for phone, location, actual in events]
+    batch = evaluate_clock_events(
+        ["clock_in"] * len(events), caregivers=["Ann"] * len(events), clients=[None] * len(events),
+        phones=[phone for phone, _, _ in events], locations=[location for _, location, _ in events],
+        scheduled_times=[""] * len(events), actual_times=[actual for _, _, actual in events],
+        has_schedule=[True] * len(events), **lookups)
+    assert single == batch
+    return single
+
+
+def test_shift_lookups_by_client_and_phone(lookups):
+    store = lookups['schedule_store']
+    when = datetime.datetime(2026, 10, 19, 11, 40)
+    assert [shift.caregiver for shift in store.shifts_for_client("Kim", when)] == ["Ann"]
+    assert [shift.client for shift in store.shifts_for_phone("+15550002", when)] == ["Kim"]
+    assert store.shifts_for_phone("+15550002", when + datetime.timedelta(hours=5)) == []
+    assert store.stats() == {'shifts': 3, 'caregivers': 2, 'clients': 3, 'phones': 3}
+
+
+def test_a_phone_booked_for_a_shift_counts_as_known(lookups):
+    assert outcomes(lookups, [
+        ("+15550002", KIM, "2026-10-19T11:35:00"),  # the client's landline during the visit
+        ("+15550003", KIM, "2026-10-19T11:35:00"),  # a landline only booked the next day
+        ("+15557777", KIM, "2026-10-19T11:35:00"),
+        ("+15559999", KIM, "2026-10-19T11:35:00"),
+    ]) == ["clock_in_success", PHONE_NOT_FOUND, PHONE_NOT_FOUND, "clock_in_success"]
+
+
+def test_overlapping_shifts_are_told_apart_by_location(lookups):
+    # 11:20 is nearer Kim's start than Lopez's, so only the location picks Lopez
+    for location, client in ((LOPEZ, "Lopez"), (KIM, "Kim")):
+        facts = ClockFacts("Ann", "+15559999", location, "2026-10-19T11:20:00", **lookups)
+        assert facts.shift.client == client
+    # Late for Lopez rather than outside Kim's service area
+    assert outcomes(lookups, [
+        ("+15559999", LOPEZ, "2026-10-19T11:20:00"),
+        ("+15559999", KIM, "2026-10-19T11:20:00"),
+    ]) == ["clock_in_out_of_window", "clock_in_success"]
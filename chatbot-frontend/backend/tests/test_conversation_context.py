@@ -0,0 +1,24 @@
+from conversation_context import ContextBuilder
+
+
+def message(i):
+    return {'role': "user" if i % 2 == 0 else "assistant", 'content': f"Turn {i}. " + "words " * (i % 7 * 10)}
+
+
+def test_incremental_context_matches_a_full_rebuild():
+    incremental = ContextBuilder(token_budget=300, summary_budget=80)
+    history = []
+    for i in range(40):
+        history.append(message(i))
+        text = incremental.render("c1", history)
+        assert text == ContextBuilder(token_budget=300, summary_budget=80).render("c1", history)
+    assert incremental.stats()['incremental'] == 39
+    assert incremental.stats()['summarized_turns'] > 0
+    assert "Turn 0." not in text
+
+
+def test_context_is_rebuilt_when_the_history_no_longer_matches():
+    builder = ContextBuilder()
+    builder.render("c1", [message(0), message(1)])
+    assert builder.render("c1", [message(2), message(3)]) == ContextBuilder().render("c2", [message(2), message(3)])
+    assert builder.stats()['rebuilds'] == 2
@@ -0,0 +1,52 @@
+import asyncio
+
+from checkpoint_store import checkpoint_store
+from langgraph_workflows import LangGraphWorkflows, TurnPolicy
+from llm_gateway import LLMUnavailable
+
+USER_INFO = {'user_name': "Ann", 'contact_number': "555-0100", 'reason_for_contact': "Schedule"}
+MESSAGES = ["My schedule is missing from the app", "It's Mrs. Lopez", "I checked the app again"]
+
+
+def run_turns(assistant, prepare_turn):
+    """Send MESSAGES on one conversation; ``prepare_turn(i)`` sets up the LLM before turn i"""
+
+    async def turns():
+        outcomes = []
+        try:
+            for i, message in enumerate(MESSAGES):
+                prepare_turn(i)
+                try:
+                    outcomes.append(await assistant.process_message(USER_INFO, message, conversation_id="c1"))
+                except LLMUnavailable as e:
+                    outcomes.append(e)
+        finally:
+            await checkpoint_store.close()
+        return outcomes
+
+    return asyncio.run(turns())
+
+
+def test_turns_after_a_failed_first_step_start_the_workflow_over(llm, checkpoint_db):
+    def prepare_turn(i):
+        llm.failing = i == 0
+
+    first, second, third = run_turns(LangGraphWorkflows(), prepare_turn)
+
+    assert isinstance(first, LLMUnavailable)
+    assert second['response'].startswith("Reply")
+    assert second['next_step'] == 'gather_details'
+    assert third['response'].startswith("Reply")
+
+
+def test_turns_after_a_first_step_past_the_deadline_start_the_workflow_over(llm, checkpoint_db):
+    def prepare_turn(i):
+        llm.delay = 1.0 if i == 0 else 0.0
+
+    assistant = LangGraphWorkflows(TurnPolicy(max_llm_calls=1, deadline_seconds=0.2))
+    first, second, third = run_turns(assistant, prepare_turn)
+
+    assert isinstance(first, LLMUnavailable)
+    assert second['response'].startswith("Reply")
+    assert second['next_step'] == 'gather_details'
+    assert third['response'].startswith("Reply")
@@ -0,0 +1,161 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import List
+
+import serve
+
+BACKEND = Path(__file__).parent.parent
+WORKERS = 2
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as listing:
+            return [int(child) for child in listing.read().split()]
+    except OSError:
+        return []
+
+
+def responds(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def wait_for(condition, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.1)
+
+
+class Server:
+    """serve.py in a subprocess, logging to a file"""
+
+    def __init__(self, tmp_path: Path):
+        self.port = free_port()
+        self.log_path = tmp_path / "server.log"
+        env = {**os.environ, "LOG_FORMAT": "json", "LOG_LEVEL": "INFO", "CHAT_BACKEND": "simple",
+               "SERVER_GRACEFUL_TIMEOUT_SECONDS": "5"}
+        with open(self.log_path, "wb") as log:
+            self.process = subprocess.Popen(
+                [sys.executable, "-W", "ignore", "serve.py", "--workers", str(WORKERS), "--port", str(self.port)],
+                cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+        self.wait_for_workers()
+
+    def workers(self) -> List[int]:
+        return children(self.process.pid)
+
+    def wait_for_workers(self, replacing: List[int] = ()) -> List[int]:
+        """Wait until WORKERS workers, none of them in ``replacing``, run and the server answers"""
+        wait_for(lambda: len(self.workers()) == WORKERS and not set(self.workers()) & set(replacing)
+                 and responds(self.port))
+        return self.workers()
+
+    def stop(self) -> int:
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+        return self.process.wait(timeout=30)
+
+    def log_lines(self) -> List[str]:
+        return [line for line in self.log_path.read_text().splitlines() if line.strip()]
+
+
+def test_killed_worker_is_replaced_and_term_stops_everything(tmp_path):
+    server = Server(tmp_path)
+    try:
+        first = server.workers()
+        os.kill(first[0], signal.SIGKILL)
+        replaced = server.wait_for_workers(replacing=[first[0]])
+        assert first[1] in replaced
+    finally:
+        assert server.stop() == 0
+    for pid in replaced:
+        wait_for(lambda: not os.path.exists(f"/proc/{pid}") or "Z" in Path(f"/proc/{pid}/stat").read_text().split()[2],
+                 timeout=10)
+
+
+def test_hup_reloads_every_worker_without_failing_requests(tmp_path):
+    server = Server(tmp_path)
+    failures, done = [], threading.Event()
+
+    def load():
+        while not done.is_set():
+            if not responds(server.port):
+                failures.append(time.monotonic())
+
+    client = threading.Thread(target=load)
+    try:
+        old = server.workers()
+        client.start()
+        server.process.send_signal(signal.SIGHUP)
+        server.wait_for_workers(replacing=old)
+        # The old workers finish once the new ones are ready
+        wait_for(lambda: not set(server.workers()) & set(old))
+        time.sleep(0.5)
+    finally:
+        done.set()
+        client.join()
+        assert server.stop() == 0
+    assert failures == []
+    lines = server.log_lines()
+    entries = [json.loads(line) for line in lines]
+    assert any(entry['message'] == "Reloading" for entry in entries)
+    assert any(entry['logger'].startswith("uvicorn") for entry in entries)
+    assert not any("color_message" in entry for entry in entries)
+
+
+class DeadWorker:
+    """os.waitpid stand-in reporting one exited worker"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def __call__(self, pid, options):
+        if self.pid is None:
+            raise ChildProcessError()
+        dead, self.pid = self.pid, None
+        return dead, 1 << 8
+
+
+def test_crashing_worker_is_replaced_later_without_blocking(monkeypatch):
+    with socket.socket() as sock:
+        supervisor = serve.Supervisor(sock, workers=1)
+        spawned = []
+        monkeypatch.setattr(supervisor, "spawn", lambda: spawned.append(time.monotonic()))
+        monkeypatch.setattr(os, "waitpid", DeadWorker(4242))
+        supervisor.can_spawn = True
+        supervisor.workers = {4242: time.monotonic()}
+
+        start = time.monotonic()
+        supervisor.reap()
+        supervisor.spawn_due()
+        assert time.monotonic() - start < 0.1
+        assert spawned == []
+        assert supervisor.respawns[0] >= start + serve.RESPAWN_DELAY_SECONDS - 0.1
+
+        supervisor.respawns[0] = time.monotonic()
+        supervisor.spawn_due()
+        assert len(spawned) == 1 and supervisor.respawns == []
+
+        # A stop drops respawns that are still waiting
+        supervisor.respawns.append(time.monotonic() + 60)
+        monkeypatch.setattr(supervisor, "kill", lambda pids, signum: None)
+        supervisor.handle(signal.SIGTERM)
+        assert supervisor.respawns == []
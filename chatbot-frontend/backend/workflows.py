@@ -1,95 +1,199 @@
 from typing import Dict, Any, List, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage
-from config import Config
+from langchain_core.messages import BaseMessage
+from llm_client import invoke_llm
+from scenario_classifier import scenario_classifier
+from session_store import SessionStore, create_session_store
+from conversation_context import context_builder
+from semantic_cache import semantic_cache
+from prompt_registry import prompts
 import asyncio
+import uuid
 
-# Initialize Gemini LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-pro",
-    google_api_key=Config.get_google_api_key(),
-    temperature=0.7
-)
+# Opening turns quote the scenario's script; follow-ups see the conversation so far
+SCHEDULE_OPENING = prompts.register("workflows:schedule_opening", instructions="""
+    A caregiver has contacted you about a schedule issue.
+    
+    Respond exactly as Rosella would from the company scripts:
+    "Hello, this is Rosella, I am calling from Independence Care, how are you doing today?
+    
+    I see you clocked in but there seems to be no schedule on your Calendar, can you
+    confirm the client you are working with today?"
+    
+    Be professional, empathetic, and follow the exact scripts provided.
+""", variables="""
+    Caregiver: {user_name}
+    Their initial concern: "{message}"
+    Contact: {contact_number}
+""")
+SCHEDULE_FOLLOW_UP = prompts.register("workflows:schedule_follow_up", instructions="""
+    Continue this conversation about the caregiver's schedule issue.
+    
+    Respond appropriately based on what they've said. If they've provided the client name,
+    follow the script: "No, please do not leave. Unfortunately, the app can malfunction at
+    times and remove Caregivers from schedules. I will add you to the schedule and clock you in,
+    if for any reason this causes an error your coordinator will reach out to you to clarify."
+    
+    If they need different guidance, provide it professionally.
+""", variables="""
+    Conversation so far:
+    {conversation}
+    
+    Caregiver's latest message: "{message}"
+""")
+LOCATION_OPENING = prompts.register("workflows:location_opening", instructions="""
+    A caregiver has a location/GPS issue.
+    
+    Respond with the appropriate script:
+    "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
+    
+    I have noticed you have clocked in outside of the client's service area, which is not close
+    to your client's house. Can you please clock in again once you are at your client's house,
+    because we are not able to accept this clock in."
+    
+    Be professional and follow company policy about location verification.
+""", variables="""
+    Caregiver: {user_name}
+    Issue: "{message}"
+""")
+LOCATION_FOLLOW_UP = prompts.register("workflows:location_follow_up", instructions="""
+    Continue handling the caregiver's location issue.
+    
+    If they explain they stopped to pick up supplies for the client, ask them to verify with the client.
+    If it's a GPS error, guide them to try again from the correct location.
+    Always remind them: "Remember it is state law that a Home Care agency cannot bill for visits
+    that are rendered outside of the client's home."
+""", variables="""
+    Conversation:
+    {conversation}
+    
+    Latest message: "{message}"
+""")
+PHONE_OPENING = prompts.register("workflows:phone_opening", instructions="""
+    A caregiver has a phone issue.
+    
+    Respond with the script:
+    "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
+    
+    I have noticed that you used the IVR number to clock in today, but you used your phone
+    to call that number instead of the client's house phone. Can you please clock in again
+    using the client's house phone?"
+    
+    Or if it's an unregistered number:
+    "I have noticed that you have clocked in using a phone number that is not registered
+    with us. Can you confirm whose number this is?"
+""", variables="""
+    Caregiver: {user_name}
+    Issue: "{message}"
+""")
+PHONE_FOLLOW_UP = prompts.register("workflows:phone_follow_up", instructions="""
+    Continue handling the caregiver's phone issue.
+    
+    Provide appropriate guidance based on their response. If they can't use the client's phone,
+    suggest using the HHA app. If the app doesn't work, offer to have a coordinator help set it up.
+""", variables="""
+    Conversation:
+    {conversation}
+    
+    Latest message: "{message}"
+""")
+TIMING_OPENING = prompts.register("workflows:timing_opening", instructions="""
+    A caregiver has a timing issue.
+    
+    Respond with the script:
+    "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
+    
+    I have noticed that you clocked in late for your shift today, I just wanted to confirm
+    what was the reason for that?"
+    
+    Be understanding but professional about timing policies.
+""", variables="""
+    Caregiver: {user_name}
+    Issue: "{message}"
+""")
+TIMING_FOLLOW_UP = prompts.register("workflows:timing_follow_up", instructions="""
+    Continue handling the caregiver's timing issue.
+    
+    Based on their reason, offer solutions:
+    "Would you be willing to make up for the hours you missed today by staying late on your
+    shift today? Or any other day throughout the week?"
+    
+    If they agree, help adjust the schedule. If not, be understanding but note the policy.
+""", variables="""
+    Conversation:
+    {conversation}
+    
+    Latest message: "{message}"
+""")
+GENERAL_INQUIRY = prompts.register("workflows:general_inquiry", instructions="""
+    Handle this general caregiver inquiry professionally.
+    
+    Provide helpful, professional assistance. If it's not a standard scenario,
+    offer to connect them with the appropriate department or supervisor.
+    
+    Start with: "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!"
+""", variables="""
+    Caregiver: {user_name}
+    Contact: {contact_number}
+    Original reason: {reason_for_contact}
+    Current message: "{message}"
+""")
 
 class CaregiverWorkflows:
     """LangGraph-style workflow manager for caregiver scenarios"""
     
-    def __init__(self):
-        self.conversation_memory = {}  # In-memory storage for conversations
+    def __init__(self, session_store: Optional[SessionStore] = None):
+        # Conversation history; shared across workers when backed by SQLite
+        self.conversation_memory = session_store or create_session_store()
     
     def analyze_scenario(self, user_message: str, reason: str) -> str:
         """Analyze user input to determine which workflow to use"""
-        combined_text = f"{reason} {user_message}".lower()
-        
-        # Schedule-related keywords
-        if any(word in combined_text for word in ["schedule", "calendar", "missing", "not showing", "removed"]):
-            return "Schedule Issue"
-        
-        # Location/GPS keywords  
-        if any(word in combined_text for word in ["location", "gps", "address", "outside", "range", "distance"]):
-            return "Location Issue"
-            
-        # Phone/communication keywords
-        if any(word in combined_text for word in ["phone", "number", "call", "ivr", "registered"]):
-            return "Phone Issue"
-            
-        # Timing keywords
-        if any(word in combined_text for word in ["late", "early", "time", "clock", "hours"]):
-            return "Timing Issue"
-            
-        return "General Inquiry"
+        return scenario_classifier.classify(user_message, reason)
+    
+    async def generate_reply(self, scenario_type: str, prompt: List[BaseMessage], user_info: Dict, message: str,
+                             cacheable: bool) -> str:
+        """Get the LLM reply for a prompt; opening turns may be served from the semantic cache"""
+        cache_key = f"workflows:{scenario_type}"
+        user_name = user_info.get('user_name', '')
+        if cacheable:
+            cached = semantic_cache.lookup(cache_key, message, user_name)
+            if cached is not None:
+                return cached['response']
+        
+        response = await invoke_llm(prompt, node=cache_key, user_name=user_name)
+        if cacheable:
+            semantic_cache.store(cache_key, message, {'response': response.content}, user_name)
+        return response.content
     
     async def process_schedule_issue(self, user_info: Dict, message: str, conversation_id: str) -> Dict:
         """Handle schedule-related issues with multi-step workflow"""
         
         # Get conversation history
-        history = self.conversation_memory.get(conversation_id, [])
+        history = await self.conversation_memory.aget(conversation_id)
         
         if len(history) == 0:  # First message in this workflow
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver named {user_info.get('user_name', 'the caregiver')} 
-            has contacted you about a schedule issue.
-            
-            Their initial concern: "{message}"
-            Contact: {user_info.get('contact_number', 'N/A')}
-            
-            Respond exactly as Rosella would from the company scripts:
-            "Hello, this is Rosella, I am calling from Independence Care, how are you doing today?
-            
-            I see you clocked in but there seems to be no schedule on your Calendar, can you 
-            confirm the client you are working with today?"
-            
-            Be professional, empathetic, and follow the exact scripts provided.
-            """
+            prompt = SCHEDULE_OPENING.render(
+                user_name=user_info.get('user_name', 'the caregiver'),
+                message=message,
+                contact_number=user_info.get('contact_number', 'N/A')
+            )
         else:
             # Continue the conversation based on history
-            conversation_context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history])
-            prompt = f"""
-            Continue this conversation as Rosella from Independence Care.
-            
-            Conversation so far:
-            {conversation_context}
-            
-            Caregiver's latest message: "{message}"
-            
-            Respond appropriately based on what they've said. If they've provided the client name,
-            follow the script: "No, please do not leave. Unfortunately, the app can malfunction at 
-            times and remove Caregivers from schedules. I will add you to the schedule and clock you in, 
-            if for any reason this causes an error your coordinator will reach out to you to clarify."
-            
-            If they need different guidance, provide it professionally.
-            """
+            conversation_context = context_builder.render(conversation_id, history)
+            prompt = SCHEDULE_FOLLOW_UP.render(conversation=conversation_context, message=message)
         
         # Get AI response
-        response = llm.invoke([HumanMessage(content=prompt)])
+        response_text = await self.generate_reply('Schedule Issue', prompt, user_info, message,
+                                                  cacheable=len(history) == 0)
         
         # Update conversation memory
-        history.append({'role': 'user', 'content': message})
-        history.append({'role': 'assistant', 'content': response.content})
-        self.conversation_memory[conversation_id] = history
+        message_count = await self.conversation_memory.aappend(
+            conversation_id,
+            {'role': 'user', 'content': message},
+            {'role': 'assistant', 'content': response_text}
+        )
         
         # Determine suggestions based on conversation stage
-        if len(history) <= 2:
+        if message_count <= 2:
             suggestions = [
                 "Provide client name",
                 "Check app again", 
@@ -103,54 +207,31 @@ class CaregiverWorkflows:
             ]
         
         return {
-            'response': response.content,
+            'response': response_text,
             'scenario_detected': 'Schedule Issue',
             'suggestions': suggestions,
-            'conversation_step': len(history) // 2
+            'conversation_step': message_count // 2
         }
     
     async def process_location_issue(self, user_info: Dict, message: str, conversation_id: str) -> Dict:
         """Handle GPS/location issues with multi-step workflow"""
         
-        history = self.conversation_memory.get(conversation_id, [])
+        history = await self.conversation_memory.aget(conversation_id)
         
         if len(history) == 0:
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver has a location/GPS issue.
-            
-            Caregiver: {user_info.get('user_name', 'the caregiver')}
-            Issue: "{message}"
-            
-            Respond with the appropriate script:
-            "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
-            
-            I have noticed you have clocked in outside of the client's service area, which is not close 
-            to your client's house. Can you please clock in again once you are at your client's house, 
-            because we are not able to accept this clock in."
-            
-            Be professional and follow company policy about location verification.
-            """
+            prompt = LOCATION_OPENING.render(user_name=user_info.get('user_name', 'the caregiver'), message=message)
         else:
-            conversation_context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history])
-            prompt = f"""
-            Continue as Rosella handling the location issue.
-            
-            Conversation:
-            {conversation_context}
-            
-            Latest message: "{message}"
-            
-            If they explain they stopped to pick up supplies for the client, ask them to verify with the client.
-            If it's a GPS error, guide them to try again from the correct location.
-            Always remind them: "Remember it is state law that a Home Care agency cannot bill for visits 
-            that are rendered outside of the client's home."
-            """
-        
-        response = llm.invoke([HumanMessage(content=prompt)])
-        
-        history.append({'role': 'user', 'content': message})
-        history.append({'role': 'assistant', 'content': response.content})
-        self.conversation_memory[conversation_id] = history
+            conversation_context = context_builder.render(conversation_id, history)
+            prompt = LOCATION_FOLLOW_UP.render(conversation=conversation_context, message=message)
+        
+        response_text = await self.generate_reply('Location Issue', prompt, user_info, message,
+                                                  cacheable=len(history) == 0)
+        
+        message_count = await self.conversation_memory.aappend(
+            conversation_id,
+            {'role': 'user', 'content': message},
+            {'role': 'assistant', 'content': response_text}
+        )
         
         suggestions = [
             "I'm at the client's house",
@@ -159,54 +240,31 @@ class CaregiverWorkflows:
         ]
         
         return {
-            'response': response.content,
+            'response': response_text,
             'scenario_detected': 'Location Issue',
             'suggestions': suggestions,
-            'conversation_step': len(history) // 2
+            'conversation_step': message_count // 2
         }
     
     async def process_phone_issue(self, user_info: Dict, message: str, conversation_id: str) -> Dict:
         """Handle phone/IVR issues"""
         
-        history = self.conversation_memory.get(conversation_id, [])
+        history = await self.conversation_memory.aget(conversation_id)
         
         if len(history) == 0:
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver has a phone issue.
-            
-            Caregiver: {user_info.get('user_name', 'the caregiver')}
-            Issue: "{message}"
-            
-            Respond with the script:
-            "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
-            
-            I have noticed that you used the IVR number to clock in today, but you used your phone 
-            to call that number instead of the client's house phone. Can you please clock in again 
-            using the client's house phone?"
-            
-            Or if it's an unregistered number:
-            "I have noticed that you have clocked in using a phone number that is not registered 
-            with us. Can you confirm whose number this is?"
-            """
+            prompt = PHONE_OPENING.render(user_name=user_info.get('user_name', 'the caregiver'), message=message)
         else:
-            conversation_context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history])
-            prompt = f"""
-            Continue as Rosella handling the phone issue.
-            
-            Conversation:
-            {conversation_context}
-            
-            Latest message: "{message}"
-            
-            Provide appropriate guidance based on their response. If they can't use the client's phone,
-            suggest using the HHA app. If the app doesn't work, offer to have a coordinator help set it up.
-            """
-        
-        response = llm.invoke([HumanMessage(content=prompt)])
-        
-        history.append({'role': 'user', 'content': message})
-        history.append({'role': 'assistant', 'content': response.content})
-        self.conversation_memory[conversation_id] = history
+            conversation_context = context_builder.render(conversation_id, history)
+            prompt = PHONE_FOLLOW_UP.render(conversation=conversation_context, message=message)
+        
+        response_text = await self.generate_reply('Phone Issue', prompt, user_info, message,
+                                                  cacheable=len(history) == 0)
+        
+        message_count = await self.conversation_memory.aappend(
+            conversation_id,
+            {'role': 'user', 'content': message},
+            {'role': 'assistant', 'content': response_text}
+        )
         
         suggestions = [
             "I'll use the client's phone",
@@ -215,54 +273,31 @@ class CaregiverWorkflows:
         ]
         
         return {
-            'response': response.content,
+            'response': response_text,
             'scenario_detected': 'Phone Issue',
             'suggestions': suggestions,
-            'conversation_step': len(history) // 2
+            'conversation_step': message_count // 2
         }
     
     async def process_timing_issue(self, user_info: Dict, message: str, conversation_id: str) -> Dict:
         """Handle timing/late arrival issues"""
         
-        history = self.conversation_memory.get(conversation_id, [])
+        history = await self.conversation_memory.aget(conversation_id)
         
         if len(history) == 0:
-            prompt = f"""
-            You are Rosella from Independence Care. A caregiver has a timing issue.
-            
-            Caregiver: {user_info.get('user_name', 'the caregiver')}
-            Issue: "{message}"
-            
-            Respond with the script:
-            "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!
-            
-            I have noticed that you clocked in late for your shift today, I just wanted to confirm 
-            what was the reason for that?"
-            
-            Be understanding but professional about timing policies.
-            """
+            prompt = TIMING_OPENING.render(user_name=user_info.get('user_name', 'the caregiver'), message=message)
         else:
-            conversation_context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history])
-            prompt = f"""
-            Continue as Rosella handling the timing issue.
-            
-            Conversation:
-            {conversation_context}
-            
-            Latest message: "{message}"
-            
-            Based on their reason, offer solutions:
-            "Would you be willing to make up for the hours you missed today by staying late on your 
-            shift today? Or any other day throughout the week?"
-            
-            If they agree, help adjust the schedule. If not, be understanding but note the policy.
-            """
-        
-        response = llm.invoke([HumanMessage(content=prompt)])
-        
-        history.append({'role': 'user', 'content': message})
-        history.append({'role': 'assistant', 'content': response.content})
-        self.conversation_memory[conversation_id] = history
+            conversation_context = context_builder.render(conversation_id, history)
+            prompt = TIMING_FOLLOW_UP.render(conversation=conversation_context, message=message)
+        
+        response_text = await self.generate_reply('Timing Issue', prompt, user_info, message,
+                                                  cacheable=len(history) == 0)
+        
+        message_count = await self.conversation_memory.aappend(
+            conversation_id,
+            {'role': 'user', 'content': message},
+            {'role': 'assistant', 'content': response_text}
+        )
         
         suggestions = [
             "I can stay late today",
@@ -271,33 +306,27 @@ class CaregiverWorkflows:
         ]
         
         return {
-            'response': response.content,
+            'response': response_text,
             'scenario_detected': 'Timing Issue',
             'suggestions': suggestions,
-            'conversation_step': len(history) // 2
+            'conversation_step': message_count // 2
         }
     
     async def process_general_inquiry(self, user_info: Dict, message: str, conversation_id: str) -> Dict:
         """Handle general inquiries"""
         
-        prompt = f"""
-        You are Rosella from Independence Care. Handle this general caregiver inquiry professionally.
+        prompt = GENERAL_INQUIRY.render(
+            user_name=user_info.get('user_name', 'the caregiver'),
+            contact_number=user_info.get('contact_number', 'N/A'),
+            reason_for_contact=user_info.get('reason_for_contact', 'General inquiry'),
+            message=message
+        )
         
-        Caregiver: {user_info.get('user_name', 'the caregiver')}
-        Contact: {user_info.get('contact_number', 'N/A')}
-        Original reason: {user_info.get('reason_for_contact', 'General inquiry')}
-        Current message: "{message}"
-        
-        Provide helpful, professional assistance. If it's not a standard scenario,
-        offer to connect them with the appropriate department or supervisor.
-        
-        Start with: "Hello, this is Rosella, I am calling from Independence Care, how are you doing today!"
-        """
-        
-        response = llm.invoke([HumanMessage(content=prompt)])
+        response_text = await self.generate_reply('General Inquiry', prompt, user_info, message,
+                                                  cacheable=True)
         
         return {
-            'response': response.content,
+            'response': response_text,
             'scenario_detected': 'General Inquiry',
             'suggestions': [
                 "Can you help me with this?",
@@ -311,22 +340,25 @@ class CaregiverWorkflows:
         """Main entry point - routes to appropriate workflow"""
         
         if not conversation_id:
-            conversation_id = f"{user_info.get('user_name', 'unknown')}_{len(self.conversation_memory)}"
+            conversation_id = f"{user_info.get('user_name', 'unknown')}_{uuid.uuid4().hex[:12]}"
         
         # Determine scenario type
         scenario_type = self.analyze_scenario(message, user_info.get('reason_for_contact', ''))
         
         # Route to appropriate workflow
         if scenario_type == "Schedule Issue":
-            return await self.process_schedule_issue(user_info, message, conversation_id)
+            result = await self.process_schedule_issue(user_info, message, conversation_id)
         elif scenario_type == "Location Issue":
-            return await self.process_location_issue(user_info, message, conversation_id)
+            result = await self.process_location_issue(user_info, message, conversation_id)
         elif scenario_type == "Phone Issue":
-            return await self.process_phone_issue(user_info, message, conversation_id)
+            result = await self.process_phone_issue(user_info, message, conversation_id)
         elif scenario_type == "Timing Issue":
-            return await self.process_timing_issue(user_info, message, conversation_id)
+            result = await self.process_timing_issue(user_info, message, conversation_id)
         else:
-            return await self.process_general_inquiry(user_info, message, conversation_id)
+            result = await self.process_general_inquiry(user_info, message, conversation_id)
+        
+        # The caller sends this back to continue the conversation
+        return {**result, 'conversation_id': conversation_id}
 
 # Global instance
 caregiver_workflows = CaregiverWorkflows() 
\ No newline at end of file
@@ -2,6 +2,8 @@
 let userInfo = {};
 let conversationStarted = false;
 let messageHistory = [];
+// Returned by the backend; sent back so multi-turn workflows resume where they paused
+let conversationId = null;
 
 // DOM elements
 const userForm = document.getElementById('userForm');
@@ -69,7 +71,8 @@ async function handleFormSubmission(e) {
                 user_name: userInfo.name,
                 contact_number: userInfo.contact,
                 reason_for_contact: userInfo.reason,
-                message: "Initial contact - user just registered"
+                message: "Initial contact - user just registered",
+                conversation_id: conversationId
             })
         });
         
@@ -78,6 +81,7 @@ async function handleFormSubmission(e) {
         }
         
         const data = await response.json();
+        conversationId = data.conversation_id || conversationId;
         
         // Hide form and show success
         userForm.style.display = 'none';
@@ -243,31 +247,8 @@ async function sendMessage() {
     showTypingIndicator();
     
     try {
-        // Call backend API for response
-        const response = await fetch('http://localhost:8000/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                user_name: userInfo.name,
-                contact_number: userInfo.contact,
-                reason_for_contact: userInfo.reason,
-                message: message
-            })
-        });
-        
-        if (!response.ok) {
-            throw new Error('Backend connection failed');
-        }
-        
-        const data = await response.json();
-        
-        // Remove typing indicator
-        removeTypingIndicator();
-        
-        // Add bot response
-        addMessage('bot', data.response, 'now');
+        // Stream the backend response so text appears as it is generated
+        const data = await streamChatResponse(message);
         
         // Add suggestions if available
         if (data.suggestions && data.suggestions.length > 0) {
@@ -303,6 +284,80 @@ async function sendMessage() {
     console.log('💬 Message Exchange:', { user: message, bot: messageHistory[messageHistory.length - 1] });
 }
 
+// Call the streaming chat endpoint and render the bot reply incrementally.
+// Resolves with {response, scenario_detected, suggestions} once the stream ends.
+async function streamChatResponse(message) {
+    const response = await fetch('http://localhost:8000/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            user_name: userInfo.name,
+            contact_number: userInfo.contact,
+            reason_for_contact: userInfo.reason,
+            message: message,
+            conversation_id: conversationId
+        })
+    });
+    
+    if (!response.ok || !response.body) {
+        throw new Error('Backend connection failed');
+    }
+    
+    const data = { response: '', scenario_detected: null, suggestions: [] };
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let messageP = null;
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Server-Sent Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            if (!rawEvent.startsWith('data: ')) continue;
+            const frame = JSON.parse(rawEvent.slice(6));
+            
+            if (frame.type === 'follow_up') {
+                // The full answer to the previous message, sent after its scripted reply
+                removeTypingIndicator();
+                addMessage('bot', frame.content, 'now');
+                showTypingIndicator();
+            } else if (frame.type === 'meta') {
+                data.scenario_detected = frame.scenario_detected;
+                data.suggestions = frame.suggestions || [];
+                conversationId = frame.conversation_id || conversationId;
+            } else if (frame.type === 'token') {
+                data.response += frame.content;
+                if (!messageP) {
+                    // First text chunk replaces the typing indicator
+                    removeTypingIndicator();
+                    messageP = addMessage('bot', data.response, 'now');
+                } else {
+                    messageP.innerHTML = formatMessage(data.response);
+                    scrollToBottom();
+                }
+            } else if (frame.type === 'error' && !messageP) {
+                throw new Error(frame.message);
+            }
+        }
+    }
+    
+    if (!messageP) {
+        throw new Error('Empty response from backend');
+    }
+    
+    return data;
+}
+
 // Generate bot response (mock implementation)
 function generateBotResponse(userMessage) {
     const lowerMessage = userMessage.toLowerCase();
@@ -371,6 +426,8 @@ function addMessage(sender, message, time) {
     
     chatMessages.appendChild(messageDiv);
     scrollToBottom();
+    
+    return messageP;
 }
 
 // Format message (support for basic markdown)
@@ -511,6 +568,7 @@ function clearChat() {
     });
     
     messageHistory = [];
+    conversationId = null;
     
     addMessage('bot', 'Chat cleared! How can I help you today?', 'now');
     